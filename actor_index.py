@@ -0,0 +1,81 @@
+import threading
+
+import numpy as np
+
+from utils import get_actor_display_name
+
+
+class NearbyVehicleIndex(object):
+    """
+    Vehicle positions of the world, refreshed once per world tick.
+
+    update() is fed with the carla.WorldSnapshot delivered to on_tick, which
+    already carries the transform of every actor, so no per-vehicle RPC is
+    needed. Actor types are looked up once, in a single get_actors() call,
+    the first time an id shows up.
+
+    Parameters:
+    radius (float): Only vehicles closer than this are returned by query().
+    max_results (int): Maximum number of vehicles returned by query().
+    """
+    def __init__(self, radius=200.0, max_results=15):
+        self.radius = radius
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._frame = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._positions = np.empty((0, 3), dtype=np.float64)
+        # actor id -> display name for vehicles, None for any other actor
+        self._names = {}
+        self._unknown = set()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def update(self, snapshot):
+        if snapshot.frame == self._frame:
+            return
+        names = self._names
+        ids = []
+        positions = []
+        unknown = []
+        for actor_snapshot in snapshot:
+            actor_id = actor_snapshot.id
+            if actor_id not in names:
+                unknown.append(actor_id)
+            elif names[actor_id] is not None:
+                location = actor_snapshot.get_transform().location
+                ids.append(actor_id)
+                positions.append((location.x, location.y, location.z))
+        with self._lock:
+            self._frame = snapshot.frame
+            self._ids = np.array(ids, dtype=np.int64)
+            self._positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+            self._unknown.update(unknown)
+
+    def refresh_actors(self, world):
+        """Classify the actors seen for the first time. Call from the client thread."""
+        with self._lock:
+            unknown, self._unknown = self._unknown, set()
+        if not unknown:
+            return
+        names = dict.fromkeys(unknown)
+        for actor in world.get_actors(list(unknown)):
+            if actor.type_id.startswith('vehicle.'):
+                names[actor.id] = get_actor_display_name(actor, truncate=22)
+        self._names.update(names)
+
+    def query(self, ego_id, position):
+        """Return [(distance, display name)] of the vehicles closest to position (x, y, z), nearest first."""
+        with self._lock:
+            ids = self._ids
+            positions = self._positions
+        if not len(ids):
+            return []
+        ego = np.asarray(position, dtype=np.float64)
+        distances = np.sqrt(np.sum((positions - ego) ** 2, axis=1))
+        distances[ids == ego_id] = np.inf
+        k = min(self.max_results, len(distances))
+        closest = np.argpartition(distances, k - 1)[:k]
+        closest = closest[np.argsort(distances[closest])]
+        return [(float(distances[i]), self._names[ids[i]]) for i in closest if distances[i] <= self.radius]
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""
+Microbenchmark of the camera frame conversion.
+
+Compares the original CameraManager._parse_image path (frombuffer -> reshape ->
+slice -> swapaxes -> make_surface) against FrameConverter, using synthetic
+BGRA raw_data buffers. No CARLA server is needed.
+
+    python benchmark/bench_frame_converter.py --res 1280x720 --frames 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+
+from frame_converter import FrameConverter
+
+
+def legacy_convert(raw_data, width, height):
+    array = np.frombuffer(raw_data, dtype=np.dtype("uint8"))
+    array = np.reshape(array, (height, width, 4))
+    array = array[:, :, :3]
+    array = array[:, :, ::-1]
+    return pygame.surfarray.make_surface(array.swapaxes(0, 1))
+
+
+def make_frames(width, height, count=8):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, width * height * 4, dtype=np.uint8).tobytes()
+            for _ in range(count)]
+
+
+def run(fn, frames, width, height, iterations):
+    t_start = time.perf_counter()
+    for i in range(iterations):
+        fn(frames[i % len(frames)], width, height)
+    return (time.perf_counter() - t_start) / iterations
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Frame conversion benchmark')
+    argparser.add_argument(
+        '--res',
+        metavar='WIDTHxHEIGHT',
+        action='append',
+        help='resolution to benchmark, can be repeated (default: 800x600, 1280x720, 1920x1080)')
+    argparser.add_argument(
+        '--frames',
+        default=300,
+        type=int,
+        help='number of frames converted per run (default: 300)')
+    args = argparser.parse_args()
+
+    resolutions = args.res or ['800x600', '1280x720', '1920x1080']
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    print('%-10s %14s %14s %9s' % ('res', 'legacy [ms]', 'converter [ms]', 'speedup'))
+    for res in resolutions:
+        width, height = [int(x) for x in res.split('x')]
+        frames = make_frames(width, height)
+
+        converter = FrameConverter()
+        # Sanity check: both paths must produce the same pixels.
+        expected = pygame.surfarray.array3d(legacy_convert(frames[0], width, height))
+        actual = pygame.surfarray.array3d(converter.from_buffer(frames[0], width, height))
+        assert np.array_equal(expected, actual), 'FrameConverter output differs from legacy path'
+
+        t_legacy = run(legacy_convert, frames, width, height, args.frames)
+        t_converter = run(converter.from_buffer, frames, width, height, args.frames)
+        print('%-10s %14.3f %14.3f %8.1fx' % (
+            res, 1e3 * t_legacy, 1e3 * t_converter, t_legacy / t_converter))
+
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
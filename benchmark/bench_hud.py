@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of HUD.render.
+
+Compares the original implementation (one font.render per line on every
+frame) against HUD.render with its text cache, and with static_info, which
+composes the panel once and reuses it until the text changes. Both with an
+unchanged panel and with the lines that change every frame while driving
+(client FPS, speed, location, throttle).
+
+Runs on the mock carla module of benchmark/fake_carla.py, no server needed.
+
+    python benchmark/bench_hud.py --frames 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+import fake_carla
+
+fake_carla.install()
+
+import pygame
+
+from hud import HUD
+
+
+def legacy_render(hud, display):
+    info_surface = pygame.Surface((220, hud.dim[1]))
+    info_surface.set_alpha(100)
+    display.blit(info_surface, (0, 0))
+    v_offset = 4
+    bar_h_offset = 100
+    bar_width = 106
+    for item in hud._info_text:
+        if v_offset + 18 > hud.dim[1]:
+            break
+        if isinstance(item, list):
+            if len(item) > 1:
+                points = [(x + 8, v_offset + 8 + (1.0 - y) * 30) for x, y in enumerate(item)]
+                pygame.draw.lines(display, (255, 136, 0), False, points, 2)
+            item = None
+            v_offset += 18
+        elif isinstance(item, tuple):
+            if isinstance(item[1], bool):
+                rect = pygame.Rect((bar_h_offset, v_offset + 8), (6, 6))
+                pygame.draw.rect(display, (255, 255, 255), rect, 0 if item[1] else 1)
+            else:
+                rect_border = pygame.Rect((bar_h_offset, v_offset + 8), (bar_width, 6))
+                pygame.draw.rect(display, (255, 255, 255), rect_border, 1)
+                f = (item[1] - item[2]) / (item[3] - item[2])
+                if item[2] < 0.0:
+                    rect = pygame.Rect((bar_h_offset + f * (bar_width - 6), v_offset + 8), (6, 6))
+                else:
+                    rect = pygame.Rect((bar_h_offset, v_offset + 8), (f * bar_width, 6))
+                pygame.draw.rect(display, (255, 255, 255), rect)
+            item = item[0]
+        if item:
+            surface = hud._font_mono.render(item, True, (255, 255, 255))
+            display.blit(surface, (8, v_offset))
+        v_offset += 18
+    hud._notifications.render(display)
+
+
+def info_text(frame):
+    return [
+        'Server:  % 16.0f FPS' % 20,
+        'Client:  % 16.0f FPS' % (55 + frame % 10),
+        '',
+        'Vehicle: % 20s' % 'Mercedes Coupe 2020',
+        'Map:     % 20s' % 'Town04',
+        'Simulation time: % 12s' % '0:01:23',
+        '',
+        'Speed:   % 15.0f km/h' % (frame % 120),
+        'Location:% 20s' % ('(% 5.1f, % 5.1f)' % (12.3 + 0.1 * frame, -45.6)),
+        'Height:  % 18.0f m' % 0.0,
+        '',
+        ('Throttle:', (frame % 100) / 100.0, 0.0, 1.0),
+        ('Steer:', 0.1, -1.0, 1.0),
+        ('Brake:', 0.0, 0.0, 1.0),
+        ('Reverse:', False),
+        ('Hand brake:', False),
+        ('Manual:', False),
+        'Gear:        %s' % 3,
+        'Nearby vehicles:',
+        '  12m Dodge Charger 2020',
+        '  48m Tesla Model3']
+
+
+def run(render, hud, display, frames, changing):
+    t_start = time.perf_counter()
+    for frame in range(frames):
+        hud._info_text = info_text(frame if changing else 0)
+        render(display)
+    return (time.perf_counter() - t_start) / frames
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='HUD render benchmark')
+    argparser.add_argument(
+        '--res',
+        metavar='WIDTHxHEIGHT',
+        default='1280x720',
+        help='window resolution (default: 1280x720)')
+    argparser.add_argument(
+        '--frames',
+        default=500,
+        type=int,
+        help='frames rendered per run (default: 500)')
+    args = argparser.parse_args()
+
+    width, height = [int(x) for x in args.res.split('x')]
+
+    pygame.init()
+    pygame.font.init()
+    display = pygame.display.set_mode((width, height))
+    hud = HUD(width, height)
+    static_hud = HUD(width, height, static_info=True)
+
+    print('%-10s %12s %12s %12s' % ('panel', 'legacy [us]', 'cached [us]', 'static [us]'))
+    for changing in (False, True):
+        t_legacy = run(lambda d: legacy_render(hud, d), hud, display, args.frames, changing)
+        t_cached = run(hud.render, hud, display, args.frames, changing)
+        t_static = run(static_hud.render, static_hud, display, args.frames, changing)
+        print('%-10s %12.1f %12.1f %12.1f' % (
+            'changing' if changing else 'static', 1e6 * t_legacy, 1e6 * t_cached, 1e6 * t_static))
+
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of the LiDAR bird's-eye view rasterization.
+
+Compares the original SensorManager.save_lidar_image path against
+BEVRasterizer on synthetic point clouds. No CARLA server is needed.
+
+    python benchmark/bench_lidar_bev.py --points 10000 100000 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+
+from lidar_bev import BEVRasterizer, LIDAR_POINT_SIZE, SEMANTIC_LIDAR_POINT_SIZE
+
+
+def legacy_rasterize(raw_data, disp_size, lidar_range, point_size):
+    lidar_range = 2.0 * float(lidar_range)
+    points = np.frombuffer(raw_data, dtype=np.dtype('f4'))
+    points = np.reshape(points, (int(points.shape[0] / point_size), point_size))
+    lidar_data = np.array(points[:, :2])
+    lidar_data *= min(disp_size) / lidar_range
+    lidar_data += (0.5 * disp_size[0], 0.5 * disp_size[1])
+    lidar_data = np.fabs(lidar_data)
+    lidar_data = lidar_data.astype(np.int32)
+    lidar_data = np.reshape(lidar_data, (-1, 2))
+    lidar_img_size = (disp_size[0], disp_size[1], 3)
+    lidar_img = np.zeros((lidar_img_size), dtype=np.uint8)
+    lidar_img[tuple(lidar_data.T)] = (255, 255, 255)
+    return pygame.surfarray.make_surface(lidar_img)
+
+
+def make_sweep(n, lidar_range, point_size, seed=0):
+    # Points fill the sensor range, so none of them fall outside the image and
+    # the legacy path (which does not clip) can be benchmarked on the same data.
+    rng = np.random.default_rng(seed)
+    points = np.zeros((n, point_size), dtype=np.float32)
+    radius = rng.uniform(0.0, 0.99 * lidar_range, n)
+    angle = rng.uniform(-np.pi, np.pi, n)
+    points[:, 0] = radius * np.cos(angle)
+    points[:, 1] = radius * np.sin(angle)
+    points[:, 2] = rng.uniform(-2.0, 2.0, n)
+    if point_size == LIDAR_POINT_SIZE:
+        points[:, 3] = rng.uniform(0.0, 1.0, n)
+    else:
+        points[:, 5] = rng.integers(0, 29, n).astype(np.uint32).view(np.float32)
+    return points.tobytes()
+
+
+def run(fn, sweeps, iterations):
+    t_start = time.perf_counter()
+    for i in range(iterations):
+        fn(sweeps[i % len(sweeps)])
+    return (time.perf_counter() - t_start) / iterations
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='LiDAR BEV rasterizer benchmark')
+    argparser.add_argument(
+        '--points',
+        nargs='+',
+        default=[10000, 100000, 1000000],
+        type=int,
+        help='points per sweep (default: 10000 100000 1000000)')
+    argparser.add_argument(
+        '--res',
+        metavar='WIDTHxHEIGHT',
+        default='426x360',
+        help='BEV image size (default: 426x360, one cell of visualize_multiple_sensors)')
+    argparser.add_argument(
+        '--range',
+        default=100.0,
+        type=float,
+        help='LiDAR range in meters (default: 100)')
+    argparser.add_argument(
+        '--iterations',
+        default=50,
+        type=int,
+        help='sweeps per run (default: 50)')
+    args = argparser.parse_args()
+
+    size = tuple(int(x) for x in args.res.split('x'))
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    print('%-10s %-10s %12s %12s %9s' % ('points', 'mode', 'legacy [ms]', 'bev [ms]', 'speedup'))
+    for n in args.points:
+        for mode, point_size in (('white', LIDAR_POINT_SIZE),
+                                 ('intensity', LIDAR_POINT_SIZE),
+                                 ('semantic', SEMANTIC_LIDAR_POINT_SIZE)):
+            sweeps = [make_sweep(n, args.range, point_size, seed) for seed in range(3)]
+            bev = BEVRasterizer(size, args.range, point_size, color_mode=mode)
+
+            if mode == 'white':
+                # Sanity check: same pixels as the legacy path.
+                expected = pygame.surfarray.array3d(legacy_rasterize(sweeps[0], size, args.range, point_size))
+                actual = pygame.surfarray.array3d(bev.render(sweeps[0]))
+                assert np.array_equal(expected, actual), 'BEVRasterizer output differs from legacy path'
+
+            t_legacy = run(lambda raw: legacy_rasterize(raw, size, args.range, point_size), sweeps, args.iterations)
+            t_bev = run(bev.render, sweeps, args.iterations)
+            print('%-10d %-10s %12.3f %12.3f %8.1fx' % (
+                n, mode, 1e3 * t_legacy, 1e3 * t_bev, t_legacy / t_bev))
+
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
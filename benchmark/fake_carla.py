@@ -0,0 +1,677 @@
+"""
+Stand-in for the carla module, for benchmarks that run without a simulator.
+
+It implements the small part of the CARLA Python API used by the client
+code: geometry types, blueprints, vehicles with a constant speed motion
+model, cameras and LiDARs that deliver synthetic raw buffers, world
+snapshots, batch commands and a tick source. Sensor callbacks run
+synchronously inside World.tick(), which keeps benchmarks deterministic.
+
+    import fake_carla
+    carla = fake_carla.install()    # before importing any client module
+"""
+
+import fnmatch
+import itertools
+import math
+import sys
+
+import numpy as np
+
+
+class Vector3D(object):
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def length(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+
+class Location(Vector3D):
+    def distance(self, other):
+        return math.sqrt((self.x - other.x) ** 2 + (self.y - other.y) ** 2 + (self.z - other.z) ** 2)
+
+
+class Rotation(object):
+    def __init__(self, pitch=0.0, yaw=0.0, roll=0.0):
+        self.pitch = pitch
+        self.yaw = yaw
+        self.roll = roll
+
+    def get_forward_vector(self):
+        yaw = math.radians(self.yaw)
+        pitch = math.radians(self.pitch)
+        return Vector3D(math.cos(pitch) * math.cos(yaw), math.cos(pitch) * math.sin(yaw), math.sin(pitch))
+
+
+class Transform(object):
+    def __init__(self, location=None, rotation=None):
+        self.location = location if location is not None else Location()
+        self.rotation = rotation if rotation is not None else Rotation()
+
+
+class BoundingBox(object):
+    def __init__(self, extent):
+        self.location = Location()
+        self.extent = extent
+
+
+class Timestamp(object):
+    def __init__(self, frame, elapsed_seconds, delta_seconds):
+        self.frame = frame
+        self.elapsed_seconds = elapsed_seconds
+        self.delta_seconds = delta_seconds
+        self.platform_timestamp = elapsed_seconds
+
+
+class VehicleControl(object):
+    def __init__(self, throttle=0.0, steer=0.0, brake=0.0, hand_brake=False, reverse=False,
+                 manual_gear_shift=False, gear=0):
+        self.throttle = throttle
+        self.steer = steer
+        self.brake = brake
+        self.hand_brake = hand_brake
+        self.reverse = reverse
+        self.manual_gear_shift = manual_gear_shift
+        self.gear = gear
+
+
+class VehicleAckermannControl(object):
+    def __init__(self, steer=0.0, steer_speed=0.0, speed=0.0, acceleration=0.0, jerk=0.0):
+        self.steer = steer
+        self.steer_speed = steer_speed
+        self.speed = speed
+        self.acceleration = acceleration
+        self.jerk = jerk
+
+
+class WalkerControl(object):
+    def __init__(self, direction=None, speed=0.0, jump=False):
+        self.direction = direction if direction is not None else Vector3D(1.0, 0.0, 0.0)
+        self.speed = speed
+        self.jump = jump
+
+
+class VehicleLightState(object):
+    NONE = 0
+
+
+class ColorConverter(object):
+    Raw = 0
+    Depth = 1
+    LogarithmicDepth = 2
+    CityScapesPalette = 3
+
+
+class AttachmentType(object):
+    Rigid = 0
+    SpringArm = 1
+    SpringArmGhost = 2
+
+
+class ActorAttribute(object):
+    def __init__(self, id, value, recommended_values=()):
+        self.id = id
+        self.value = str(value)
+        self.recommended_values = list(recommended_values)
+
+    def as_str(self):
+        return self.value
+
+    def as_int(self):
+        return int(self.value)
+
+    def as_float(self):
+        return float(self.value)
+
+    def as_bool(self):
+        return self.value.lower() == 'true'
+
+    __int__ = as_int
+    __float__ = as_float
+    __str__ = as_str
+
+
+class ActorBlueprint(object):
+    def __init__(self, id, attributes):
+        self.id = id
+        self.tags = id.split('.')
+        self._attributes = {name: ActorAttribute(name, *value) if isinstance(value, tuple) else
+                            ActorAttribute(name, value) for name, value in attributes.items()}
+
+    def has_attribute(self, name):
+        return name in self._attributes
+
+    def get_attribute(self, name):
+        return self._attributes[name]
+
+    def set_attribute(self, name, value):
+        if name not in self._attributes:
+            raise IndexError('blueprint %r has no attribute %r' % (self.id, name))
+        self._attributes[name].value = str(value)
+
+    def copy(self):
+        blueprint = ActorBlueprint(self.id, {})
+        blueprint._attributes = {name: ActorAttribute(name, x.value, x.recommended_values)
+                                 for name, x in self._attributes.items()}
+        return blueprint
+
+
+class BlueprintLibrary(list):
+    def filter(self, pattern):
+        if '*' not in pattern and '?' not in pattern:
+            pattern = '*' + pattern + '*'
+        return BlueprintLibrary(x.copy() for x in self if fnmatch.fnmatch(x.id, pattern))
+
+    def find(self, id):
+        for blueprint in self:
+            if blueprint.id == id:
+                return blueprint.copy()
+        raise IndexError('blueprint %r not found' % id)
+
+
+def _vehicle(id, color='255,0,0'):
+    return ActorBlueprint(id, {
+        'generation': '2', 'number_of_wheels': '4', 'role_name': ('autopilot', ['autopilot', 'hero']),
+        'color': (color, [color, '0,0,255', '255,255,255']), 'sticky_control': 'true'})
+
+
+def _camera(id):
+    return ActorBlueprint(id, {
+        'image_size_x': '800', 'image_size_y': '600', 'fov': '90', 'gamma': '2.2', 'sensor_tick': '0.0'})
+
+
+def _lidar(id):
+    return ActorBlueprint(id, {
+        'channels': '32', 'range': '10.0', 'points_per_second': '56000', 'rotation_frequency': '10',
+        'upper_fov': '10', 'lower_fov': '-30', 'sensor_tick': '0.0',
+        'dropoff_general_rate': ('0.45', ['0.45']), 'dropoff_intensity_limit': ('0.8', ['0.8']),
+        'dropoff_zero_intensity': ('0.4', ['0.4'])})
+
+
+BLUEPRINTS = [
+    _vehicle('vehicle.dodge.charger_2020'),
+    _vehicle('vehicle.mercedes.coupe_2020'),
+    _vehicle('vehicle.lincoln.mkz_2020'),
+    _vehicle('vehicle.tesla.model3'),
+    _camera('sensor.camera.rgb'),
+    _camera('sensor.camera.depth'),
+    _camera('sensor.camera.semantic_segmentation'),
+    _lidar('sensor.lidar.ray_cast'),
+    _lidar('sensor.lidar.ray_cast_semantic'),
+    ActorBlueprint('sensor.other.radar', {'horizontal_fov': '30', 'vertical_fov': '30', 'range': '100',
+                                          'points_per_second': '1500', 'sensor_tick': '0.0'}),
+]
+
+
+class SensorData(object):
+    def __init__(self, frame, timestamp, transform):
+        self.frame = frame
+        self.timestamp = timestamp
+        self.transform = transform
+
+
+class Image(SensorData):
+    def __init__(self, frame, timestamp, transform, width, height, fov, raw_data):
+        super().__init__(frame, timestamp, transform)
+        self.width = width
+        self.height = height
+        self.fov = fov
+        self.raw_data = raw_data
+
+    def convert(self, color_converter):
+        pass
+
+    def get_color_coded_flow(self):
+        return self
+
+
+class LidarMeasurement(SensorData):
+    def __init__(self, frame, timestamp, transform, channels, raw_data, point_size):
+        super().__init__(frame, timestamp, transform)
+        self.channels = channels
+        self.horizontal_angle = 0.0
+        self.raw_data = raw_data
+        self._points = len(raw_data) // point_size
+
+    def __len__(self):
+        return self._points
+
+
+class Actor(object):
+    _ids = itertools.count(1)
+
+    def __init__(self, world, blueprint, transform, parent=None):
+        self.id = next(Actor._ids)
+        self.type_id = blueprint.id
+        self.attributes = {name: x.value for name, x in blueprint._attributes.items()}
+        self.parent = parent
+        self.is_alive = True
+        self.bounding_box = BoundingBox(Vector3D(2.4, 1.0, 0.75))
+        self._world = world
+        self._transform = transform
+        self._velocity = Vector3D()
+
+    def get_world(self):
+        return self._world
+
+    def get_transform(self):
+        if self.parent is not None:
+            return self.parent.get_transform()
+        return self._transform
+
+    def get_location(self):
+        return self.get_transform().location
+
+    def get_velocity(self):
+        return self._velocity
+
+    def get_acceleration(self):
+        return Vector3D()
+
+    def get_angular_velocity(self):
+        return Vector3D()
+
+    def destroy(self):
+        self.is_alive = False
+        return self._world._remove(self)
+
+
+class Vehicle(Actor):
+    def __init__(self, world, blueprint, transform, parent=None):
+        super().__init__(world, blueprint, transform, parent)
+        self._control = VehicleControl()
+        self.autopilot = False
+        self._autopilot_speed = 10.0
+
+    def get_control(self):
+        return self._control
+
+    def apply_control(self, control):
+        self._control = control
+
+    def apply_ackermann_control(self, control):
+        pass
+
+    def set_autopilot(self, enabled=True, port=8000):
+        self.autopilot = enabled
+
+    def set_light_state(self, state):
+        pass
+
+    def get_physics_control(self):
+        raise RuntimeError('physics control is not simulated')
+
+    def _step(self, dt):
+        # Constant speed along the heading, autopilot cars drive at their desired speed (10 m/s).
+        speed = self._autopilot_speed if self.autopilot else 10.0 * self._control.throttle
+        yaw = math.radians(self._transform.rotation.yaw)
+        self._velocity = Vector3D(speed * math.cos(yaw), speed * math.sin(yaw), 0.0)
+        self._transform.location.x += self._velocity.x * dt
+        self._transform.location.y += self._velocity.y * dt
+
+
+class Sensor(Actor):
+    """Camera or LiDAR. Synthetic buffers are generated once and reused every frame."""
+    def __init__(self, world, blueprint, transform, parent=None):
+        super().__init__(world, blueprint, transform, parent)
+        self._callback = None
+        self._sensor_tick = float(self.attributes.get('sensor_tick', 0.0))
+        self._last_measurement = None
+        rng = np.random.default_rng(self.id)
+        if self.type_id.startswith('sensor.camera'):
+            self._width = int(self.attributes['image_size_x'])
+            self._height = int(self.attributes['image_size_y'])
+            self._buffers = [bytearray(rng.integers(0, 256, self._width * self._height * 4, dtype=np.uint8).tobytes())
+                             for _ in range(2)]
+        elif self.type_id.startswith('sensor.lidar'):
+            rate = float(self.attributes['points_per_second']) / float(self.attributes['rotation_frequency'])
+            self._point_size = 6 if self.type_id.endswith('semantic') else 4
+            self._buffers = [self._lidar_points(rng, int(rate), float(self.attributes['range'])) for _ in range(2)]
+        else:
+            self._buffers = None
+
+    def _lidar_points(self, rng, count, lidar_range):
+        if self._point_size == 4:
+            points = rng.uniform(-lidar_range, lidar_range, (count, 4)).astype(np.float32)
+            points[:, 3] = rng.uniform(0.0, 1.0, count)
+            return bytearray(points.tobytes())
+        points = np.zeros(count, dtype=np.dtype([('x', np.float32), ('y', np.float32), ('z', np.float32),
+                                                 ('cos', np.float32), ('idx', np.uint32), ('tag', np.uint32)]))
+        for axis in ('x', 'y', 'z'):
+            points[axis] = rng.uniform(-lidar_range, lidar_range, count)
+        points['tag'] = rng.integers(0, 23, count)
+        return bytearray(points.tobytes())
+
+    @property
+    def is_listening(self):
+        return self._callback is not None
+
+    def listen(self, callback):
+        self._callback = callback
+
+    def stop(self):
+        self._callback = None
+
+    def _measure(self, timestamp):
+        if self._callback is None or self._buffers is None:
+            return
+        # Like the server, measure once at least sensor_tick seconds have passed.
+        last = self._last_measurement
+        if last is not None and timestamp.elapsed_seconds - last < self._sensor_tick - 1e-9:
+            return
+        self._last_measurement = timestamp.elapsed_seconds
+        raw_data = self._buffers[timestamp.frame % 2]
+        transform = self.get_transform()
+        if self.type_id.startswith('sensor.camera'):
+            data = Image(timestamp.frame, timestamp.elapsed_seconds, transform, self._width, self._height,
+                         float(self.attributes['fov']), memoryview(raw_data))
+        else:
+            data = LidarMeasurement(timestamp.frame, timestamp.elapsed_seconds, transform,
+                                    int(self.attributes['channels']), memoryview(raw_data), 4 * self._point_size)
+        self._callback(data)
+
+
+class ActorList(list):
+    def find(self, actor_id):
+        for actor in self:
+            if actor.id == actor_id:
+                return actor
+        return None
+
+    def filter(self, pattern):
+        return ActorList(x for x in self if fnmatch.fnmatch(x.type_id, pattern))
+
+
+class ActorSnapshot(object):
+    __slots__ = ('id', '_transform', '_velocity')
+
+    def __init__(self, actor):
+        self.id = actor.id
+        t = actor.get_transform()
+        self._transform = Transform(Location(t.location.x, t.location.y, t.location.z),
+                                    Rotation(t.rotation.pitch, t.rotation.yaw, t.rotation.roll))
+        self._velocity = actor.get_velocity()
+
+    def get_transform(self):
+        return self._transform
+
+    def get_velocity(self):
+        return self._velocity
+
+    def get_acceleration(self):
+        return Vector3D()
+
+    def get_angular_velocity(self):
+        return Vector3D()
+
+
+class WorldSnapshot(object):
+    def __init__(self, world_id, timestamp, actors):
+        self.id = world_id
+        self.timestamp = timestamp
+        self.frame = timestamp.frame
+        self.elapsed_seconds = timestamp.elapsed_seconds
+        self._actors = {actor.id: ActorSnapshot(actor) for actor in actors}
+
+    def __iter__(self):
+        return iter(self._actors.values())
+
+    def __len__(self):
+        return len(self._actors)
+
+    def find(self, actor_id):
+        return self._actors.get(actor_id)
+
+    def has_actor(self, actor_id):
+        return actor_id in self._actors
+
+
+class WorldSettings(object):
+    def __init__(self, synchronous_mode=False, fixed_delta_seconds=None, no_rendering_mode=False):
+        self.synchronous_mode = synchronous_mode
+        self.fixed_delta_seconds = fixed_delta_seconds
+        self.no_rendering_mode = no_rendering_mode
+
+
+class Waypoint(object):
+    """A point on the straight lane of the map, along +x at the y of its spawn point row."""
+    def __init__(self, x, y, z=0.0):
+        self.transform = Transform(Location(x, y, z), Rotation(yaw=0.0))
+        self.road_id = int(round(y))
+        self.section_id = 0
+        self.lane_id = 1
+
+    def next(self, distance):
+        l = self.transform.location
+        return [Waypoint(l.x + distance, l.y, l.z)]
+
+    def previous(self, distance):
+        l = self.transform.location
+        return [Waypoint(l.x - distance, l.y, l.z)]
+
+
+class Map(object):
+    def __init__(self, name='Carla/Maps/Town04', num_spawn_points=100):
+        self.name = name
+        self._spawn_points = [Transform(Location(10.0 * (i % 10), 50.0 * (i // 10), 0.5), Rotation(yaw=0.0))
+                              for i in range(num_spawn_points)]
+
+    def get_waypoint(self, location, project_to_road=True, lane_type=None):
+        return Waypoint(location.x, location.y)
+
+    def get_spawn_points(self):
+        return [Transform(Location(t.location.x, t.location.y, t.location.z),
+                          Rotation(t.rotation.pitch, t.rotation.yaw, t.rotation.roll)) for t in self._spawn_points]
+
+
+class World(object):
+    """
+    Simulated world. tick() advances the vehicles by fixed_delta_seconds (0.05 s
+    if unset), calls every listening sensor and then the on_tick callbacks.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, carla_map=None):
+        self.id = next(World._ids)
+        self._map = carla_map if carla_map is not None else Map()
+        self._library = BlueprintLibrary(BLUEPRINTS)
+        self._settings = WorldSettings()
+        self._actors = {}
+        self._callbacks = {}
+        self._callback_ids = itertools.count(1)
+        self._timestamp = Timestamp(0, 0.0, 0.0)
+
+    def get_map(self):
+        return self._map
+
+    def get_blueprint_library(self):
+        return self._library
+
+    def get_settings(self):
+        return WorldSettings(self._settings.synchronous_mode, self._settings.fixed_delta_seconds,
+                             self._settings.no_rendering_mode)
+
+    def apply_settings(self, settings):
+        self._settings = WorldSettings(settings.synchronous_mode, settings.fixed_delta_seconds,
+                                       settings.no_rendering_mode)
+        return self._timestamp.frame
+
+    def spawn_actor(self, blueprint, transform, attach_to=None, attachment_type=AttachmentType.Rigid):
+        actor = self.try_spawn_actor(blueprint, transform, attach_to, attachment_type)
+        if actor is None:
+            raise RuntimeError('Spawn failed because of collision at spawn position')
+        return actor
+
+    def try_spawn_actor(self, blueprint, transform, attach_to=None, attachment_type=AttachmentType.Rigid):
+        transform = Transform(Location(transform.location.x, transform.location.y, transform.location.z),
+                              Rotation(transform.rotation.pitch, transform.rotation.yaw, transform.rotation.roll))
+        if blueprint.id.startswith('vehicle.'):
+            for actor in self._actors.values():
+                if actor.parent is None and actor.get_location().distance(transform.location) < 2.0:
+                    return None
+            actor = Vehicle(self, blueprint, transform, attach_to)
+        elif blueprint.id.startswith('sensor.'):
+            actor = Sensor(self, blueprint, transform, attach_to)
+        else:
+            actor = Actor(self, blueprint, transform, attach_to)
+        self._actors[actor.id] = actor
+        return actor
+
+    def _remove(self, actor):
+        return self._actors.pop(actor.id, None) is not None
+
+    def get_actor(self, actor_id):
+        return self._actors.get(actor_id)
+
+    def get_actors(self, actor_ids=None):
+        if actor_ids is None:
+            return ActorList(self._actors.values())
+        return ActorList(self._actors[x] for x in actor_ids if x in self._actors)
+
+    def get_snapshot(self):
+        return WorldSnapshot(self.id, self._timestamp, self._actors.values())
+
+    def on_tick(self, callback):
+        callback_id = next(self._callback_ids)
+        self._callbacks[callback_id] = callback
+        return callback_id
+
+    def remove_on_tick(self, callback_id):
+        self._callbacks.pop(callback_id, None)
+
+    def tick(self, seconds=10.0):
+        dt = self._settings.fixed_delta_seconds or 0.05
+        t = self._timestamp
+        self._timestamp = Timestamp(t.frame + 1, t.elapsed_seconds + dt, dt)
+        actors = list(self._actors.values())
+        for actor in actors:
+            if isinstance(actor, Vehicle) and actor.parent is None:
+                actor._step(dt)
+        for actor in actors:
+            if isinstance(actor, Sensor):
+                actor._measure(self._timestamp)
+        if self._callbacks:
+            snapshot = self.get_snapshot()
+            for callback in list(self._callbacks.values()):
+                callback(snapshot)
+        return self._timestamp.frame
+
+    def wait_for_tick(self, seconds=10.0):
+        self.tick()
+        return self.get_snapshot()
+
+
+class _Command(object):
+    def __init__(self, *args):
+        self.args = args
+        self.then_commands = []
+
+    def then(self, command):
+        self.then_commands.append(command)
+        return self
+
+
+class _CommandModule(object):
+    class SpawnActor(_Command):
+        pass
+
+    class DestroyActor(_Command):
+        pass
+
+    class ApplyVehicleControl(_Command):
+        pass
+
+    class SetAutopilot(_Command):
+        pass
+
+    FutureActor = object()
+
+
+command = _CommandModule
+
+
+class CommandResponse(object):
+    def __init__(self, actor_id=0, error=''):
+        self.actor_id = actor_id
+        self.error = error
+
+    def has_error(self):
+        return bool(self.error)
+
+
+class TrafficManager(object):
+    def __init__(self, port=8000):
+        self.port = port
+
+    def get_port(self):
+        return self.port
+
+    def set_synchronous_mode(self, enabled):
+        pass
+
+    def set_random_device_seed(self, seed):
+        pass
+
+    def set_desired_speed(self, actor, speed):
+        actor._autopilot_speed = speed / 3.6
+
+
+class Client(object):
+    def __init__(self, host='127.0.0.1', port=2000, worker_threads=0):
+        self._world = World()
+
+    def set_timeout(self, seconds):
+        pass
+
+    def get_world(self):
+        return self._world
+
+    def get_trafficmanager(self, port=8000):
+        return TrafficManager(port)
+
+    def _execute(self, cmd):
+        world = self._world
+        if isinstance(cmd, command.SpawnActor):
+            actor = world.try_spawn_actor(*cmd.args)
+            if actor is None:
+                return CommandResponse(error='Spawn failed because of collision at spawn position')
+            for then in cmd.then_commands:
+                args = tuple(actor.id if x is command.FutureActor else x for x in then.args)
+                self._execute(type(then)(*args))
+            return CommandResponse(actor.id)
+        actor = world.get_actor(cmd.args[0])
+        if actor is None:
+            return CommandResponse(error='actor %r not found' % (cmd.args[0],))
+        if isinstance(cmd, command.DestroyActor):
+            actor.destroy()
+        elif isinstance(cmd, command.ApplyVehicleControl):
+            actor.apply_control(cmd.args[1])
+        elif isinstance(cmd, command.SetAutopilot):
+            actor.set_autopilot(cmd.args[1])
+        return CommandResponse(actor.id)
+
+    def start_recorder(self, filename, additional_data=False):
+        return filename
+
+    def stop_recorder(self):
+        pass
+
+    def apply_batch(self, commands):
+        for cmd in commands:
+            self._execute(cmd)
+
+    def apply_batch_sync(self, commands, due_tick_cue=False):
+        responses = [self._execute(cmd) for cmd in commands]
+        if due_tick_cue:
+            self._world.tick()
+        return responses
+
+
+def install():
+    """Register this module as carla, so that 'import carla' in client code picks it up."""
+    module = sys.modules[__name__]
+    sys.modules['carla'] = module
+    return module
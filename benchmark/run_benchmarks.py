@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+
+"""
+End-to-end benchmark suite on a mock carla module.
+
+Runs the client code (camera decode and render, HUD, LiDAR BEV, wheel
+controller) against benchmark/fake_carla.py with the dummy SDL video driver,
+so no CARLA server or display is needed. Every case is timed (frames per
+second, mean and p95 ms per frame) and then run again under tracemalloc for
+the transient peak and the net growth of Python/NumPy allocations per frame.
+Allocations made inside SDL are not visible to tracemalloc.
+
+Results are written to benchmark/results/<commit>.json, pass an earlier
+result file to --compare to see the ratios between two commits.
+
+    python benchmark/run_benchmarks.py --frames 200
+    python benchmark/run_benchmarks.py --only camera --compare benchmark/results/abc1234.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+import fake_carla
+
+carla = fake_carla.install()
+
+import numpy as np
+import pygame
+
+from camera import DrivingViewCamera
+from controller.input_sampler import FakeJoystick
+from controller.vehicle_controller import VehicleController
+from decode_pipeline import DecodePipeline
+from ego_state import EgoStateCache
+from hud import HUD
+from lidar_bev import BEVRasterizer, LIDAR_POINT_SIZE
+
+RESOLUTIONS = ('640x360', '1280x720', '1920x1080')
+SENSOR_COUNTS = (1, 2, 4)
+VEHICLE_COUNTS = (10, 100)
+LIDAR_POINTS = (10000, 100000)
+BENCHMARKS = ('camera', 'hud', 'lidar', 'controller')
+
+
+class BenchWorld(object):
+    """The attributes of run_vehicle.World read by the HUD and the controller."""
+    def __init__(self, client, num_vehicles=0):
+        self.world = client.get_world()
+        self.map = self.world.get_map()
+        library = self.world.get_blueprint_library()
+        spawn_points = self.map.get_spawn_points()
+        self.player = self.world.spawn_actor(library.find('vehicle.mercedes.coupe_2020'), spawn_points[0])
+        for i in range(num_vehicles):
+            transform = spawn_points[1 + i % (len(spawn_points) - 1)]
+            transform.location.y += 5.0 * (i // (len(spawn_points) - 1))
+            self.world.spawn_actor(library.find('vehicle.tesla.model3'), transform)
+        self.ego_state = EgoStateCache()
+        self.frame_scheduler = None
+        self.decode_pipeline = None
+        self.follower = None
+        self.profiler = None
+        self.hud = None
+
+    def on_world_tick(self, snapshot):
+        self.ego_state.update(snapshot, self.player)
+        if self.hud is not None:
+            self.hud.on_world_tick(snapshot)
+
+
+def parse_resolution(text):
+    width, height = [int(x) for x in text.split('x')]
+    return width, height
+
+
+def camera_case(width, height, sensors):
+    """Camera frames from the tick to the display: callback, decode and blit."""
+    display = pygame.display.set_mode((width, height))
+    world = BenchWorld(carla.Client())
+    hud = HUD(width, height)
+    pipeline = DecodePipeline(workers=0)
+    cameras = []
+    for _ in range(sensors):
+        camera = DrivingViewCamera(world.player, hud, 2.2, pipeline)
+        camera.set_sensor(0, notify=False)
+        cameras.append(camera)
+
+    def step():
+        world.world.tick()
+        for camera in cameras:
+            camera.render(display)
+
+    def close():
+        for camera in cameras:
+            camera.destroy()
+        pipeline.shutdown()
+    return step, close
+
+
+def hud_case(width, height, vehicles):
+    """HUD.tick and HUD.render with vehicles around the ego vehicle."""
+    display = pygame.display.set_mode((width, height))
+    world = BenchWorld(carla.Client(), vehicles)
+    hud = world.hud = HUD(width, height)
+    world.world.on_tick(world.on_world_tick)
+    clock = pygame.time.Clock()
+
+    def step():
+        world.world.tick()
+        hud.tick(world, clock)
+        hud.render(display)
+    return step, None
+
+
+def lidar_case(width, height, points):
+    """BEV rasterization and blit of a ray_cast LiDAR sweep."""
+    display = pygame.display.set_mode((width, height))
+    rng = np.random.default_rng(0)
+    sweeps = [rng.uniform(-50.0, 50.0, (points, LIDAR_POINT_SIZE)).astype(np.float32).tobytes() for _ in range(2)]
+    rasterizer = BEVRasterizer((width, height), 50.0)
+    frame = [0]
+
+    def step():
+        frame[0] += 1
+        display.blit(rasterizer.render(sweeps[frame[0] % 2]), (0, 0))
+    return step, None
+
+
+def controller_case(width, height, _):
+    """VehicleController.parse_events with a steering wheel read every frame."""
+    pygame.display.set_mode((width, height))
+    world = BenchWorld(carla.Client())
+    joystick = FakeJoystick(profile=lambda t: ({0: np.sin(t), 1: 0.5, 2: -1.0}, {}))
+    controller = VehicleController(world, False, os.path.join(ROOT_DIR, 'config', 'steering_wheel_default.yaml'),
+                                   os.path.join(ROOT_DIR, 'config', 'keyboard_default.yaml'),
+                                   os.path.join(ROOT_DIR, 'config', 'response_curves_default.yaml'),
+                                   joystick=joystick)
+    clock = pygame.time.Clock()
+
+    def step():
+        controller.parse_events(clock, True)
+    return step, controller.destroy
+
+
+CASES = {
+    'camera': (camera_case, 'sensors', SENSOR_COUNTS),
+    'hud': (hud_case, 'vehicles', VEHICLE_COUNTS),
+    'lidar': (lidar_case, 'points', LIDAR_POINTS),
+    'controller': (controller_case, None, (None,)),
+}
+
+
+def measure(case, width, height, value, frames, warmup):
+    step, close = case(width, height, value)
+    try:
+        for _ in range(warmup):
+            step()
+        times = np.empty(frames)
+        for i in range(frames):
+            t = time.perf_counter()
+            step()
+            times[i] = time.perf_counter() - t
+
+        # Second pass under tracemalloc, which slows everything down.
+        peaks = np.empty(frames)
+        tracemalloc.start()
+        try:
+            start, _ = tracemalloc.get_traced_memory()
+            for i in range(frames):
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                step()
+                peaks[i] = tracemalloc.get_traced_memory()[1] - before
+            end, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        if close is not None:
+            close()
+    return {
+        'fps': float(1.0 / times.mean()),
+        'ms_mean': float(1e3 * times.mean()),
+        'ms_p95': float(1e3 * np.percentile(times, 95)),
+        'alloc_peak_bytes': float(peaks.mean()),
+        'alloc_net_bytes': float((end - start) / frames),
+    }
+
+
+def git_revision():
+    try:
+        sha = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                      stderr=subprocess.DEVNULL).decode().strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                                        stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return sha + ('-dirty' if dirty else '')
+
+
+def case_key(result):
+    return (result['benchmark'], result['resolution'], result['param'], result['value'])
+
+
+def print_results(results, baseline=None):
+    base = {case_key(x): x for x in baseline['results']} if baseline else {}
+    header = '%-10s %-10s %-14s %9s %9s %9s %12s %12s' % (
+        'benchmark', 'res', 'param', 'fps', 'ms', 'p95 ms', 'peak KiB', 'net B')
+    if base:
+        header += ' %8s %8s' % ('fps x', 'peak x')
+    print(header)
+    for r in results:
+        param = '%s=%s' % (r['param'], r['value']) if r['param'] else '-'
+        line = '%-10s %-10s %-14s %9.1f %9.3f %9.3f %12.1f %12.1f' % (
+            r['benchmark'], r['resolution'], param, r['fps'], r['ms_mean'], r['ms_p95'],
+            r['alloc_peak_bytes'] / 1024.0, r['alloc_net_bytes'])
+        b = base.get(case_key(r))
+        if b is not None:
+            line += ' %8.2f %8.2f' % (r['fps'] / b['fps'], r['alloc_peak_bytes'] / max(b['alloc_peak_bytes'], 1.0))
+        print(line)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Client benchmark suite on a mock carla module')
+    argparser.add_argument(
+        '--only',
+        nargs='+',
+        choices=BENCHMARKS,
+        default=BENCHMARKS,
+        help='benchmarks to run (default: all)')
+    argparser.add_argument(
+        '--res',
+        nargs='+',
+        default=RESOLUTIONS,
+        metavar='WIDTHxHEIGHT',
+        help='display and camera resolutions (default: %s)' % ' '.join(RESOLUTIONS))
+    argparser.add_argument(
+        '--frames',
+        default=200,
+        type=int,
+        help='measured frames per case (default: 200)')
+    argparser.add_argument(
+        '--warmup',
+        default=20,
+        type=int,
+        help='frames run before measuring (default: 20)')
+    argparser.add_argument(
+        '--out',
+        default=None,
+        help='result file (default: benchmark/results/<commit>.json)')
+    argparser.add_argument(
+        '--compare',
+        default=None,
+        metavar='RESULTS',
+        help='earlier result file to compare against (default: None)')
+    args = argparser.parse_args()
+
+    pygame.init()
+    results = []
+    try:
+        for name in args.only:
+            case, param, values = CASES[name]
+            for resolution in args.res:
+                width, height = parse_resolution(resolution)
+                for value in values:
+                    result = {'benchmark': name, 'resolution': resolution, 'param': param, 'value': value}
+                    result.update(measure(case, width, height, value, args.frames, args.warmup))
+                    results.append(result)
+    finally:
+        pygame.quit()
+
+    revision = git_revision()
+    report = {
+        'revision': revision,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pygame': pygame.version.ver,
+        'frames': args.frames,
+        'results': results,
+    }
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print('compared to %s' % baseline['revision'])
+    print_results(results, baseline)
+
+    out = args.out or os.path.join(BENCHMARK_DIR, 'results', revision + '.json')
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('results written to %s' % out)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,7 @@
+import datetime
+import os
+from collections import namedtuple
+
 import numpy as np
 import pygame
 import weakref
@@ -5,39 +9,91 @@ import weakref
 import carla
 from carla import ColorConverter as cc       
 
+from decode_pipeline import DecodePipeline
+from frame_converter import FrameConverter, bgra_array
+from recorder import FrameRecorder
+from sensor_sync import sync_period
+from world_cache import world_metadata
+
+# A compiled sensor: blueprint_id, color_converter, name and attributes as
+# declared in SENSOR_SPECS, plus the configured blueprint.
+SensorSpec = namedtuple('SensorSpec', ('blueprint_id', 'color_converter', 'name', 'attributes', 'blueprint'))
+
+
 class CameraManager(object):
-    def __init__(self, parent_actor, hud, gamma_correction):
+    """
+    A set of camera views attached to a vehicle, one of them active at a time.
+
+    Subclasses declare SENSOR_SPECS, a tuple of (blueprint id, color converter,
+    name, ((attribute, value), ...)). The blueprints are configured once per
+    map and shared. The sensor is only spawned when it is first needed, by
+    render(), add_listener() or toggle_recording(), so a view that is never
+    displayed, recorded or consumed costs nothing.
+
+    SENSOR_TICK, RESOLUTION_SCALE and DECIMATION are the rate and resolution
+    policy of the views, overridden per instance by the keyword arguments of
+    the same name. The server renders a frame every sensor_tick seconds (0
+    for every tick) at the HUD size times resolution_scale, and the client
+    decodes one frame out of decimation, recorded frames included.
+    """
+    SENSOR_SPECS = ()
+    SENSOR_TICK = 0.0
+    RESOLUTION_SCALE = 1.0
+    DECIMATION = 1
+
+    def __init__(self, parent_actor, hud, gamma_correction, pipeline=None, sensor_tick=None,
+                 resolution_scale=None, decimation=None):
         self.sensor = None
-        self.surface = None
         self._parent = parent_actor
         self.hud = hud
+        self.sensor_tick = self.SENSOR_TICK if sensor_tick is None else sensor_tick
+        self.resolution_scale = self.RESOLUTION_SCALE if resolution_scale is None else resolution_scale
+        self.decimation = self.DECIMATION if decimation is None else decimation
+
+        # Without a shared pipeline the frames are decoded in the sensor callback.
+        self._pipeline = pipeline if pipeline is not None else DecodePipeline(workers=0)
+        self._converter = FrameConverter(self._pipeline.surface_buffers)
+        weak_self = weakref.ref(self)
+        self._channel = self._pipeline.channel(
+            type(self).__name__,
+            lambda image: CameraManager._decode_image(weak_self, image),
+            self.decimation)
+
         self.recording = False
+        self._recorder = None
 
         self.transform_index = 1
         
         self._camera_transforms = None # need to be set in the subclass
-        self.sensors = None # need to be set in the subclass
+        self.sensors = () # compiled from SENSOR_SPECS by get_sensor_spec()
 
         self.gamma_correction = gamma_correction
 
         self.index = None
-        # TODO: ??
+        self._active = False
 
     def get_sensor_spec(self):
-        world = self._parent.get_world()
-        bp_library = world.get_blueprint_library()
-        for sensor_spec in self.sensors:
-            if sensor_spec[0].startswith('sensor.camera'):
-                bp = bp_library.find(sensor_spec[0])
-                bp.set_attribute('image_size_x', str(self.hud.dim[0]))
-                bp.set_attribute('image_size_y', str(self.hud.dim[1]))
-                if bp.has_attribute('gamma'):
-                    bp.set_attribute('gamma', str(self.gamma_correction))
-                for attr_name, attr_value in sensor_spec[3].items():
-                    bp.set_attribute(attr_name, attr_value)
-                sensor_spec.append(bp)
-            else:
-                raise ValueError('Not Camera Sensor: %r' % sensor_spec[0])
+        """Compile SENSOR_SPECS into self.sensors, a tuple of SensorSpec."""
+        metadata = world_metadata(self._parent.get_world())
+        size = (('image_size_x', str(max(1, int(self.hud.dim[0] * self.resolution_scale)))),
+                ('image_size_y', str(max(1, int(self.hud.dim[1] * self.resolution_scale)))))
+        sensors = []
+        for blueprint_id, color_converter, name, attributes in self.SENSOR_SPECS:
+            if not blueprint_id.startswith('sensor.camera'):
+                raise ValueError('Not Camera Sensor: %r' % blueprint_id)
+            configuration = size
+            library_blueprint = metadata.find(blueprint_id)
+            if library_blueprint.has_attribute('sensor_tick'):
+                configuration += (('sensor_tick', str(self.sensor_tick)),)
+            if library_blueprint.has_attribute('gamma'):
+                configuration += (('gamma', str(self.gamma_correction)),)
+            blueprint = metadata.configured(blueprint_id, configuration + tuple(attributes))
+            sensors.append(SensorSpec(blueprint_id, color_converter, name, tuple(attributes), blueprint))
+        self.sensors = tuple(sensors)
+
+    def sync_period(self, fixed_delta_seconds):
+        """Simulation frames between two decoded frames, the period to attach to a SensorSync with."""
+        return sync_period(self.sensor_tick, fixed_delta_seconds, self.decimation)
 
     def toggle_camera(self):
         self.transform_index = (self.transform_index + 1) % len(self._camera_transforms)
@@ -45,42 +101,106 @@ class CameraManager(object):
 
     def set_sensor(self, index, notify=True, force_respawn=False):
         index = index % len(self.sensors)
-        needs_respawn = True if self.index is None else \
-            (force_respawn or (self.sensors[index][2] != self.sensors[self.index][2]))
-        if needs_respawn:
-            if self.sensor is not None:
-                self.sensor.destroy()
-                self.surface = None
-            self.sensor = self._parent.get_world().spawn_actor(
-                self.sensors[index][-1],
-                self._camera_transforms[self.transform_index][0],
-                attach_to=self._parent,
-                attachment_type=self._camera_transforms[self.transform_index][1])
-            # We need to pass the lambda a weak reference to self to avoid
-            # circular reference.
-            weak_self = weakref.ref(self)
-            self.sensor.listen(lambda image: CameraManager._parse_image(weak_self, image))
-        if notify:
-            self.hud.notification(self.sensors[index][2])
+        needs_respawn = self.index is not None and \
+            (force_respawn or self.sensors[index].name != self.sensors[self.index].name)
         self.index = index
+        if needs_respawn and self.sensor is not None:
+            self._destroy_sensor()
+        if self._active and self.sensor is None:
+            self._spawn()
+        if notify:
+            self.hud.notification(self.sensors[index].name)
+
+    def activate(self):
+        """Spawn the sensor of the current view, if it does not exist yet."""
+        self._active = True
+        if self.sensor is None and self.index is not None:
+            self._spawn()
+
+    def _spawn(self):
+        self.sensor = self._parent.get_world().spawn_actor(
+            self.sensors[self.index].blueprint,
+            self._camera_transforms[self.transform_index][0],
+            attach_to=self._parent,
+            attachment_type=self._camera_transforms[self.transform_index][1])
+        # We need to pass the lambda a weak reference to self to avoid
+        # circular reference.
+        weak_self = weakref.ref(self)
+        self.sensor.listen(lambda image: CameraManager._parse_image(weak_self, image))
+
+    def _destroy_sensor(self):
+        self.sensor.stop()
+        self.sensor.destroy()
+        self.sensor = None
+        self._channel.reset()
 
     def next_sensor(self):
         self.set_sensor(self.index + 1)
 
-    def toggle_recording(self):
-        self.recording = not self.recording
+    def toggle_recording(self, out_dir='_out', compress=False, compress_workers=0):
+        if self._recorder is None:
+            self.activate()
+            run_dir = os.path.join(out_dir, datetime.datetime.now().strftime('%Y%m%d_%H%M%S'))
+            self._recorder = FrameRecorder(run_dir, compress=compress, compress_workers=compress_workers)
+            self.recording = True
+        else:
+            self.recording = False
+            recorder, self._recorder = self._recorder, None
+            recorder.close()
         self.hud.notification('Recording %s' % ('On' if self.recording else 'Off'))
 
+    @property
+    def output(self):
+        """Last decoded frame, a Surface or a NumPy array in headless mode."""
+        return self._channel.latest()[1]
+
+    @property
+    def surface(self):
+        output = self.output
+        return output if isinstance(output, pygame.Surface) else None
+
+    def add_listener(self, listener):
+        self._channel.add_listener(listener)
+        self.activate()
+
+    def remove_listener(self, listener):
+        self._channel.remove_listener(listener)
+
     def render(self, display):
-        if self.surface is not None:
-            display.blit(self.surface, (0, 0))
+        if self.sensor is None:
+            self.activate()
+        surface = self.surface
+        if surface is not None:
+            display.blit(surface, (0, 0))
+
+    def destroy(self):
+        if self._recorder is not None:
+            self.toggle_recording()
+        self._pipeline.remove(self._channel)
+        self._channel.reset()
+        if self.sensor is not None:
+            self._destroy_sensor()
 
     @staticmethod
     def _parse_image(weak_self, image):
+        # Runs on the CARLA callback thread, keep it short.
         self = weak_self()
         if not self:
             return
-        if self.sensors[self.index][0].startswith('sensor.camera.dvs'):
+        self._channel.submit(image.frame, image)
+
+    @staticmethod
+    def _decode_image(weak_self, image):
+        self = weak_self()
+        if not self:
+            return None
+        return self._decode(image)
+
+    def _decode(self, image):
+        # Headless runs keep the frames as NumPy arrays and never create a Surface.
+        headless = self.hud.headless
+        spec = self.sensors[self.index]
+        if spec.blueprint_id.startswith('sensor.camera.dvs'):
             # Example of converting the raw_data from a carla.DVSEventArray
             # sensor into a NumPy array and using it as an image
             dvs_events = np.frombuffer(image.raw_data, dtype=np.dtype([
@@ -88,40 +208,32 @@ class CameraManager(object):
             dvs_img = np.zeros((image.height, image.width, 3), dtype=np.uint8)
             # Blue is positive, red is negative
             dvs_img[dvs_events[:]['y'], dvs_events[:]['x'], dvs_events[:]['pol'] * 2] = 255
-            self.surface = pygame.surfarray.make_surface(dvs_img.swapaxes(0, 1))
-        elif self.sensors[self.index][0].startswith('sensor.camera.optical_flow'):
+            output = dvs_img if headless else pygame.surfarray.make_surface(dvs_img.swapaxes(0, 1))
+        elif spec.blueprint_id.startswith('sensor.camera.optical_flow'):
             image = image.get_color_coded_flow()
-            array = np.frombuffer(image.raw_data, dtype=np.dtype("uint8"))
-            array = np.reshape(array, (image.height, image.width, 4))
-            array = array[:, :, :3]
-            array = array[:, :, ::-1]
-            self.surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
-        elif self.sensors[self.index][0].startswith('sensor.camera.depth'):
-            image.convert(self.sensors[self.index][1])
-            array = np.frombuffer(image.raw_data, dtype=np.dtype("uint8"))
-            array = np.reshape(array, (image.height, image.width, 4))
-            array = array[:, :, :3]
-            array = array[:, :, ::-1]
-            # print(array)
-
-
-
+            output = bgra_array(image) if headless else self._converter.convert(image)
         else:
-            image.convert(self.sensors[self.index][1])
-            array = np.frombuffer(image.raw_data, dtype=np.dtype("uint8"))
-            array = np.reshape(array, (image.height, image.width, 4))
-            array = array[:, :, :3]
-            array = array[:, :, ::-1]
-            self.surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
-        if self.recording:
-            image.save_to_disk('_out/%08d' % image.frame)
+            image.convert(spec.color_converter)
+            output = bgra_array(image) if headless else self._converter.convert(image)
+        recorder = self._recorder
+        if recorder is not None:
+            recorder.record(image)
+        return output
 
 
 
 
 class DrivingViewCamera(CameraManager):
-    def __init__(self, parent_actor, hud, gamma_correction):
-        super().__init__(parent_actor, hud, gamma_correction)
+    # Define Sensors for Driving View
+    SENSOR_SPECS = (
+        ('sensor.camera.rgb', cc.Raw, 'Windshield Camera RGB', (
+            ('fov', '110'),
+        )),
+        ('sensor.camera.rgb', cc.Raw, 'Camera RGB', ()),
+    )
+
+    def __init__(self, parent_actor, hud, gamma_correction, pipeline=None, **policy):
+        super().__init__(parent_actor, hud, gamma_correction, pipeline, **policy)
 
         bound_x = 0.5 + self._parent.bounding_box.extent.x
         bound_y = 0.5 + self._parent.bounding_box.extent.y
@@ -138,20 +250,20 @@ class DrivingViewCamera(CameraManager):
             
         ]
 
-        # Define Sensors for Driving View
-        self.sensors = [
-            ['sensor.camera.rgb', cc.Raw, 'Windshield Camera RGB', {
-                'fov': '110',
-            }],
-            ['sensor.camera.rgb', cc.Raw, 'Camera RGB', {}],
-        ]
-
         self.get_sensor_spec()
 
 
 class DepthCamera(CameraManager):
-    def __init__(self, parent_actor, hud, gamma_correction):
-        super().__init__(parent_actor, hud, gamma_correction)
+    # Define Sensors for Camera
+    SENSOR_SPECS = (
+        ('sensor.camera.depth', cc.LogarithmicDepth, 'Camera Depth (Logarithmic Gray Scale)', ()),
+    )
+    # Depth is consumed, never displayed: 10 Hz at half the display size is enough.
+    SENSOR_TICK = 0.1
+    RESOLUTION_SCALE = 0.5
+
+    def __init__(self, parent_actor, hud, gamma_correction, pipeline=None, **policy):
+        super().__init__(parent_actor, hud, gamma_correction, pipeline, **policy)
 
         bound_x = 0.5 + self._parent.bounding_box.extent.x
         bound_y = 0.5 + self._parent.bounding_box.extent.y
@@ -163,10 +275,6 @@ class DepthCamera(CameraManager):
             (carla.Transform(carla.Location(x=+0.8*bound_x, y=+0.0*bound_y, z=1.3*bound_z)), Attachment.Rigid),
         ]
 
-        # Define Sensors for Camera
-        self.sensors = [
-            ['sensor.camera.depth', cc.LogarithmicDepth, 'Camera Depth (Logarithmic Gray Scale)', {}],
-        ]
         self.get_sensor_spec()
         
 
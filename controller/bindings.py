@@ -0,0 +1,96 @@
+import pygame.locals as pgl
+import yaml
+
+
+def key_code(name):
+    """Resolve the name of a pygame key constant, e.g. 'K_w', to its integer code."""
+    if not isinstance(name, str) or not name.startswith('K_') or not hasattr(pgl, name):
+        raise ValueError('Unknown key name: %r' % (name,))
+    return getattr(pgl, name)
+
+
+def load_yaml(path):
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=yaml.FullLoader) or {}
+
+
+class KeyboardBindings(object):
+    """
+    Keyboard configuration compiled to pygame key codes.
+
+    Every name is resolved once when the config is loaded. Held keys are
+    available as integer attributes (throttle, brake, ...) to index the
+    pygame.key.get_pressed() table, and keydown maps the key code of each
+    event action to its action name.
+    """
+    HELD = ('throttle', 'brake', 'steer_left', 'steer_right', 'handbrake')
+    EVENTS = ('reverse',)
+
+    def __init__(self, cfg):
+        self.codes = {}
+        for action in self.HELD + self.EVENTS:
+            option = action + '_key'
+            if option not in cfg:
+                raise ValueError('Missing keyboard binding: %r' % option)
+            try:
+                self.codes[action] = key_code(cfg[option])
+            except ValueError as error:
+                raise ValueError('Invalid keyboard binding %r: %s' % (option, error))
+
+        self.throttle = self.codes['throttle']
+        self.brake = self.codes['brake']
+        self.steer_left = self.codes['steer_left']
+        self.steer_right = self.codes['steer_right']
+        self.handbrake = self.codes['handbrake']
+        self.keydown = {self.codes[action]: action for action in self.EVENTS}
+
+    @classmethod
+    def from_yaml(cls, path):
+        return cls(load_yaml(path))
+
+
+class JoystickBindings(object):
+    """
+    Steering wheel configuration compiled to axis and button indices.
+
+    buttondown maps the button of each event action to its action name.
+    """
+    AXES = ('steer', 'throttle', 'brake')
+    HELD = ('handbrake',)
+    EVENTS = ('reverse',)
+
+    def __init__(self, cfg):
+        self.axes = {}
+        self.buttons = {}
+        for action in self.AXES:
+            self.axes[action] = self._index(cfg, action + '_axis')
+        for action in self.HELD + self.EVENTS:
+            self.buttons[action] = self._index(cfg, action + '_button')
+
+        self.steer_axis = self.axes['steer']
+        self.throttle_axis = self.axes['throttle']
+        self.brake_axis = self.axes['brake']
+        self.handbrake_button = self.buttons['handbrake']
+        self.buttondown = {self.buttons[action]: action for action in self.EVENTS}
+
+    @staticmethod
+    def _index(cfg, option):
+        if option not in cfg:
+            raise ValueError('Missing joystick binding: %r' % option)
+        value = cfg[option]
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise ValueError('Invalid joystick binding %r: %r' % (option, value))
+        return value
+
+    def validate(self, joystick):
+        """Check the bindings against the axes and buttons of a connected device."""
+        for action, axis in self.axes.items():
+            if axis >= joystick.get_numaxes():
+                raise ValueError('%s axis %d not available on %s' % (action, axis, joystick.get_name()))
+        for action, button in self.buttons.items():
+            if button >= joystick.get_numbuttons():
+                raise ValueError('%s button %d not available on %s' % (action, button, joystick.get_name()))
+
+    @classmethod
+    def from_yaml(cls, path):
+        return cls(load_yaml(path))
@@ -0,0 +1,277 @@
+import csv
+import logging
+import select
+import threading
+import time
+
+import numpy as np
+
+try:
+    import evdev
+    from evdev import ecodes
+except ImportError:
+    evdev = None
+    ecodes = None
+
+SAMPLE_FIELDS = ('t', 'steer', 'throttle', 'brake', 'handbrake')
+
+
+class InputSampler(object):
+    """
+    Sample the steering wheel on a dedicated thread at a fixed rate.
+
+    Every sample is a row (t, steer, throttle, brake, handbrake) of raw axis
+    values in a preallocated ring buffer, t being time.perf_counter(). Only
+    the bound axes and button are read. The control loop reads latest() and
+    history() returns the last capacity samples. With a log, every sample
+    is also appended to it, e.g. a TelemetryLogger(path, SAMPLE_FIELDS)
+    streaming to disk, so the log covers the whole session however long it
+    is. The log is owned by the caller, stop() does not close it.
+
+    SDL refreshes the state of a pygame joystick only when the main thread
+    pumps the event queue, so sampling one at 500 Hz records the same values
+    until the next pygame.event.get() and the latency still follows the frame
+    rate. Pass an EvdevJoystick (Linux) to sample the device itself.
+
+    Parameters:
+    joystick: Device with get_axis() and get_button(), e.g. an EvdevJoystick, a pygame Joystick or FakeJoystick.
+    bindings (JoystickBindings): Axes and button to sample.
+    rate (float): Samples per second (default: 500).
+    capacity (int): Number of samples kept in the ring buffer (default: 60000).
+    log: Sink with append(row) every sample is passed to, e.g. a TelemetryLogger (default: None).
+    """
+    def __init__(self, joystick, bindings, rate=500.0, capacity=60000, log=None):
+        self.joystick = joystick
+        self.rate = rate
+        self.period = 1.0 / rate
+        self._axes = (bindings.steer_axis, bindings.throttle_axis, bindings.brake_axis)
+        self._button = bindings.handbrake_button
+        self._buffer = np.zeros((capacity, len(SAMPLE_FIELDS)))
+        self._count = 0
+        self._log = log
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return min(self._count, len(self._buffer))
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='input-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        deadline = time.perf_counter()
+        while not self._stop.is_set():
+            self.sample()
+            deadline += self.period
+            remaining = deadline - time.perf_counter()
+            if remaining > 0.0:
+                self._stop.wait(remaining)
+            elif remaining < -self.period:
+                # Fell behind, resume at the current time instead of bursting.
+                deadline = time.perf_counter()
+
+    def sample(self):
+        """Read the device once and append the sample."""
+        joystick = self.joystick
+        steer, throttle, brake = [joystick.get_axis(axis) for axis in self._axes]
+        handbrake = joystick.get_button(self._button)
+        t = time.perf_counter()
+        with self._lock:
+            self._buffer[self._count % len(self._buffer)] = (t, steer, throttle, brake, handbrake)
+            self._count += 1
+        if self._log is not None:
+            self._log.append((t, steer, throttle, brake, handbrake))
+
+    def latest(self):
+        """Return the last sample as a tuple (t, steer, throttle, brake, handbrake), or None."""
+        with self._lock:
+            if not self._count:
+                return None
+            return tuple(self._buffer[(self._count - 1) % len(self._buffer)].tolist())
+
+    def history(self, seconds=None):
+        """Return a copy of the buffered samples, oldest first, optionally only the last seconds."""
+        with self._lock:
+            count = self._count
+            capacity = len(self._buffer)
+            if count <= capacity:
+                samples = self._buffer[:count].copy()
+            else:
+                start = count % capacity
+                samples = np.concatenate((self._buffer[start:], self._buffer[:start]))
+        if seconds is not None and len(samples):
+            samples = samples[samples[:, 0] >= samples[-1, 0] - seconds]
+        return samples
+
+    def export(self, path):
+        """Write the history to path, as NPZ if it ends with .npz and CSV otherwise."""
+        samples = self.history()
+        if self._count > len(samples):
+            logging.warning('Input history holds the last %d of %d samples, pass a log to keep all of them',
+                            len(samples), self._count)
+        if path.endswith('.npz'):
+            np.savez(path, **{name: samples[:, i] for i, name in enumerate(SAMPLE_FIELDS)})
+            return
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(SAMPLE_FIELDS)
+            writer.writerows(samples.tolist())
+
+
+class EvdevJoystick(object):
+    """
+    Joystick read from its Linux evdev device on a dedicated thread.
+
+    Every event is applied as the device reports it, so get_axis() and
+    get_button() are current whatever the frame rate of the main loop.
+    Axes and buttons are numbered like SDL does on Linux and axes are
+    scaled to [-1, 1]. Needs the evdev package and read access to
+    /dev/input/event*.
+
+    Parameters:
+    path (str): Device node, e.g. /dev/input/event5.
+    """
+    def __init__(self, path):
+        if evdev is None:
+            raise RuntimeError('cannot open %s, make sure the evdev package is installed' % path)
+        self.device = evdev.InputDevice(path)
+        capabilities = self.device.capabilities()
+        absinfo = dict(capabilities.get(ecodes.EV_ABS, []))
+        hats = range(ecodes.ABS_HAT0X, ecodes.ABS_HAT3Y + 1)
+        axes = sorted(x for x in absinfo if x not in hats)
+        keys = capabilities.get(ecodes.EV_KEY, [])
+        buttons = sorted(x for x in keys if x >= ecodes.BTN_JOYSTICK) + \
+            sorted(x for x in keys if ecodes.BTN_MISC <= x < ecodes.BTN_JOYSTICK)
+        self._axis_index = {code: i for i, code in enumerate(axes)}
+        self._axis_range = [(absinfo[x].min, absinfo[x].max) for x in axes]
+        self._button_index = {code: i for i, code in enumerate(buttons)}
+        self._axes = [self._scale(i, absinfo[x].value) for i, x in enumerate(axes)]
+        active = set(self.device.active_keys())
+        self._buttons = [int(x in active) for x in buttons]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='evdev-joystick', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def open(cls, name):
+        """EvdevJoystick of the device called name (e.g. pygame's Joystick.get_name()), None if not found."""
+        if evdev is None:
+            return None
+        for path in evdev.list_devices():
+            try:
+                device = evdev.InputDevice(path)
+            except OSError:
+                continue
+            found = device.name == name and ecodes.EV_ABS in device.capabilities()
+            device.close()
+            if found:
+                return cls(path)
+        return None
+
+    def _scale(self, axis, value):
+        low, high = self._axis_range[axis]
+        return 2.0 * (value - low) / (high - low) - 1.0 if high > low else 0.0
+
+    def _run(self):
+        fd = self.device.fd
+        while not self._stop.is_set():
+            readable, _, _ = select.select([fd], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                events = list(self.device.read())
+            except BlockingIOError:
+                continue
+            except OSError as e:
+                logging.error('Joystick %s: %s', self.device.path, e)
+                return
+            for event in events:
+                if event.type == ecodes.EV_ABS:
+                    axis = self._axis_index.get(event.code)
+                    if axis is not None:
+                        self._axes[axis] = self._scale(axis, event.value)
+                elif event.type == ecodes.EV_KEY:
+                    button = self._button_index.get(event.code)
+                    if button is not None:
+                        self._buttons[button] = int(event.value != 0)
+
+    def init(self):
+        pass
+
+    def get_name(self):
+        return self.device.name
+
+    def get_numaxes(self):
+        return len(self._axes)
+
+    def get_numbuttons(self):
+        return len(self._buttons)
+
+    def get_axis(self, axis):
+        return self._axes[axis]
+
+    def get_button(self, button):
+        return self._buttons[button]
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.device.close()
+
+
+class FakeJoystick(object):
+    """
+    Stand-in for pygame.joystick.Joystick, driven by set_axis()/set_button()
+    or by a profile function of time returning ({axis: value}, {button: value}).
+    """
+    def __init__(self, num_axes=6, num_buttons=12, profile=None, name='Fake Joystick'):
+        self._axes = [0.0] * num_axes
+        self._buttons = [0] * num_buttons
+        self._profile = profile
+        self._name = name
+        self._t0 = time.perf_counter()
+
+    def init(self):
+        pass
+
+    def get_name(self):
+        return self._name
+
+    def get_numaxes(self):
+        return len(self._axes)
+
+    def get_numbuttons(self):
+        return len(self._buttons)
+
+    def set_axis(self, axis, value):
+        self._axes[axis] = float(value)
+
+    def set_button(self, button, value):
+        self._buttons[button] = int(bool(value))
+
+    def _apply_profile(self):
+        if self._profile is not None:
+            axes, buttons = self._profile(time.perf_counter() - self._t0)
+            for axis, value in axes.items():
+                self.set_axis(axis, value)
+            for button, value in buttons.items():
+                self.set_button(button, value)
+
+    def get_axis(self, axis):
+        self._apply_profile()
+        return self._axes[axis]
+
+    def get_button(self, button):
+        self._apply_profile()
+        return self._buttons[button]
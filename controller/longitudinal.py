@@ -0,0 +1,231 @@
+import math
+
+import numpy as np
+
+FOLLOWING_MODELS = ('idm', 'acc', 'cth')
+
+
+class IDM(object):
+    """
+    Intelligent Driver Model.
+
+    All methods work on scalars or NumPy arrays of any shape, one entry per
+    follower, so a whole platoon is evaluated in one call.
+
+    Parameters:
+    desired_speed (float): Free road speed in m/s (default: 25.0).
+    time_headway (float): Desired time gap in s (default: 1.5).
+    min_gap (float): Standstill bumper to bumper gap in m (default: 2.0).
+    max_accel (float): Maximum acceleration in m/s^2 (default: 1.5).
+    comfort_decel (float): Comfortable deceleration in m/s^2 (default: 2.0).
+    delta (float): Free road acceleration exponent (default: 4.0).
+    """
+    def __init__(self, desired_speed=25.0, time_headway=1.5, min_gap=2.0, max_accel=1.5,
+                 comfort_decel=2.0, delta=4.0):
+        self.desired_speed = desired_speed
+        self.time_headway = time_headway
+        self.min_gap = min_gap
+        self.max_accel = max_accel
+        self.comfort_decel = comfort_decel
+        self.delta = delta
+        self._sqrt_ab = 2.0 * math.sqrt(max_accel * comfort_decel)
+
+    def reset(self):
+        pass
+
+    def acceleration(self, gap, speed, leader_speed, dt):
+        gap = np.maximum(gap, 0.1)
+        desired_gap = self.min_gap + np.maximum(
+            0.0, speed * self.time_headway + speed * (speed - leader_speed) / self._sqrt_ab)
+        free = (speed / self.desired_speed) ** self.delta
+        return self.max_accel * (1.0 - free - (desired_gap / gap) ** 2)
+
+
+class ConstantTimeHeadway(object):
+    """
+    Linear constant time-headway spacing policy.
+
+    a = k_gap * (gap - min_gap - time_headway * v) + k_speed * (v_leader - v),
+    capped by a cruise controller k_cruise * (desired_speed - v) when the
+    leader is far away or missing (gap = inf).
+
+    Parameters:
+    desired_speed (float): Cruise speed in m/s (default: 25.0).
+    time_headway (float): Desired time gap in s (default: 1.5).
+    min_gap (float): Standstill gap in m (default: 2.0).
+    k_gap (float): Spacing error gain (default: 0.23).
+    k_speed (float): Relative speed gain (default: 0.07).
+    k_cruise (float): Cruise speed error gain (default: 0.4).
+    """
+    def __init__(self, desired_speed=25.0, time_headway=1.5, min_gap=2.0, k_gap=0.23, k_speed=0.07,
+                 k_cruise=0.4):
+        self.desired_speed = desired_speed
+        self.time_headway = time_headway
+        self.min_gap = min_gap
+        self.k_gap = k_gap
+        self.k_speed = k_speed
+        self.k_cruise = k_cruise
+
+    def reset(self):
+        pass
+
+    def acceleration(self, gap, speed, leader_speed, dt):
+        spacing_error = gap - self.min_gap - self.time_headway * speed
+        following = self.k_gap * spacing_error + self.k_speed * (leader_speed - speed)
+        return np.minimum(following, self.k_cruise * (self.desired_speed - speed))
+
+
+class PIDACC(object):
+    """
+    Adaptive cruise control with a PID controller on the spacing error of a
+    constant time-headway policy, and a P controller on the cruise speed.
+    The integral state is kept per follower and sized on the first call.
+
+    Parameters:
+    desired_speed (float): Cruise speed in m/s (default: 25.0).
+    time_headway (float): Desired time gap in s (default: 1.5).
+    min_gap (float): Standstill gap in m (default: 2.0).
+    kp (float): Proportional gain on the spacing error (default: 0.2).
+    ki (float): Integral gain on the spacing error (default: 0.01).
+    kd (float): Derivative gain, applied to the relative speed (default: 0.6).
+    k_cruise (float): Cruise speed error gain (default: 0.4).
+    integral_limit (float): Anti-windup bound of the integral term in m s (default: 20.0).
+    """
+    def __init__(self, desired_speed=25.0, time_headway=1.5, min_gap=2.0, kp=0.2, ki=0.01, kd=0.6,
+                 k_cruise=0.4, integral_limit=20.0):
+        self.desired_speed = desired_speed
+        self.time_headway = time_headway
+        self.min_gap = min_gap
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.k_cruise = k_cruise
+        self.integral_limit = integral_limit
+        self._integral = None
+
+    def reset(self):
+        self._integral = None
+
+    def acceleration(self, gap, speed, leader_speed, dt):
+        spacing_error = gap - self.min_gap - self.time_headway * speed
+        following = np.isfinite(spacing_error)
+        spacing_error = np.where(following, spacing_error, 0.0)
+        if self._integral is None or np.shape(self._integral) != np.shape(spacing_error):
+            self._integral = np.zeros(np.shape(spacing_error))
+        self._integral = np.clip(self._integral + spacing_error * dt, -self.integral_limit, self.integral_limit)
+        pid = (self.kp * spacing_error + self.ki * self._integral
+               + self.kd * np.where(following, leader_speed - speed, 0.0))
+        cruise = self.k_cruise * (self.desired_speed - speed)
+        return np.where(following, np.minimum(pid, cruise), cruise)
+
+
+def make_model(name, **params):
+    """Create a car-following model by name, one of FOLLOWING_MODELS."""
+    models = {'idm': IDM, 'acc': PIDACC, 'cth': ConstantTimeHeadway}
+    if name not in models:
+        raise ValueError('Unknown car-following model: %r' % name)
+    return models[name](**params)
+
+
+def accel_to_pedals(accel, max_accel=3.0, max_decel=8.0):
+    """
+    Map desired accelerations to (throttle, brake) in [0, 1], linearly up to
+    max_accel and max_decel. Works on scalars and arrays.
+    """
+    throttle = np.clip(accel / max_accel, 0.0, 1.0)
+    brake = np.clip(-accel / max_decel, 0.0, 1.0)
+    return throttle, brake
+
+
+def following_gap(position, yaw, leader_position, length):
+    """
+    Bumper to bumper gap along the heading of the follower.
+
+    Parameters:
+    position (array): Follower positions (..., 3).
+    yaw (array): Follower yaw in degrees (...).
+    leader_position (array): Leader positions (..., 3).
+    length (array): Sum of the half lengths of follower and leader (...).
+    """
+    yaw = np.radians(yaw)
+    offset = np.asarray(leader_position) - np.asarray(position)
+    return offset[..., 0] * np.cos(yaw) + offset[..., 1] * np.sin(yaw) - length
+
+
+class CarFollowingController(object):
+    """
+    Longitudinal control of one ego vehicle behind a leader.
+
+    update() reads both vehicles from the carla.WorldSnapshot of the tick,
+    without any RPC, and evaluates the model once per frame, so a snapshot
+    seen again never integrates the model twice. apply() writes the result into
+    a carla.VehicleControl (throttle and brake) or VehicleAckermannControl
+    (speed and acceleration); steering is left to the caller.
+
+    Parameters:
+    model: IDM, PIDACC or ConstantTimeHeadway instance.
+    max_accel (float): Acceleration giving full throttle in m/s^2 (default: 3.0).
+    max_decel (float): Deceleration giving full brake in m/s^2 (default: 8.0).
+    """
+    def __init__(self, model, max_accel=3.0, max_decel=8.0):
+        self.model = model
+        self.max_accel = max_accel
+        self.max_decel = max_decel
+        self.ego_id = None
+        self.leader_id = None
+        self._length = 0.0
+        self.acceleration = 0.0
+        self.gap = math.inf
+        self.speed = 0.0
+        self.leader_speed = 0.0
+        self.dt = 0.0
+        self.frame = None
+
+    def attach(self, ego, leader=None):
+        """Follow leader with ego. Both are carla.Actor, the leader may be None for free driving."""
+        self.ego_id = ego.id
+        self.leader_id = leader.id if leader is not None else None
+        self._length = ego.bounding_box.extent.x
+        if leader is not None:
+            self._length += leader.bounding_box.extent.x
+        self.frame = None
+        self.model.reset()
+
+    def update(self, snapshot):
+        """Evaluate the model for the tick of snapshot and return the desired acceleration."""
+        if snapshot.frame == self.frame:
+            return self.acceleration
+        ego = snapshot.find(self.ego_id) if self.ego_id is not None else None
+        if ego is None:
+            return None
+        self.frame = snapshot.frame
+        t = ego.get_transform()
+        v = ego.get_velocity()
+        self.speed = math.sqrt(v.x * v.x + v.y * v.y + v.z * v.z)
+        self.dt = snapshot.timestamp.delta_seconds
+
+        leader = snapshot.find(self.leader_id) if self.leader_id is not None else None
+        if leader is None:
+            self.gap = math.inf
+            self.leader_speed = self.speed
+        else:
+            lt = leader.get_transform().location
+            lv = leader.get_velocity()
+            self.gap = float(following_gap((t.location.x, t.location.y, t.location.z), t.rotation.yaw,
+                                           (lt.x, lt.y, lt.z), self._length))
+            self.leader_speed = math.sqrt(lv.x * lv.x + lv.y * lv.y + lv.z * lv.z)
+
+        self.acceleration = float(self.model.acceleration(self.gap, self.speed, self.leader_speed, self.dt))
+        return self.acceleration
+
+    def apply(self, control):
+        """Write the last acceleration into a VehicleControl or VehicleAckermannControl."""
+        if hasattr(control, 'throttle'):
+            throttle, brake = accel_to_pedals(self.acceleration, self.max_accel, self.max_decel)
+            control.throttle = float(throttle)
+            control.brake = float(brake)
+        else:
+            control.speed = max(0.0, self.speed + self.acceleration * self.dt)
+            # An acceleration of 0 means "as fast as possible" to the Ackermann controller.
+            control.acceleration = min(max(abs(self.acceleration), 0.1), max(self.max_accel, self.max_decel))
+        return control
@@ -0,0 +1,127 @@
+import numpy as np
+import yaml
+
+SHAPES = {
+    'linear': lambda u, gain: gain * u,
+    'tan': lambda u, gain: np.tan(gain * u),
+}
+
+DEFAULT_CURVES = {
+    'steer': {'bipolar': True, 'shape': 'tan', 'gain': 1.1},
+    'throttle': {'bipolar': False},
+    'brake': {'bipolar': False},
+}
+
+
+class ResponseCurve(object):
+    """
+    Map a raw axis value in [-1, 1] to a control value through a lookup table.
+
+    The stages below are evaluated once on resolution evenly spaced inputs.
+    After that, a lookup is an index computation and a linear interpolation
+    between two table entries, for a single value or a whole NumPy array.
+
+    Bipolar curves (steering) keep the axis value u = x and return values in
+    [-1, 1]. Unipolar curves (pedals) use u = (x + 1) / 2 and return values
+    in [0, 1]. The deadzone, saturation, gamma and points stages act on |u|
+    and keep the sign of u.
+
+    Parameters:
+    bipolar (bool): Steering-like curve if True, pedal-like curve otherwise (default: True).
+    invert (bool): Flip the axis direction before anything else (default: False).
+    deadzone (float): Inputs with |u| below this give 0, the rest is rescaled to [0, 1] (default: 0.0).
+    saturation (float): Inputs with |u| above this give full output (default: 1.0).
+    gamma (float): Exponent applied to |u|, above 1 for finer control near the center (default: 1.0).
+    points (list): Optional piecewise linear curve [[|u|, output], ...] applied to |u| (default: None).
+    shape (str): Final shaping function, one of SHAPES (default: 'linear').
+    gain (float): Gain of the shaping function (default: 1.0).
+    resolution (int): Number of table entries (default: 2049).
+    """
+    def __init__(self, bipolar=True, invert=False, deadzone=0.0, saturation=1.0, gamma=1.0,
+                 points=None, shape='linear', gain=1.0, resolution=2049):
+        if shape not in SHAPES:
+            raise ValueError('Unknown curve shape: %r' % shape)
+        if not 0.0 <= deadzone < saturation <= 1.0:
+            raise ValueError('Need 0 <= deadzone < saturation <= 1, got %r and %r' % (deadzone, saturation))
+        if gamma <= 0.0:
+            raise ValueError('gamma must be positive, got %r' % gamma)
+        if resolution < 2:
+            raise ValueError('resolution must be at least 2, got %r' % resolution)
+        self.bipolar = bipolar
+        self.invert = invert
+        self.deadzone = deadzone
+        self.saturation = saturation
+        self.gamma = gamma
+        self.points = None if points is None else np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.shape = shape
+        self.gain = gain
+        self.low = -1.0 if bipolar else 0.0
+
+        self.inputs = np.linspace(-1.0, 1.0, resolution)
+        self.table = self._build(self.inputs)
+        self._scale = (resolution - 1) / 2.0
+        self._last = resolution - 1
+        # table.tolist() is faster to index for single values than the array
+        self._values = self.table.tolist()
+
+    def _build(self, x):
+        if self.invert:
+            x = -x
+        u = x if self.bipolar else (x + 1.0) / 2.0
+        sign = np.sign(u)
+        u = np.abs(u)
+        u = np.clip((u - self.deadzone) / (self.saturation - self.deadzone), 0.0, 1.0)
+        u = u ** self.gamma
+        if self.points is not None:
+            u = np.interp(u, self.points[:, 0], self.points[:, 1])
+        y = SHAPES[self.shape](sign * u, self.gain)
+        return np.clip(y, self.low, 1.0)
+
+    def __call__(self, x):
+        """Evaluate the curve for one axis value."""
+        position = (min(max(x, -1.0), 1.0) + 1.0) * self._scale
+        i = min(int(position), self._last - 1)
+        frac = position - i
+        values = self._values
+        return values[i] + frac * (values[i + 1] - values[i])
+
+    def evaluate(self, x):
+        """Evaluate the curve for an array of axis values."""
+        position = (np.clip(np.asarray(x, dtype=np.float64), -1.0, 1.0) + 1.0) * self._scale
+        i = np.minimum(position.astype(np.intp), self._last - 1)
+        frac = position - i
+        table = self.table
+        return table[i] + frac * (table[i + 1] - table[i])
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(**(cfg or {}))
+
+
+def load_curves(path=None):
+    """
+    Build the steer, throttle and brake curves from a YAML file. Curves
+    missing from the file, or all of them when path is None, use DEFAULT_CURVES.
+    """
+    cfg = {}
+    if path is not None:
+        with open(path, 'r') as f:
+            cfg = yaml.load(f, Loader=yaml.FullLoader) or {}
+    unknown = set(cfg) - set(DEFAULT_CURVES)
+    if unknown:
+        raise ValueError('Unknown response curves: %s' % ', '.join(sorted(unknown)))
+    return {name: ResponseCurve.from_config(cfg.get(name, default))
+            for name, default in DEFAULT_CURVES.items()}
+
+
+def apply_curves(curves, samples):
+    """
+    Batch-evaluate an input log, e.g. InputSampler.history(), with columns
+    (t, steer, throttle, brake, handbrake). Returns the same layout with the
+    axis columns replaced by control values.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    controls = samples.copy()
+    for column, name in enumerate(('steer', 'throttle', 'brake'), start=1):
+        controls[:, column] = curves[name].evaluate(samples[:, column])
+    return controls
@@ -1,19 +1,17 @@
 import carla
 import pygame
-import pygame.locals as pgl
-from configparser import ConfigParser
-import yaml
-import math
 
 import logging
 
-def s2k(key_str):
-    return eval(f'pgl.{key_str}')
+from controller.bindings import KeyboardBindings, JoystickBindings
+from controller.input_sampler import EvdevJoystick, InputSampler
+from controller.response_curve import load_curves
 
 class VehicleController(object):
     def __init__(self, vehicle_world, start_in_autopilot,
                  js_cfg_yaml='steering_wheel_default.yaml',
-                 kb_cfg_yaml='keyboard_default.yaml'):
+                 kb_cfg_yaml='keyboard_default.yaml',
+                 curves_yaml=None, input_rate=0.0, joystick=None, input_log=None):
         self._vehicle_world = vehicle_world
         self._autopilot_enabled = start_in_autopilot
         self._ackermann_enabled = False
@@ -29,26 +27,57 @@ class VehicleController(object):
             raise NotImplementedError("Only Vehicle is supported")
         
         self.steer = 0.0
+        self._steer_cache = 0.0
+        # Optional CarFollowingController, overrides the pedals when set.
+        self.longitudinal = None
 
         # self._vehicle_world.hud.notification("Press 'H' or '?' for help.", seconds=4.0)
 
-        # initialize keyboard devices\
-        with open(kb_cfg_yaml, 'r') as f:
-            self.kb_cfg = yaml.load(f, Loader=yaml.FullLoader)
+        # initialize keyboard devices
+        self.kb_bindings = KeyboardBindings.from_yaml(kb_cfg_yaml)
 
         # initialize joy stick devices
-        pygame.joystick.init()
-        
-        joystick_count = pygame.joystick.get_count()
-        if joystick_count > 1:
-            raise ValueError("Please Connect Just One Joystick")
-        
-        self._joystick = pygame.joystick.Joystick(0)
+        if joystick is None:
+            pygame.joystick.init()
+
+            joystick_count = pygame.joystick.get_count()
+            if joystick_count > 1:
+                raise ValueError("Please Connect Just One Joystick")
+
+            joystick = pygame.joystick.Joystick(0)
+        self._joystick = joystick
         self._joystick.init()
 
         # load joystick config
-        with open(js_cfg_yaml, 'r') as f:
-            self.js_cfg = yaml.load(f, Loader=yaml.FullLoader)
+        self.js_bindings = JoystickBindings.from_yaml(js_cfg_yaml)
+        self.js_bindings.validate(self._joystick)
+        self.curves = load_curves(curves_yaml)
+        self._steer_curve = self.curves['steer']
+        self._throttle_curve = self.curves['throttle']
+        self._brake_curve = self.curves['brake']
+
+        # sample the wheel on its own thread, or once per frame when input_rate is 0
+        self.input_sampler = None
+        self._sampled_device = None
+        if input_rate > 0:
+            device = self._joystick
+            if isinstance(device, pygame.joystick.JoystickType):
+                # A pygame joystick only changes when the main loop pumps events.
+                self._sampled_device = EvdevJoystick.open(device.get_name())
+                if self._sampled_device is not None:
+                    device = self._sampled_device
+                else:
+                    logging.warning('Wheel read through SDL, samples only refresh once per frame '
+                                    '(install evdev and allow reading /dev/input to sample the device)')
+            self.input_sampler = InputSampler(device, self.js_bindings, rate=input_rate, log=input_log)
+            self.input_sampler.start()
+
+        # Dispatch tables from key code / button to handler, built once.
+        actions = {
+            'reverse': self._control_vehicle_toggle_reverse,
+        }
+        self._keydown_handlers = {code: actions[action] for code, action in self.kb_bindings.keydown.items()}
+        self._buttondown_handlers = {button: actions[action] for button, action in self.js_bindings.buttondown.items()}
 
 
     @staticmethod
@@ -71,16 +100,15 @@ class VehicleController(object):
         
             # joystick events
             elif event.type == pygame.JOYBUTTONDOWN:
+                handler = self._buttondown_handlers.get(event.button)
+                if handler is not None:
+                    handler()
 
-                # Toggle Reverse
-                if event.button == self.js_cfg['reverse_button']:
-                    self._control_vehicle_toggle_reverse()
-
-                    
             # keyboard events
             elif event.type == pygame.KEYDOWN:
-                if event.key == s2k(self.kb_cfg['reverse_key']):
-                    self._control_vehicle_toggle_reverse()
+                handler = self._keydown_handlers.get(event.key)
+                if handler is not None:
+                    handler()
 
                 
 
@@ -88,13 +116,15 @@ class VehicleController(object):
         if not self._autopilot_enabled:
             # self._parse_vehicle_keys(pygame.key.get_pressed(), clock.get_time())
             self._parse_vehicle_wheel()
+            if self.longitudinal is not None:
+                self.longitudinal.apply(self._control)
             self._control.reverse = self._control.gear < 0
             self._vehicle_world.player.apply_control(self._control)
     
 
             
     def _parse_vehicle_keys(self, keys, milliseconds):
-        if keys[s2k(self.kb_cfg['throttle_key'])]:
+        if keys[self.kb_bindings.throttle]:
             if not self._ackermann_enabled:
                 self._control.throttle = min(self._control.throttle + 0.1, 1.00)
             else:
@@ -103,7 +133,7 @@ class VehicleController(object):
             if not self._ackermann_enabled:
                 self._control.throttle = 0.0
 
-        if keys[s2k(self.kb_cfg['brake_key'])]:
+        if keys[self.kb_bindings.brake]:
             if not self._ackermann_enabled:
                 self._control.brake = min(self._control.brake + 0.2, 1)
             else:
@@ -114,12 +144,12 @@ class VehicleController(object):
                 self._control.brake = 0
 
         steer_increment = 5e-4 * milliseconds
-        if keys[s2k(self.kb_cfg['steer_left_key'])]:
+        if keys[self.kb_bindings.steer_left]:
             if self._steer_cache > 0:
                 self._steer_cache = 0
             else:
                 self._steer_cache -= steer_increment
-        elif keys[s2k(self.kb_cfg['steer_right_key'])]:
+        elif keys[self.kb_bindings.steer_right]:
             if self._steer_cache < 0:
                 self._steer_cache = 0
             else:
@@ -129,34 +159,36 @@ class VehicleController(object):
         self._steer_cache = min(0.7, max(-0.7, self._steer_cache))
         if not self._ackermann_enabled:
             self._control.steer = round(self._steer_cache, 1)
-            self._control.hand_brake = keys[s2k(self.kb_cfg['handbrake_key'])]
+            self._control.hand_brake = keys[self.kb_bindings.handbrake]
         else:
             self._ackermann_control.steer = round(self._steer_cache, 1)
 
+    def destroy(self):
+        if self.input_sampler is not None:
+            self.input_sampler.stop()
+        if self._sampled_device is not None:
+            self._sampled_device.close()
+            self._sampled_device = None
+
+    def _read_wheel(self):
+        """Return the raw (steer, throttle, brake, handbrake) inputs of the wheel."""
+        if self.input_sampler is not None:
+            sample = self.input_sampler.latest()
+            if sample is not None:
+                return sample[1:]
+        js = self._joystick
+        return (js.get_axis(self.js_bindings.steer_axis),
+                js.get_axis(self.js_bindings.throttle_axis),
+                js.get_axis(self.js_bindings.brake_axis),
+                js.get_button(self.js_bindings.handbrake_button))
+
     def _parse_vehicle_wheel(self):
-        numAxes = self._joystick.get_numaxes()
-        jsInputs = [float(self._joystick.get_axis(i)) for i in range(numAxes)]
-        # print (jsInputs)
-        jsButtons = [float(self._joystick.get_button(i)) for i in
-                     range(self._joystick.get_numbuttons())]
-
-        # Custom function to map range of inputs [1, -1] to outputs [0, 1] i.e 1 from inputs means nothing is pressed
-        # For the steering, it seems fine as it is
-        K1 = 1.0  # 0.55
-        steerCmd = K1 * math.tan(1.1 * jsInputs[self.js_cfg['steer_axis']])
-
-        # For the throttle and brake, we need to map the range [-1, 1] to [0, 1]
-        throttleCmd = (jsInputs[self.js_cfg['throttle_axis']] + 1) /2
-        if throttleCmd <= 0:
-            throttleCmd = 0
-        elif throttleCmd > 1:
-            throttleCmd = 1
-
-        brakeCmd = (jsInputs[self.js_cfg['brake_axis']] + 1) /2
-        if brakeCmd <= 0:
-            brakeCmd = 0
-        elif brakeCmd > 1:
-            brakeCmd = 1
+        steerInput, throttleInput, brakeInput, handbrakeInput = self._read_wheel()
+
+        # Map the raw axes [-1, 1] to controls through the precomputed response curves
+        steerCmd = self._steer_curve(steerInput)
+        throttleCmd = self._throttle_curve(throttleInput)
+        brakeCmd = self._brake_curve(brakeInput)
 
         # print("Steer: ", steerCmd, "Throttle: ", throttleCmd, "Brake: ", brakeCmd)
 
@@ -164,7 +196,7 @@ class VehicleController(object):
         self._control.brake = brakeCmd
         self._control.throttle = throttleCmd
 
-        self._control.hand_brake = bool(jsButtons[self.js_cfg['handbrake_button']])
+        self._control.hand_brake = bool(handbrakeInput)
                 
 
 
@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import NULL_PROFILER
+
+
+class DropOldestQueue(object):
+    """
+    Bounded FIFO queue that discards the oldest item instead of blocking.
+
+    Sensor callbacks must never wait on the client side, so when the consumer
+    falls behind the stale frames are dropped and counted.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = max(1, maxsize)
+        self.dropped = 0
+        self._items = deque()
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+
+    def get(self):
+        with self._lock:
+            return self._items.popleft() if self._items else None
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DecodeChannel(object):
+    """
+    Decode stage of a single sensor.
+
+    submit() is called from the CARLA callback thread and only enqueues the
+    raw sensor data. The decode function runs on the pipeline's thread pool,
+    at most one frame per channel at a time so frames are published in order,
+    and latest() hands the last decoded result to the render loop. Listeners
+    are called with (frame, result) once a frame has been published.
+
+    With decimation N only every Nth measurement is decoded, the others are
+    dropped in the callback before any work is done; 0 decodes nothing.
+    """
+    def __init__(self, pipeline, name, decode_fn, maxsize, decimation=1):
+        self.name = name
+        self.decimation = decimation
+        self.skipped = 0
+        self._received = 0
+        self._pipeline = pipeline
+        self._decode_fn = decode_fn
+        self._queue = DropOldestQueue(maxsize)
+        self._lock = threading.Lock()
+        self._busy = False
+
+        self._frame = None
+        self._result = None
+        self._listeners = []
+
+        self.decoded = 0
+        self.latency_last = 0.0
+        self.latency_max = 0.0
+        self._latency_total = 0.0
+
+    def submit(self, frame, data):
+        if self._pipeline.closed:
+            return
+        received = self._received
+        self._received = received + 1
+        if self.decimation != 1 and (self.decimation <= 0 or received % self.decimation):
+            self.skipped += 1
+            return
+        if self._pipeline.workers == 0:
+            self._decode(frame, data, time.perf_counter())
+            return
+        self._queue.put((frame, data, time.perf_counter()))
+        self._schedule()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def latest(self):
+        with self._lock:
+            return self._frame, self._result
+
+    def reset(self):
+        self._queue.clear()
+        with self._lock:
+            self._frame = None
+            self._result = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'depth': len(self._queue),
+                'dropped': self._queue.dropped,
+                'skipped': self.skipped,
+                'decoded': self.decoded,
+                'latency_last': self.latency_last,
+                'latency_avg': self._latency_total / self.decoded if self.decoded else 0.0,
+                'latency_max': self.latency_max,
+            }
+
+    def _schedule(self):
+        with self._lock:
+            if self._busy or self._pipeline.closed or not len(self._queue):
+                return
+            self._busy = True
+        try:
+            self._pipeline.executor.submit(self._run)
+        except RuntimeError:
+            # The pipeline was shut down concurrently.
+            with self._lock:
+                self._busy = False
+
+    def _run(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                self._decode(*item)
+        finally:
+            with self._lock:
+                self._busy = False
+            # A frame may have been queued after the last get() but before the
+            # channel was released.
+            self._schedule()
+
+    def _decode(self, frame, data, t_enqueue):
+        try:
+            result = self._decode_fn(data)
+        except Exception:
+            logging.exception('Failed to decode frame %s of %s', frame, self.name)
+            return
+        latency = time.perf_counter() - t_enqueue
+        with self._lock:
+            if self._frame is None or frame >= self._frame:
+                self._frame = frame
+                self._result = result
+            self.decoded += 1
+            self.latency_last = latency
+            self.latency_max = max(self.latency_max, latency)
+            self._latency_total += latency
+        for listener in self._listeners:
+            listener(frame, result)
+
+
+class DecodePipeline(object):
+    """
+    Thread pool shared by all sensor decode channels.
+
+    NumPy and pygame release the GIL for the bulk copies, so a few threads are
+    enough to keep the conversions off the CARLA callback thread.
+
+    Parameters:
+    workers (int): Number of decode threads. 0 decodes inline in the sensor callback.
+    maxsize (int): Maximum number of pending frames per sensor before the oldest is dropped.
+    profiler (Profiler): Times every decode as span 'decode.<channel name>' (default: None).
+    """
+    def __init__(self, workers=2, maxsize=2, profiler=None):
+        self.workers = max(0, workers)
+        self.maxsize = maxsize
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self.closed = False
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='decode') if self.workers else None
+        self._channels = []
+
+    def channel(self, name, decode_fn, decimation=1):
+        decode_fn = self.profiler.wrap('decode.' + name, decode_fn)
+        channel = DecodeChannel(self, name, decode_fn, self.maxsize, decimation)
+        self._channels.append(channel)
+        return channel
+
+    @property
+    def surface_buffers(self):
+        """
+        Surfaces a FrameConverter of this pipeline needs in its ring.
+
+        Up to maxsize frames are queued and one is being decoded per worker
+        while the render loop blits the last published one, so a ring larger
+        than that never reuses the surface being blitted.
+        """
+        return max(3, self.maxsize + self.workers + 2)
+
+    def remove(self, channel):
+        if channel in self._channels:
+            self._channels.remove(channel)
+
+    def stats(self):
+        return [c.stats() for c in self._channels]
+
+    def shutdown(self):
+        self.closed = True
+        for channel in self._channels:
+            channel.reset()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
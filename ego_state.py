@@ -0,0 +1,122 @@
+import math
+
+import carla
+import numpy as np
+
+CONTROL_FIELDS = ('throttle', 'steer', 'brake', 'hand_brake', 'reverse', 'manual_gear_shift', 'gear')
+WALKER_CONTROL_FIELDS = ('speed', 'jump')
+
+
+class EgoState(object):
+    """
+    State of the ego vehicle at one simulation frame.
+
+    Vectors are NumPy arrays: position, velocity, acceleration and
+    angular_velocity as (x, y, z), rotation as (pitch, yaw, roll) and control
+    as CONTROL_FIELDS. For a walker, walker is set, control stays zero and
+    walker_control holds WALKER_CONTROL_FIELDS.
+    """
+    __slots__ = ('frame', 'elapsed_seconds', 'actor_id', 'position', 'rotation',
+                 'velocity', 'acceleration', 'angular_velocity', 'control', 'walker', 'walker_control')
+
+    def __init__(self):
+        self.frame = None
+        self.elapsed_seconds = 0.0
+        self.actor_id = None
+        self.position = np.zeros(3)
+        self.rotation = np.zeros(3)
+        self.velocity = np.zeros(3)
+        self.acceleration = np.zeros(3)
+        self.angular_velocity = np.zeros(3)
+        self.control = np.zeros(len(CONTROL_FIELDS))
+        self.walker = False
+        self.walker_control = np.zeros(len(WALKER_CONTROL_FIELDS))
+
+    @property
+    def speed(self):
+        v = self.velocity
+        return math.sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+
+    @property
+    def throttle(self):
+        return self.control[0]
+
+    @property
+    def steer(self):
+        return self.control[1]
+
+    @property
+    def brake(self):
+        return self.control[2]
+
+    @property
+    def hand_brake(self):
+        return bool(self.control[3])
+
+    @property
+    def reverse(self):
+        return bool(self.control[4])
+
+    @property
+    def manual_gear_shift(self):
+        return bool(self.control[5])
+
+    @property
+    def gear(self):
+        return int(self.control[6])
+
+    @property
+    def walker_speed(self):
+        return self.walker_control[0]
+
+    @property
+    def jump(self):
+        return bool(self.walker_control[1])
+
+
+class EgoStateCache(object):
+    """
+    Per-tick cache of the ego vehicle state.
+
+    update() is called once per world tick with the carla.WorldSnapshot, and
+    everything else reads the state attribute instead of calling
+    get_transform()/get_velocity()/get_control() on the actor. Every update
+    fills a new record and then publishes it, a published record is never
+    written again, so a reader holding state keeps one consistent frame
+    however slow it is.
+    """
+    def __init__(self):
+        self.state = EgoState()
+
+    def update(self, snapshot, actor):
+        if actor is None:
+            return False
+        actor_snapshot = snapshot.find(actor.id)
+        if actor_snapshot is None:
+            return False
+
+        record = EgoState()
+        t = actor_snapshot.get_transform()
+        v = actor_snapshot.get_velocity()
+        a = actor_snapshot.get_acceleration()
+        w = actor_snapshot.get_angular_velocity()
+        # The control is part of the client side episode state, not an RPC.
+        c = actor.get_control()
+
+        record.frame = snapshot.frame
+        record.elapsed_seconds = snapshot.timestamp.elapsed_seconds
+        record.actor_id = actor.id
+        record.position[:] = (t.location.x, t.location.y, t.location.z)
+        record.rotation[:] = (t.rotation.pitch, t.rotation.yaw, t.rotation.roll)
+        record.velocity[:] = (v.x, v.y, v.z)
+        record.acceleration[:] = (a.x, a.y, a.z)
+        record.angular_velocity[:] = (w.x, w.y, w.z)
+        if isinstance(c, carla.WalkerControl):
+            record.walker = True
+            record.walker_control[:] = (c.speed, c.jump)
+        else:
+            record.control[:] = (c.throttle, c.steer, c.brake, c.hand_brake,
+                                 c.reverse, c.manual_gear_shift, c.gear)
+
+        self.state = record
+        return True
@@ -0,0 +1,315 @@
+import argparse
+import hashlib
+import importlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import yaml
+
+from controller.longitudinal import make_model
+
+# Mock carla module the stub episodes run on
+STUB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark')
+
+# Set in each worker process by _init_worker()
+_endpoint = None
+_episode = None
+
+
+def load_experiment(path):
+    with open(path, 'r') as f:
+        cfg = yaml.load(f, Loader=yaml.FullLoader) or {}
+    if not cfg.get('matrix'):
+        raise ValueError('%s has no experiment matrix' % path)
+    return cfg
+
+
+def run_id(params):
+    """Stable id of a run, the same for the same parameters across restarts."""
+    key = json.dumps(params, sort_keys=True)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def expand_matrix(cfg):
+    """
+    Return the list of runs of an experiment, one dict of parameters per
+    combination of the matrix values and repeat. Fixed parameters from
+    cfg['params'] are merged into every run.
+    """
+    matrix = cfg['matrix']
+    names = sorted(matrix)
+    values = [x if isinstance(x, list) else [x] for x in (matrix[name] for name in names)]
+    runs = []
+    for combination in itertools.product(*values):
+        for repeat in range(cfg.get('repeats', 1)):
+            params = dict(cfg.get('params', {}))
+            params.update(zip(names, combination))
+            params['repeat'] = repeat
+            params['seed'] = cfg.get('seed', 0) + repeat
+            runs.append(params)
+    return runs
+
+
+def parse_endpoint(value):
+    """Parse 'host:port[:tm_port]' into an endpoint dict."""
+    parts = value.split(':')
+    if len(parts) not in (2, 3):
+        raise ValueError('Endpoints are host:port[:tm_port], got %r' % value)
+    port = int(parts[1])
+    return {'host': parts[0], 'port': port, 'tm_port': int(parts[2]) if len(parts) == 3 else 8000 + port - 2000}
+
+
+def load_results(path):
+    """Return {run_id: record} of the finished runs in a JSONL results file."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash, the run is simply repeated.
+                continue
+            if record.get('status') == 'ok':
+                done[record['run_id']] = record
+    return done
+
+
+def install_stub():
+    """Register benchmark/fake_carla.py as the carla module of this process."""
+    if STUB_DIR not in sys.path:
+        sys.path.insert(0, STUB_DIR)
+    import fake_carla
+    fake_carla.install()
+
+
+def resolve_episode(name):
+    """
+    'carla', 'stub' (carla_episode on the mock carla module, no server),
+    'model' (model_episode, NumPy only) or 'module:function'.
+    """
+    if name == 'stub':
+        install_stub()
+        return carla_episode
+    if name == 'carla':
+        return carla_episode
+    if name == 'model':
+        return model_episode
+    module, _, function = name.partition(':')
+    return getattr(importlib.import_module(module), function)
+
+
+def _init_worker(endpoints, episode):
+    # Every worker process owns one server for its whole lifetime.
+    global _endpoint, _episode
+    _endpoint = endpoints.get()
+    _episode = resolve_episode(episode)
+
+
+def _run(params):
+    record = {'run_id': run_id(params), 'params': params, 'endpoint': '%s:%d' % (_endpoint['host'], _endpoint['port'])}
+    t = time.perf_counter()
+    try:
+        record['metrics'] = _episode(_endpoint, params)
+        record['status'] = 'ok'
+    except Exception as error:
+        record['status'] = 'error'
+        record['error'] = '%s: %s' % (type(error).__name__, error)
+    record['wall_time'] = time.perf_counter() - t
+    return record
+
+
+def following_metrics(gap, acceleration, dt):
+    """Summary metrics of a car-following run from (ticks,) gap and acceleration arrays."""
+    jerk = np.diff(acceleration) / dt if len(acceleration) > 1 else np.zeros(1)
+    return {
+        'ticks': int(len(gap)),
+        'min_gap': float(np.min(gap)),
+        'mean_gap': float(np.mean(gap)),
+        'rms_accel': float(np.sqrt(np.mean(acceleration ** 2))),
+        'max_jerk': float(np.max(np.abs(jerk))),
+        'collision': bool(np.min(gap) <= 0.0),
+    }
+
+
+def model_episode(endpoint, params):
+    """
+    Car following without CARLA: a point-mass follower behind a leader that
+    holds leader_speed and brakes to half of it midway. Only the following
+    model is exercised, a fast way to sanity check parameter sweeps.
+    """
+    rng = np.random.default_rng(params.get('seed', 0))
+    dt = params.get('delta', 0.05)
+    ticks = params.get('max_ticks', 600)
+    model = make_model(params.get('model', 'idm'), desired_speed=params.get('desired_speed', 25.0),
+                       time_headway=params.get('time_headway', 1.5))
+    leader_speed = params.get('leader_speed', 15.0)
+    gap = params.get('spacing', 15.0)
+    speed = leader_speed
+    gaps = np.empty(ticks)
+    accelerations = np.empty(ticks)
+    for tick in range(ticks):
+        v_leader = leader_speed if tick < ticks // 2 else leader_speed / 2.0
+        a = float(np.clip(model.acceleration(gap, speed, v_leader, dt), -8.0, 3.0))
+        a += rng.normal(0.0, params.get('noise', 0.0))
+        speed = max(0.0, speed + a * dt)
+        gap += (v_leader - speed) * dt
+        gaps[tick] = gap
+        accelerations[tick] = a
+    return following_metrics(gaps, accelerations, dt)
+
+
+def carla_episode(endpoint, params):
+    """Run a headless synchronous platoon episode on endpoint and return its metrics."""
+    import carla
+    from platoon import Platoon
+    from world_cache import world_metadata
+
+    client = carla.Client(endpoint['host'], endpoint['port'])
+    client.set_timeout(params.get('timeout', 20.0))
+    world = client.get_world()
+    original_settings = world.get_settings()
+    traffic_manager = client.get_trafficmanager(endpoint['tm_port'])
+    platoon = None
+    try:
+        settings = world.get_settings()
+        settings.synchronous_mode = True
+        settings.fixed_delta_seconds = params.get('delta', 0.05)
+        world.apply_settings(settings)
+        traffic_manager.set_synchronous_mode(True)
+        traffic_manager.set_random_device_seed(params.get('seed', 0))
+
+        # Shared by all episodes of this worker process as long as the map stays loaded.
+        metadata = world_metadata(world)
+        leader_bp = metadata.blueprints(params.get('leader_filter', 'charger_2020'))[0]
+        follower_bp = metadata.blueprints(params.get('filter', 'vehicle.lincoln.mkz_2020'))[0]
+        model = make_model(params.get('model', 'idm'), desired_speed=params.get('desired_speed', 25.0),
+                           time_headway=params.get('time_headway', 1.5))
+        platoon = Platoon(client, world, model)
+        spawn_point = metadata.spawn_point(params.get('spawn_point_idx', 1))
+        transforms = platoon.column_transforms(spawn_point, params.get('num_followers', 1), params.get('spacing', 15.0))
+        platoon.spawn(leader_bp, follower_bp, transforms, traffic_manager_port=endpoint['tm_port'])
+        if 'leader_speed' in params:
+            leader = world.get_actor(platoon.leader_id)
+            traffic_manager.set_desired_speed(leader, 3.6 * params['leader_speed'])
+
+        ticks = params.get('max_ticks', 600)
+        gaps = np.empty((ticks, params.get('num_followers', 1)))
+        accelerations = np.empty_like(gaps)
+        for tick in range(ticks):
+            world.tick()
+            if not platoon.tick(world.get_snapshot()):
+                raise RuntimeError('a platoon vehicle disappeared at tick %d' % tick)
+            gaps[tick] = platoon.gap
+            accelerations[tick] = platoon.acceleration
+        # Metrics of the last follower, where string instability shows up first.
+        return following_metrics(gaps[:, -1], accelerations[:, -1], settings.fixed_delta_seconds)
+    finally:
+        if platoon is not None:
+            platoon.destroy()
+        traffic_manager.set_synchronous_mode(False)
+        world.apply_settings(original_settings)
+
+
+def run_experiment(cfg, results_path, endpoints, episode='carla'):
+    """
+    Run all runs of cfg that are not yet in results_path, one worker process
+    per endpoint, appending one JSON line per finished run. Returns the
+    number of (ok, failed) runs of this invocation.
+    """
+    runs = expand_matrix(cfg)
+    done = load_results(results_path)
+    pending = [params for params in runs if run_id(params) not in done]
+    logging.info('%d runs, %d already done, %d to go on %d servers',
+                 len(runs), len(runs) - len(pending), len(pending), len(endpoints))
+    if not pending:
+        return 0, 0
+
+    manager = multiprocessing.Manager()
+    queue = manager.Queue()
+    for endpoint in endpoints:
+        queue.put(endpoint)
+
+    ok = failed = 0
+    with open(results_path, 'a') as results, \
+            ProcessPoolExecutor(max_workers=len(endpoints), initializer=_init_worker,
+                                initargs=(queue, episode)) as executor:
+        futures = [executor.submit(_run, params) for params in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            # Flushed and synced per run, so a crash loses at most the runs in flight.
+            results.write(json.dumps(record) + '\n')
+            results.flush()
+            os.fsync(results.fileno())
+            if record['status'] == 'ok':
+                ok += 1
+            else:
+                failed += 1
+                logging.warning('run %s failed on %s: %s', record['run_id'], record['endpoint'], record['error'])
+            logging.info('%d/%d runs finished', ok + failed, len(pending))
+    manager.shutdown()
+    return ok, failed
+
+
+def argparser():
+    argparser = argparse.ArgumentParser(
+        description='Run a matrix of headless CARLA experiments on a pool of servers')
+
+    argparser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        dest='debug',
+        help='print debug information')
+    argparser.add_argument(
+        'experiment',
+        help='YAML experiment file, see config/experiment_example.yaml')
+    argparser.add_argument(
+        '--out',
+        default=None,
+        help='JSONL results file, appended to and used to resume (default: <experiment name>.jsonl)')
+    argparser.add_argument(
+        '--servers',
+        nargs='+',
+        default=None,
+        help='server endpoints as host:port[:tm_port], overrides the servers of the experiment file')
+    argparser.add_argument(
+        '--episode',
+        default='carla',
+        help='episode function: carla, stub (carla episode on the mock carla module, no server), '
+             'model (NumPy following model only) or module:function (default: carla)')
+
+    return argparser.parse_args()
+
+
+def main():
+    args = argparser()
+
+    log_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(format='%(levelname)s: %(message)s', level=log_level)
+
+    cfg = load_experiment(args.experiment)
+    if args.servers:
+        endpoints = [parse_endpoint(x) for x in args.servers]
+    else:
+        endpoints = [parse_endpoint(x) if isinstance(x, str) else
+                     dict(x, tm_port=x.get('tm_port', 8000 + x['port'] - 2000))
+                     for x in cfg.get('servers', ['127.0.0.1:2000'])]
+    out = args.out or '%s.jsonl' % cfg.get('name', os.path.splitext(os.path.basename(args.experiment))[0])
+
+    try:
+        ok, failed = run_experiment(cfg, out, endpoints, args.episode)
+        logging.info('%d runs ok, %d failed, results in %s', ok, failed, out)
+    except KeyboardInterrupt:
+        print('\nCancelled by user, rerun to resume. Bye!')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import sys
+
+import numpy as np
+import pygame
+
+# CARLA cameras deliver 32-bit BGRA pixels. Read as native 32-bit words on a
+# little-endian host they are 0xAARRGGBB, so a Surface with these masks has
+# exactly the same memory layout as image.raw_data and can be filled by a
+# plain memory copy.
+if sys.byteorder == 'little':
+    BGRA_MASKS = (0x00FF0000, 0x0000FF00, 0x000000FF, 0)
+else:
+    BGRA_MASKS = (0x0000FF00, 0x00FF0000, 0xFF000000, 0)
+
+
+def bgra_array(image):
+    """Return a (height, width, 4) BGRA view of a CARLA image without copying it."""
+    array = np.frombuffer(image.raw_data, dtype=np.uint8)
+    return array.reshape(image.height, image.width, 4)
+
+
+class FrameConverter(object):
+    """
+    Convert BGRA camera buffers into preallocated pygame Surfaces.
+
+    The surfaces are allocated once per resolution and reused for every frame,
+    the raw buffer is copied straight into the surface memory without any
+    intermediate NumPy array. A ring of surfaces is kept so that the decode
+    threads never write into the surface the render loop is blitting, size
+    it with DecodePipeline.surface_buffers.
+
+    Parameters:
+    num_buffers (int): Number of surfaces in the ring (default: 3).
+    """
+    def __init__(self, num_buffers=3):
+        self.num_buffers = max(1, num_buffers)
+        self.surface = None
+        self._surfaces = []
+        self._next = 0
+        self._size = None
+
+    def _allocate(self, width, height):
+        self._surfaces = [pygame.Surface((width, height), 0, 32, BGRA_MASKS)
+                          for _ in range(self.num_buffers)]
+        self._next = 0
+        self._size = (width, height)
+
+    def convert(self, image):
+        return self.from_buffer(image.raw_data, image.width, image.height)
+
+    def from_buffer(self, raw_data, width, height):
+        if self._size != (width, height):
+            self._allocate(width, height)
+        surface = self._surfaces[self._next]
+        self._next = (self._next + 1) % self.num_buffers
+
+        src = np.frombuffer(raw_data, dtype=np.uint32).reshape(height, width)
+        # pixels2d() locks the surface, release the view before it is blitted.
+        view = pygame.surfarray.pixels2d(surface)
+        np.copyto(view.T, src)
+        del view
+
+        self.surface = surface
+        return surface
+
+    def reset(self):
+        self.surface = None
@@ -0,0 +1,90 @@
+import time
+from collections import deque
+
+import numpy as np
+
+PACING_POLICIES = ('sleep', 'sim', 'rtf', 'none')
+
+
+class FrameScheduler(object):
+    """
+    Pace the client loop without busy-waiting.
+
+    Policies:
+    'sleep' runs the loop at fps frames per second.
+    'sim' runs one loop iteration per fixed_delta_seconds of wall time, i.e. the simulation in real time.
+    'rtf' keeps simulation time / wall time at real_time_factor, using the sim time passed to wait().
+    'none' does not throttle at all, the loop runs as fast as the server ticks.
+
+    The scheduler sleeps until shortly before the deadline and only spins
+    for the last spin_threshold seconds. Frame interval jitter and the CPU
+    share of the client process are tracked over the last window frames.
+    """
+    def __init__(self, policy='sleep', fps=60.0, fixed_delta_seconds=None, real_time_factor=1.0,
+                 spin_threshold=0.001, window=300):
+        if policy not in PACING_POLICIES:
+            raise ValueError('Unknown pacing policy: %r' % policy)
+        if policy == 'sim' and not fixed_delta_seconds:
+            raise ValueError("The 'sim' pacing policy needs a fixed_delta_seconds")
+        self.policy = policy
+        self.real_time_factor = real_time_factor
+        self.spin_threshold = spin_threshold
+        if policy == 'sim':
+            self.period = fixed_delta_seconds
+        else:
+            self.period = 1.0 / fps if fps else 0.0
+
+        self._deadline = None
+        self._sim_origin = None
+        self._wall_origin = None
+
+        self._last_frame = None
+        self._intervals = deque(maxlen=window)
+        self._cpu = deque(maxlen=window)
+        self._last_cpu = None
+
+    def wait(self, sim_time=None):
+        """Block until the next frame is due. Call once per loop iteration."""
+        now = time.perf_counter()
+        if self.policy in ('sleep', 'sim'):
+            if self._deadline is None or now - self._deadline > self.period:
+                # Too late to catch up, restart the schedule instead of bursting.
+                self._deadline = now
+            else:
+                self._sleep_until(self._deadline)
+            self._deadline += self.period
+        elif self.policy == 'rtf' and sim_time is not None:
+            if self._sim_origin is None or sim_time < self._sim_origin:
+                self._sim_origin = sim_time
+                self._wall_origin = now
+            else:
+                self._sleep_until(self._wall_origin + (sim_time - self._sim_origin) / self.real_time_factor)
+        self._record()
+
+    def _sleep_until(self, deadline):
+        remaining = deadline - time.perf_counter()
+        if remaining > self.spin_threshold:
+            time.sleep(remaining - self.spin_threshold)
+        while time.perf_counter() < deadline:
+            pass
+
+    def _record(self):
+        now = time.perf_counter()
+        cpu = time.process_time()
+        if self._last_frame is not None:
+            interval = now - self._last_frame
+            self._intervals.append(interval)
+            if interval > 0.0:
+                self._cpu.append((cpu - self._last_cpu) / interval)
+        self._last_frame = now
+        self._last_cpu = cpu
+
+    def stats(self):
+        if not self._intervals:
+            return {'fps': 0.0, 'jitter': 0.0, 'cpu': 0.0}
+        intervals = np.array(self._intervals)
+        return {
+            'fps': float(1.0 / intervals.mean()),
+            'jitter': float(intervals.std()),
+            'cpu': float(np.mean(self._cpu)) if self._cpu else 0.0,
+        }
@@ -1,37 +1,56 @@
 #!/usr/bin/env python
 
+import logging
 import os
 import pygame
 import carla
 import datetime
-import math
+from collections import OrderedDict
+
+from actor_index import NearbyVehicleIndex
 
 def get_actor_display_name(actor, truncate=250):
     name = ' '.join(actor.type_id.replace('_', '.').title().split('.')[1:])
     return (name[:truncate - 1] + u'\u2026') if len(name) > truncate else name
 
 class HUD(object):
-    def __init__(self, width, height) -> None:
+    def __init__(self, width, height, headless=False, static_info=False) -> None:
         self.dim = (width, height)
+        self.headless = headless
+        # Compose the info panel once and blit it as is until its text changes.
+        self.static_info = static_info
+
+        self.server_fps = 0
+        self.frame = 0
+        self.simulation_time = 0
+        self._server_clock = pygame.time.Clock()
+        self._nearby_vehicles = NearbyVehicleIndex()
+        self._notifications = None
+        if headless:
+            # Nothing is drawn, only the server clock is kept.
+            return
 
         """Define the font to be used for the HUD"""
         font = pygame.font.Font(pygame.font.get_default_font(), 20)
         font_name = 'courier' if os.name == 'nt' else 'mono'
         fonts = [x for x in pygame.font.get_fonts() if font_name in x]
         default_font = 'ubuntumono'
-        mono = default_font if default_font in fonts else fonts[0]
-        mono = pygame.font.match_font(mono)
+        mono = default_font if default_font in fonts else (fonts[0] if fonts else None)
+        # Without any monospace system font, fall back to pygame's default font.
+        mono = pygame.font.match_font(mono) if mono is not None else None
         self._font_mono = pygame.font.Font(mono, 12 if os.name == 'nt' else 14)
+        self._text_cache = TextCache(self._font_mono)
         self._notifications = FadingText(font, (width, 40), (0, height - 40))
 
         # self.help = HelpText(pygame.font.Font(mono, 16), width, height) # TODO: implement the help text
 
-        self.server_fps = 0
-        self.frame = 0
-        self.simulation_time = 0
         self._show_info = True
         self._info_text = []
-        self._server_clock = pygame.time.Clock()
+
+        self._info_background = pygame.Surface((220, self.dim[1]))
+        self._info_background.set_alpha(100)
+        self._info_surface = None
+        self._info_surface_text = None
 
         self._show_ackermann_info = False
         self._ackermann_control = carla.VehicleAckermannControl()
@@ -41,16 +60,20 @@ class HUD(object):
         self.server_fps = self._server_clock.get_fps()
         self.frame = timestamp.frame
         self.simulation_time = timestamp.elapsed_seconds
+        self._nearby_vehicles.update(timestamp)
 
     def tick(self, world, clock) -> None:
+        if self.headless:
+            return
         self._notifications.tick(world, clock)
         if not self._show_info:
             return
         
         # Prepare the information to be displayed, then add it to the list self._info_text
-        t = world.player.get_transform()
-        v = world.player.get_velocity()
-        c = world.player.get_control()
+        ego = world.ego_state.state
+        if ego.frame is None:
+            return
+        p = ego.position
         # compass = world.imu_sensor.compass
         # heading = 'N' if compass > 270.5 or compass < 89.5 else ''
         # heading += 'S' if 90.5 < compass < 269.5 else ''
@@ -60,7 +83,6 @@ class HUD(object):
         # collision = [colhist[x + self.frame - 200] for x in range(0, 200)]
         # max_col = max(1.0, max(collision))
         # collision = [x / max_col for x in collision]
-        vehicles = world.world.get_actors().filter('vehicle.*')
         self._info_text = [
             'Server:  % 16.0f FPS' % self.server_fps,
             'Client:  % 16.0f FPS' % clock.get_fps(),
@@ -69,50 +91,70 @@ class HUD(object):
             'Map:     % 20s' % world.map.name.split('/')[-1],
             'Simulation time: % 12s' % datetime.timedelta(seconds=int(self.simulation_time)),
             '',
-            'Speed:   % 15.0f km/h' % (3.6 * math.sqrt(v.x**2 + v.y**2 + v.z**2)),
+            'Speed:   % 15.0f km/h' % (3.6 * ego.speed),
             # u'Compass:% 17.0f\N{DEGREE SIGN} % 2s' % (compass, heading),
             # 'Accelero: (%5.1f,%5.1f,%5.1f)' % (world.imu_sensor.accelerometer),
             # 'Gyroscop: (%5.1f,%5.1f,%5.1f)' % (world.imu_sensor.gyroscope),
-            'Location:% 20s' % ('(% 5.1f, % 5.1f)' % (t.location.x, t.location.y)),
+            'Location:% 20s' % ('(% 5.1f, % 5.1f)' % (p[0], p[1])),
             # 'GNSS:% 24s' % ('(% 2.6f, % 3.6f)' % (world.gnss_sensor.lat, world.gnss_sensor.lon)),
-            'Height:  % 18.0f m' % t.location.z,
+            'Height:  % 18.0f m' % p[2],
             '']
-        if isinstance(c, carla.VehicleControl):
+        if world.frame_scheduler is not None:
+            pacing = world.frame_scheduler.stats()
+            self._info_text += [
+                'Jitter:  % 15.1f ms' % (1e3 * pacing['jitter']),
+                'CPU:     % 16.0f %%' % (100 * pacing['cpu']),
+                '']
+        if world.decode_pipeline is not None:
+            decode_stats = world.decode_pipeline.stats()
+            self._info_text += [
+                'Decode:  % 15.1f ms' % (1e3 * max([x['latency_last'] for x in decode_stats] or [0.0])),
+                'Queued:  % 18d' % sum(x['depth'] for x in decode_stats),
+                'Dropped: % 18d' % sum(x['dropped'] for x in decode_stats),
+                '']
+        follower = getattr(world, 'follower', None)
+        if follower is not None:
             self._info_text += [
-                ('Throttle:', c.throttle, 0.0, 1.0),
-                ('Steer:', c.steer, -1.0, 1.0),
-                ('Brake:', c.brake, 0.0, 1.0),
-                ('Reverse:', c.reverse),
-                ('Hand brake:', c.hand_brake),
-                ('Manual:', c.manual_gear_shift),
-                'Gear:        %s' % {-1: 'R', 0: 'N'}.get(c.gear, c.gear)]
+                'Gap:     % 18.1f m' % follower.gap if follower.leader_id is not None else 'Gap:     % 20s' % '-',
+                'Leader:  % 15.0f km/h' % (3.6 * follower.leader_speed),
+                'Accel:   % 14.2f m/s2' % follower.acceleration,
+                '']
+        if not ego.walker:
+            self._info_text += [
+                ('Throttle:', ego.throttle, 0.0, 1.0),
+                ('Steer:', ego.steer, -1.0, 1.0),
+                ('Brake:', ego.brake, 0.0, 1.0),
+                ('Reverse:', ego.reverse),
+                ('Hand brake:', ego.hand_brake),
+                ('Manual:', ego.manual_gear_shift),
+                'Gear:        %s' % {-1: 'R', 0: 'N'}.get(ego.gear, ego.gear)]
             if self._show_ackermann_info:
                 self._info_text += [
                     '',
                     'Ackermann Controller:',
                     '  Target speed: % 8.0f km/h' % (3.6*self._ackermann_control.speed),
                 ]
-        elif isinstance(c, carla.WalkerControl):
+        else:
             self._info_text += [
-                ('Speed:', c.speed, 0.0, 5.556),
-                ('Jump:', c.jump)]
+                ('Speed:', ego.walker_speed, 0.0, 5.556),
+                ('Jump:', ego.jump)]
         # self._info_text += [
         #     '',
         #     'Collision:',
         #     collision,
         #     '',
         #     'Number of vehicles: % 8d' % len(vehicles)]
-        if len(vehicles) > 1:
+        profiler = getattr(world, 'profiler', None)
+        if profiler is not None and profiler.enabled:
+            self._info_text += ['', 'Stage          p50/p95/p99 ms']
+            for stage in profiler.summary(max_age=0.5):
+                self._info_text.append('%-14s %s' % (stage['name'].split('.')[-1][:14], '/'.join(
+                    '%.1f' % (1e3 * stage[x]) for x in ('p50', 'p95', 'p99'))))
+        self._nearby_vehicles.refresh_actors(world.world)
+        if len(self._nearby_vehicles) > 1:
             self._info_text += ['Nearby vehicles:']
-            distance = lambda l: math.sqrt((l.x - t.location.x)**2 + (l.y - t.location.y)**2 + (l.z - t.location.z)**2)
-            vehicles = [(distance(x.get_location()), x) for x in vehicles if x.id != world.player.id]
-            for d, vehicle in sorted(vehicles, key=lambda vehicles: vehicles[0]):
-                if d > 200.0:
-                    break
-                vehicle_type = get_actor_display_name(vehicle, truncate=22)
+            for d, vehicle_type in self._nearby_vehicles.query(ego.actor_id, p):
                 self._info_text.append('% 4dm %s' % (d, vehicle_type))
-        
-        # TODO: log the information to a file
     
     def show_ackermann_info(self, enabled):
         self._show_ackermann_info = enabled
@@ -124,51 +166,94 @@ class HUD(object):
         self._show_info = not self._show_info
     
     def notification(self, text, seconds=2.0):
+        if self._notifications is None:
+            return
         self._notifications.set_text(text, seconds=seconds)
     
     def error(self, text):
+        if self._notifications is None:
+            logging.error(text)
+            return
         self._notifications.set_text('Error: %s' % text, (255, 0, 0))
 
     def render(self, display) -> None:
-        if self._show_info:
-            info_surface = pygame.Surface((220, self.dim[1]))
-            info_surface.set_alpha(100)
-            display.blit(info_surface, (0, 0))
-            v_offset = 4
-            bar_h_offset = 100
-            bar_width = 106
-            for item in self._info_text:
-                if v_offset + 18 > self.dim[1]:
-                    break
-                if isinstance(item, list):
-                    if len(item) > 1:
-                        points = [(x + 8, v_offset + 8 + (1.0 - y) * 30) for x, y in enumerate(item)]
-                        pygame.draw.lines(display, (255, 136, 0), False, points, 2)
-                    item = None
-                    v_offset += 18
-                elif isinstance(item, tuple):
-                    if isinstance(item[1], bool):
-                        rect = pygame.Rect((bar_h_offset, v_offset + 8), (6, 6))
-                        pygame.draw.rect(display, (255, 255, 255), rect, 0 if item[1] else 1)
-                    else:
-                        rect_border = pygame.Rect((bar_h_offset, v_offset + 8), (bar_width, 6))
-                        pygame.draw.rect(display, (255, 255, 255), rect_border, 1)
-                        f = (item[1] - item[2]) / (item[3] - item[2])
-                        if item[2] < 0.0:
-                            rect = pygame.Rect((bar_h_offset + f * (bar_width - 6), v_offset + 8), (6, 6))
-                        else:
-                            rect = pygame.Rect((bar_h_offset, v_offset + 8), (f * bar_width, 6))
-                        pygame.draw.rect(display, (255, 255, 255), rect)
-                    item = item[0]
-                if item:  # At this point has to be a str.
-                    surface = self._font_mono.render(item, True, (255, 255, 255))
-                    display.blit(surface, (8, v_offset))
-                v_offset += 18
+        if self.headless:
+            return
+        if self._show_info and self.static_info:
+            if self._info_surface is None:
+                self._info_surface = pygame.Surface((220, self.dim[1]), pygame.SRCALPHA)
+            if self._info_surface_text != self._info_text:
+                self._info_surface.fill((0, 0, 0, 100))
+                self._render_info(self._info_surface)
+                self._info_surface_text = list(self._info_text)
+            display.blit(self._info_surface, (0, 0))
+        elif self._show_info:
+            display.blit(self._info_background, (0, 0))
+            self._render_info(display)
         self._notifications.render(display)
 
         # TODO: Render the help text
         # self.help.render(display)
 
+    def _render_info(self, surface):
+        v_offset = 4
+        bar_h_offset = 100
+        bar_width = 106
+        for item in self._info_text:
+            if v_offset + 18 > self.dim[1]:
+                break
+            if isinstance(item, list):
+                if len(item) > 1:
+                    points = [(x + 8, v_offset + 8 + (1.0 - y) * 30) for x, y in enumerate(item)]
+                    pygame.draw.lines(surface, (255, 136, 0), False, points, 2)
+                item = None
+                v_offset += 18
+            elif isinstance(item, tuple):
+                if isinstance(item[1], bool):
+                    rect = pygame.Rect((bar_h_offset, v_offset + 8), (6, 6))
+                    pygame.draw.rect(surface, (255, 255, 255), rect, 0 if item[1] else 1)
+                else:
+                    rect_border = pygame.Rect((bar_h_offset, v_offset + 8), (bar_width, 6))
+                    pygame.draw.rect(surface, (255, 255, 255), rect_border, 1)
+                    f = (item[1] - item[2]) / (item[3] - item[2])
+                    if item[2] < 0.0:
+                        rect = pygame.Rect((bar_h_offset + f * (bar_width - 6), v_offset + 8), (6, 6))
+                    else:
+                        rect = pygame.Rect((bar_h_offset, v_offset + 8), (f * bar_width, 6))
+                    pygame.draw.rect(surface, (255, 255, 255), rect)
+                item = item[0]
+            if item:  # At this point has to be a str.
+                surface.blit(self._text_cache.render(item), (8, v_offset))
+            v_offset += 18
+
+class TextCache(object):
+    """
+    Rendered text Surfaces keyed by (text, color), the least recently used one is dropped when full.
+
+    Parameters:
+    font (pygame.font.Font): font the text is rendered with.
+    maxsize (int): number of Surfaces kept (default: 256).
+    """
+    def __init__(self, font, maxsize=256):
+        self.font = font
+        self.maxsize = maxsize
+        self._surfaces = OrderedDict()
+
+    def render(self, text, color=(255, 255, 255)):
+        key = (text, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            return surface
+        surface = self.font.render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.maxsize:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def __len__(self):
+        return len(self._surfaces)
+
 class FadingText(object):
     def __init__(self, font, dim, pos):
         self.font = font
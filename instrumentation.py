@@ -0,0 +1,145 @@
+import csv
+import json
+import threading
+import time
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+SUMMARY_FIELDS = ('name', 'count', 'mean', 'p50', 'p95', 'p99', 'max')
+
+
+class _Span(object):
+    __slots__ = ('_profiler', '_name', '_t0')
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+        self._t0 = 0.0
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._profiler.record(self._name, time.perf_counter() - self._t0)
+        return False
+
+
+class _NullSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Stage(object):
+    __slots__ = ('samples', 'count', 'total', 'max')
+
+    def __init__(self, capacity):
+        self.samples = np.zeros(capacity)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class Profiler(object):
+    """
+    Named timing spans with percentile summaries.
+
+        with profiler.span('hud.tick'):
+            hud.tick(world, clock)
+
+    The last capacity durations of every span are kept in a ring buffer, from
+    which summary() computes count, mean, p50/p95/p99 and max. Spans may be
+    recorded from any thread. A disabled profiler returns one shared no-op
+    span and wrap() returns the function unchanged, so instrumented code costs
+    a method call per span when profiling is off.
+
+    Parameters:
+    enabled (bool): Record spans (default: True).
+    capacity (int): Number of durations kept per span (default: 4096).
+    """
+    def __init__(self, enabled=True, capacity=4096):
+        self.enabled = enabled
+        self.capacity = capacity
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._summary = None
+        self._summary_time = 0.0
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def wrap(self, name, fn):
+        """Return fn timed as span name, or fn itself when disabled."""
+        if not self.enabled:
+            return fn
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - t0)
+        return timed
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = _Stage(self.capacity)
+            stage.samples[stage.count % self.capacity] = seconds
+            stage.count += 1
+            stage.total += seconds
+            if seconds > stage.max:
+                stage.max = seconds
+
+    def summary(self, max_age=0.0):
+        """
+        Return [{name, count, mean, p50, p95, p99, max}] in seconds, sorted by
+        name. Percentiles cover the last capacity spans, count, mean and max the
+        whole run. A summary younger than max_age seconds is reused.
+        """
+        now = time.perf_counter()
+        if self._summary is not None and now - self._summary_time < max_age:
+            return self._summary
+        with self._lock:
+            stages = [(name, stage.count, stage.total, stage.max,
+                       stage.samples[:min(stage.count, self.capacity)].copy())
+                      for name, stage in sorted(self._stages.items())]
+        summary = []
+        for name, count, total, maximum, samples in stages:
+            row = {'name': name, 'count': count, 'mean': total / count if count else 0.0}
+            for q, value in zip(PERCENTILES, np.percentile(samples, PERCENTILES) if count else [0.0] * 3):
+                row['p%d' % q] = float(value)
+            row['max'] = maximum
+            summary.append(row)
+        self._summary = summary
+        self._summary_time = now
+        return summary
+
+    def dump(self, path):
+        """Write the summary to path, as CSV if it ends with .csv and JSON otherwise."""
+        summary = self.summary()
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+                writer.writeheader()
+                writer.writerows(summary)
+        else:
+            with open(path, 'w') as f:
+                json.dump(summary, f, indent=2)
+
+
+NULL_PROFILER = Profiler(enabled=False)
@@ -0,0 +1,176 @@
+import numpy as np
+import pygame
+
+from frame_converter import BGRA_MASKS
+
+# Floats per point in carla.LidarMeasurement and carla.SemanticLidarMeasurement raw_data.
+LIDAR_POINT_SIZE = 4 # x, y, z, intensity
+SEMANTIC_LIDAR_POINT_SIZE = 6 # x, y, z, cos_inc_angle, object_idx (uint32), object_tag (uint32)
+
+# CARLA semantic tags, CityScapes palette.
+SEMANTIC_COLORS = [
+    (0, 0, 0),        # Unlabeled
+    (128, 64, 128),   # Road
+    (244, 35, 232),   # Sidewalk
+    (70, 70, 70),     # Building
+    (102, 102, 156),  # Wall
+    (190, 153, 153),  # Fence
+    (153, 153, 153),  # Pole
+    (250, 170, 30),   # TrafficLight
+    (220, 220, 0),    # TrafficSign
+    (107, 142, 35),   # Vegetation
+    (152, 251, 152),  # Terrain
+    (70, 130, 180),   # Sky
+    (220, 20, 60),    # Pedestrian
+    (255, 0, 0),      # Rider
+    (0, 0, 142),      # Car
+    (0, 0, 70),       # Truck
+    (0, 60, 100),     # Bus
+    (0, 80, 100),     # Train
+    (0, 0, 230),      # Motorcycle
+    (119, 11, 32),    # Bicycle
+    (110, 190, 160),  # Static
+    (170, 120, 50),   # Dynamic
+    (55, 90, 80),     # Other
+    (45, 60, 150),    # Water
+    (157, 234, 50),   # RoadLine
+    (81, 0, 81),      # Ground
+    (150, 100, 100),  # Bridge
+    (230, 150, 140),  # RailTrack
+    (180, 165, 180),  # GuardRail
+]
+
+# Anchors of the viridis colour map used for intensities.
+_VIRIDIS = [(68, 1, 84), (59, 82, 139), (33, 145, 140), (94, 201, 98), (253, 231, 37)]
+
+
+def intensity_lut(size=256):
+    x = np.linspace(0.0, 1.0, size)
+    anchors = np.linspace(0.0, 1.0, len(_VIRIDIS))
+    colors = np.array(_VIRIDIS, dtype=np.float64)
+    return np.stack([np.interp(x, anchors, colors[:, c]) for c in range(3)], axis=1).astype(np.uint8)
+
+
+def semantic_lut(size=256):
+    lut = np.full((size, 3), 255, dtype=np.uint8)
+    lut[:len(SEMANTIC_COLORS)] = SEMANTIC_COLORS
+    return lut
+
+
+class BEVRasterizer(object):
+    """
+    Bird's-eye view rasterizer for LiDAR point clouds.
+
+    All working buffers are allocated once and grown only when a sweep holds
+    more points than any previous one. The image is kept as packed 32-bit
+    pixels with one spare row and column: out-of-range points are clamped
+    onto that border instead of being filtered, so every step is a single
+    in-place NumPy operation.
+
+    Parameters:
+    size (tuple): (width, height) of the image in pixels.
+    lidar_range (float): Range of the sensor in meters, the image covers [-range, range].
+    point_size (int): Floats per point, LIDAR_POINT_SIZE or SEMANTIC_LIDAR_POINT_SIZE.
+    color_mode (str): 'white', 'intensity' or 'semantic'.
+    num_buffers (int): Number of output surfaces in the ring used by render().
+    """
+    def __init__(self, size, lidar_range, point_size=LIDAR_POINT_SIZE, color_mode='white', num_buffers=3):
+        self.size = (int(size[0]), int(size[1]))
+        self.point_size = point_size
+        self.color_mode = color_mode
+        self._scale = np.float32(min(self.size) / (2.0 * float(lidar_range)))
+        self._center = (np.float32(0.5 * self.size[0]), np.float32(0.5 * self.size[1]))
+
+        if color_mode == 'white':
+            lut = np.full((1, 3), 255, dtype=np.uint8)
+        elif color_mode == 'intensity':
+            lut = intensity_lut()
+        elif color_mode == 'semantic':
+            if point_size != SEMANTIC_LIDAR_POINT_SIZE:
+                raise ValueError('Semantic colours need semantic LiDAR points')
+            lut = semantic_lut()
+        else:
+            raise ValueError('Unknown color mode: %r' % color_mode)
+        lut = lut.astype(np.uint32)
+        # Same pixel layout as FrameConverter surfaces.
+        self._lut = (lut[:, 0] << 16) | (lut[:, 1] << 8) | lut[:, 2]
+
+        # Indexed as [x, y] like pygame.surfarray, the last row and column
+        # collect the clipped points.
+        width, height = self.size
+        self._canvas = np.zeros((width + 1, height + 1), dtype=np.uint32)
+        self._canvas_flat = self._canvas.reshape(-1)
+        self.pixels = self._canvas[:width, :height]
+
+        self._capacity = 0
+        self._reserve(1024)
+
+        self._surfaces = [pygame.Surface(self.size, 0, 32, BGRA_MASKS) for _ in range(max(1, num_buffers))]
+        self._next = 0
+
+    def _reserve(self, n):
+        if n <= self._capacity:
+            return
+        capacity = max(n, 2 * self._capacity)
+        self._coord = np.empty(capacity, dtype=np.float32)
+        self._ix = np.empty(capacity, dtype=np.intp)
+        self._iy = np.empty(capacity, dtype=np.intp)
+        self._values = np.empty(capacity, dtype=np.intp)
+        self._colors = np.empty(capacity, dtype=np.uint32)
+        self._capacity = capacity
+
+    def _to_cells(self, column, center, limit, out):
+        coord = self._coord[:len(column)]
+        np.multiply(column, self._scale, out=coord)
+        coord += center
+        np.floor(coord, out=coord)
+        np.copyto(out, coord, casting='unsafe')
+        # Seen as unsigned, negative cells are huge, so one minimum clamps
+        # both sides onto the spare border.
+        unsigned = out.view(np.uintp)
+        np.minimum(unsigned, limit, out=unsigned)
+        return out
+
+    def _color(self, points, n):
+        if self.color_mode == 'white':
+            return self._lut[0]
+        values = self._values[:n]
+        top = len(self._lut) - 1
+        if self.color_mode == 'intensity':
+            coord = self._coord[:n]
+            np.multiply(points[:, 3], np.float32(top), out=coord)
+            np.copyto(values, coord, casting='unsafe')
+        else:
+            np.copyto(values, points[:, 5].view(np.uint32), casting='unsafe')
+        unsigned = values.view(np.uintp)
+        np.minimum(unsigned, top, out=unsigned)
+        colors = self._colors[:n]
+        np.take(self._lut, values, out=colors)
+        return colors
+
+    def rasterize(self, raw_data):
+        """Draw one sweep into self.pixels and return it."""
+        points = np.frombuffer(raw_data, dtype=np.float32).reshape(-1, self.point_size)
+        n = len(points)
+        self._reserve(n)
+        width, height = self.size
+
+        colors = self._color(points, n)
+        ix = self._to_cells(points[:, 0], self._center[0], width, self._ix[:n])
+        iy = self._to_cells(points[:, 1], self._center[1], height, self._iy[:n])
+        ix *= height + 1
+        ix += iy
+
+        self._canvas.fill(0)
+        self._canvas_flat[ix] = colors
+        return self.pixels
+
+    def render(self, raw_data):
+        """Rasterize one sweep and return it as a pygame Surface."""
+        self.rasterize(raw_data)
+        surface = self._surfaces[self._next]
+        self._next = (self._next + 1) % len(self._surfaces)
+        view = pygame.surfarray.pixels2d(surface)
+        np.copyto(view, self.pixels)
+        del view
+        return surface
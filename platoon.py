@@ -0,0 +1,160 @@
+import math
+
+import carla
+import numpy as np
+
+from controller.longitudinal import accel_to_pedals, following_gap
+from world_cache import world_metadata
+
+# Columns of Platoon.state
+STATE_FIELDS = ('x', 'y', 'z', 'yaw', 'speed')
+X, Y, Z, YAW, SPEED = range(len(STATE_FIELDS))
+
+
+class Platoon(object):
+    """
+    One leader on autopilot followed by a column of vehicles driven by a
+    car-following model.
+
+    All vehicles are spawned with a single apply_batch_sync() call. Every tick
+    the state of the whole column is copied from the carla.WorldSnapshot into
+    a preallocated (N + 1, 5) matrix, the model computes the commands of all
+    followers in one NumPy step, and they are sent with one apply_batch() of
+    ApplyVehicleControl commands. Follower i follows vehicle i - 1, row 0
+    being the leader. Lateral control is pure pursuit on the predecessor.
+
+    Parameters:
+    client (carla.Client): Client used for the batch commands.
+    world (carla.World): The simulation world.
+    model: Vectorized car-following model, see controller.longitudinal.
+    max_accel (float): Acceleration giving full throttle in m/s^2 (default: 3.0).
+    max_decel (float): Deceleration giving full brake in m/s^2 (default: 8.0).
+    wheelbase (float): Wheelbase used by pure pursuit in m (default: 2.9).
+    max_steer_angle (float): Wheel angle of full steer in degrees (default: 70.0).
+    """
+    def __init__(self, client, world, model, max_accel=3.0, max_decel=8.0, wheelbase=2.9, max_steer_angle=70.0):
+        self.client = client
+        self.world = world
+        self.model = model
+        self.max_accel = max_accel
+        self.max_decel = max_decel
+        self.wheelbase = wheelbase
+        self.max_steer = math.radians(max_steer_angle)
+        self.ids = []
+        self.state = np.zeros((0, len(STATE_FIELDS)))
+        self.half_lengths = np.zeros(0)
+        self.acceleration = np.zeros(0)
+        self.gap = np.zeros(0)
+        self.commands = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def leader_id(self):
+        return self.ids[0] if self.ids else None
+
+    @property
+    def follower_ids(self):
+        return self.ids[1:]
+
+    def column_transforms(self, leader_transform, num_followers, spacing):
+        """Place num_followers transforms behind leader_transform along its lane, spacing meters apart."""
+        transforms = [leader_transform]
+        waypoint = world_metadata(self.world).map.get_waypoint(leader_transform.location)
+        for _ in range(num_followers):
+            previous = waypoint.previous(spacing)
+            if not previous:
+                raise ValueError('The lane is too short for %d followers %.1f m apart' % (num_followers, spacing))
+            waypoint = previous[0]
+            transform = waypoint.transform
+            transform.location.z = leader_transform.location.z
+            transforms.append(transform)
+        return transforms
+
+    def spawn(self, leader_blueprint, follower_blueprint, transforms, traffic_manager_port=8000):
+        """Spawn the leader at transforms[0] and one follower at every other transform in one batch."""
+        SpawnActor = carla.command.SpawnActor
+        SetAutopilot = carla.command.SetAutopilot
+        FutureActor = carla.command.FutureActor
+        batch = [SpawnActor(leader_blueprint, transforms[0]).then(
+            SetAutopilot(FutureActor, True, traffic_manager_port))]
+        batch += [SpawnActor(follower_blueprint, transform) for transform in transforms[1:]]
+
+        ids = []
+        errors = []
+        sync = self.world.get_settings().synchronous_mode
+        for response in self.client.apply_batch_sync(batch, sync):
+            if response.error:
+                errors.append(response.error)
+            else:
+                ids.append(response.actor_id)
+        if errors:
+            self.client.apply_batch([carla.command.DestroyActor(x) for x in ids])
+            raise RuntimeError('Failed to spawn the platoon: %s' % '; '.join(errors))
+
+        self.ids = ids
+        n = len(ids)
+        self.state = np.zeros((n, len(STATE_FIELDS)))
+        # get_actors() does not keep the order of ids.
+        actors = self.world.get_actors(ids)
+        self.half_lengths = np.array([actors.find(x).bounding_box.extent.x for x in ids])
+        self.acceleration = np.zeros(n - 1)
+        self.gap = np.zeros(n - 1)
+        self.model.reset()
+        return ids
+
+    def update(self, snapshot):
+        """Copy the state of the column from the snapshot. Returns False if a vehicle is missing."""
+        state = self.state
+        for row, actor_id in enumerate(self.ids):
+            actor_snapshot = snapshot.find(actor_id)
+            if actor_snapshot is None:
+                return False
+            t = actor_snapshot.get_transform()
+            v = actor_snapshot.get_velocity()
+            state[row] = (t.location.x, t.location.y, t.location.z, t.rotation.yaw,
+                          math.sqrt(v.x * v.x + v.y * v.y + v.z * v.z))
+        return True
+
+    def step(self, dt):
+        """Compute (throttle, steer, brake) arrays of all followers from the current state."""
+        state = self.state
+        follower = state[1:]
+        predecessor = state[:-1]
+        lengths = self.half_lengths[1:] + self.half_lengths[:-1]
+        self.gap = following_gap(follower[:, X:Z + 1], follower[:, YAW], predecessor[:, X:Z + 1], lengths)
+        self.acceleration = self.model.acceleration(self.gap, follower[:, SPEED], predecessor[:, SPEED], dt)
+        throttle, brake = accel_to_pedals(self.acceleration, self.max_accel, self.max_decel)
+
+        # Pure pursuit towards the rear of the predecessor.
+        dx = predecessor[:, X] - follower[:, X]
+        dy = predecessor[:, Y] - follower[:, Y]
+        lookahead = np.maximum(np.hypot(dx, dy), 1.0)
+        alpha = np.arctan2(dy, dx) - np.radians(follower[:, YAW])
+        alpha = (alpha + np.pi) % (2.0 * np.pi) - np.pi
+        angle = np.arctan2(2.0 * self.wheelbase * np.sin(alpha), lookahead)
+        steer = np.clip(angle / self.max_steer, -1.0, 1.0)
+        return throttle, steer, brake
+
+    def apply(self, throttle, steer, brake):
+        """Send the controls of all followers in one batch."""
+        ApplyVehicleControl = carla.command.ApplyVehicleControl
+        VehicleControl = carla.VehicleControl
+        self.commands = [ApplyVehicleControl(actor_id, VehicleControl(throttle=t, steer=s, brake=b))
+                         for actor_id, t, s, b in zip(self.follower_ids, throttle.tolist(),
+                                                      steer.tolist(), brake.tolist())]
+        self.client.apply_batch(self.commands)
+
+    def tick(self, snapshot):
+        """update(), step() and apply() for one simulation tick."""
+        if not self.update(snapshot):
+            return False
+        self.apply(*self.step(snapshot.timestamp.delta_seconds))
+        return True
+
+    def destroy(self):
+        if self.ids:
+            self.client.apply_batch_sync([carla.command.DestroyActor(x) for x in self.ids],
+                                         self.world.get_settings().synchronous_mode)
+        self.ids = []
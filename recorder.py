@@ -0,0 +1,189 @@
+import csv
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+INDEX_FILE = 'index.csv'
+INDEX_FIELDS = ('frame', 'timestamp', 'segment', 'entry', 'width', 'height', 'compressed')
+
+
+class FrameRecorder(object):
+    """
+    Record camera frames in the background.
+
+    record() only copies the raw BGRA buffer and hands it to a writer thread,
+    which packs the frames into zip segments of segment_frames entries each
+    and appends one line per frame to index.csv. The lines of a segment are
+    written and flushed when the segment is closed, so after a crash the
+    index lists exactly the frames of the complete segments and only the
+    open segment is lost.
+
+    Parameters:
+    out_dir (str): Directory of the recording, created if needed.
+    segment_frames (int): Frames per zip segment.
+    compress (bool): Store the frames zlib-compressed (lossless).
+    compress_workers (int): Size of the process pool used for compression. 0 compresses on the writer thread.
+    max_pending (int): Frames waiting for the writer before new ones are dropped.
+    """
+    def __init__(self, out_dir, segment_frames=300, compress=False, compress_workers=0, max_pending=64):
+        self.out_dir = out_dir
+        self.segment_frames = segment_frames
+        self.compress = compress
+        self.written = 0
+        self.dropped = 0
+
+        os.makedirs(out_dir, exist_ok=True)
+        index_path = os.path.join(out_dir, INDEX_FILE)
+        new_index = not os.path.exists(index_path)
+        self._index_file = open(index_path, 'a', newline='')
+        self._index = csv.writer(self._index_file)
+        if new_index:
+            self._index.writerow(INDEX_FIELDS)
+
+        self._segment = None
+        self._segment_rows = []
+        self._segment_count = len([x for x in os.listdir(out_dir) if x.startswith('segment_')])
+        self._segment_size = 0
+
+        self._max_in_flight = 2 * compress_workers
+        self._pool = None
+        if compress and compress_workers > 0:
+            # Forking a process that runs the CARLA client and pygame threads can deadlock the children.
+            self._pool = ProcessPoolExecutor(compress_workers, mp_context=multiprocessing.get_context('spawn'))
+        self._pending = deque()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='recorder', daemon=True)
+        self._thread.start()
+
+    def record(self, image):
+        if self._closed:
+            return
+        item = (image.frame, image.timestamp, image.width, image.height, bytes(image.raw_data))
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown()
+        self._close_segment()
+        self._index_file.close()
+        logging.info('Recorded %d frames to %s (%d dropped)', self.written, self.out_dir, self.dropped)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            frame, timestamp, width, height, data = item
+            if self._pool is not None:
+                payload = self._pool.submit(zlib.compress, data, 1)
+            elif self.compress:
+                payload = zlib.compress(data, 1)
+            else:
+                payload = data
+            self._pending.append((frame, timestamp, width, height, payload))
+            self._flush(block=self._pool is not None and len(self._pending) > self._max_in_flight)
+        self._flush(block=True, drain=True)
+
+    def _flush(self, block=False, drain=False):
+        # Frames are written in arrival order, waiting for the oldest pending
+        # compression only when too many are in flight.
+        while self._pending:
+            frame, timestamp, width, height, payload = self._pending[0]
+            if not isinstance(payload, bytes):
+                if not (payload.done() or block):
+                    return
+                payload = payload.result()
+            self._pending.popleft()
+            self._write(frame, timestamp, width, height, payload)
+            block = drain
+
+    def _write(self, frame, timestamp, width, height, payload):
+        if self._segment is None or self._segment_size >= self.segment_frames:
+            self._close_segment()
+            self._segment_name = 'segment_%05d.zip' % self._segment_count
+            self._segment = zipfile.ZipFile(
+                os.path.join(self.out_dir, self._segment_name), 'w', zipfile.ZIP_STORED)
+            self._segment_count += 1
+            self._segment_size = 0
+        entry = '%08d.bgra%s' % (frame, '.z' if self.compress else '')
+        self._segment.writestr(entry, payload)
+        self._segment_size += 1
+        self._segment_rows.append((frame, timestamp, self._segment_name, entry, width, height, int(self.compress)))
+        self.written += 1
+
+    def _close_segment(self):
+        # The zip central directory is only written on close, index its frames once they are readable.
+        if self._segment is None:
+            return
+        self._segment.close()
+        self._segment = None
+        self._index.writerows(self._segment_rows)
+        self._index_file.flush()
+        self._segment_rows = []
+
+
+class RecordingReader(object):
+    """
+    Random access to a recording written by FrameRecorder.
+
+    Only index.csv is parsed on open, frames are read from their segment on
+    demand so a run can be sliced without touching the other segments.
+    """
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self._segments = {}
+        with open(os.path.join(out_dir, INDEX_FILE), newline='') as f:
+            self._index = {}
+            for row in csv.DictReader(f):
+                self._index[int(row['frame'])] = row
+        self.frames = sorted(self._index)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def timestamp(self, frame):
+        return float(self._index[frame]['timestamp'])
+
+    def read(self, frame):
+        row = self._index[frame]
+        segment = self._segments.get(row['segment'])
+        if segment is None:
+            segment = zipfile.ZipFile(os.path.join(self.out_dir, row['segment']), 'r')
+            self._segments[row['segment']] = segment
+        data = segment.read(row['entry'])
+        if int(row['compressed']):
+            data = zlib.decompress(data)
+        width, height = int(row['width']), int(row['height'])
+        array = np.frombuffer(data, dtype=np.uint8)
+        if array.size == width * height * 4:
+            array = array.reshape(height, width, 4)
+        return array
+
+    def slice(self, start=None, stop=None, step=1):
+        """Yield (frame, array) for the recorded frames in [start, stop)."""
+        frames = [f for f in self.frames
+                  if (start is None or f >= start) and (stop is None or f < stop)]
+        for frame in frames[::step]:
+            yield frame, self.read(frame)
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+        self._segments = {}
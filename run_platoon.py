@@ -0,0 +1,174 @@
+import argparse
+import logging
+import sys
+import time
+
+import carla
+import numpy as np
+
+from controller.longitudinal import FOLLOWING_MODELS, make_model
+from platoon import Platoon
+from world_cache import world_metadata
+
+
+def argparser():
+    argparser = argparse.ArgumentParser(
+        description='CARLA platoon of car-following vehicles behind one leader')
+
+    argparser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        dest='debug',
+        help='print debug information')
+    argparser.add_argument(
+        '--host',
+        metavar='H',
+        default='127.0.0.1',
+        help='IP of the host server (default: 127.0.0.1)')
+    argparser.add_argument(
+        '-p', '--port',
+        metavar='P',
+        default=2000,
+        type=int,
+        help='TCP port to listen to (default: 2000)')
+    argparser.add_argument(
+        '--tm_port',
+        default=8000,
+        type=int,
+        help='port of the traffic manager driving the leader (default: 8000)')
+    argparser.add_argument(
+        '-n', '--num_followers',
+        default=10,
+        type=int,
+        help='number of following vehicles (default: 10)')
+    argparser.add_argument(
+        '--model',
+        default='idm',
+        choices=FOLLOWING_MODELS,
+        help='car-following model of the followers (default: idm)')
+    argparser.add_argument(
+        '--desired_speed',
+        default=25.0,
+        type=float,
+        help='cruise speed of the followers in m/s (default: 25.0)')
+    argparser.add_argument(
+        '--time_headway',
+        default=1.5,
+        type=float,
+        help='desired time gap of the followers in s (default: 1.5)')
+    argparser.add_argument(
+        '--spacing',
+        default=15.0,
+        type=float,
+        help='initial distance between consecutive vehicles in m (default: 15.0)')
+    argparser.add_argument(
+        '--spawn_point_idx',
+        default=1,
+        type=int,
+        help='spawn point of the leader (default: 1)')
+    argparser.add_argument(
+        '--filter',
+        metavar='PATTERN',
+        default='vehicle.*',
+        help='actor filter of the followers (default: "vehicle.*")')
+    argparser.add_argument(
+        '--generation',
+        metavar='G',
+        default='2',
+        help='restrict to certain actor generation (values: "1","2","All" - default: "2")')
+    argparser.add_argument(
+        '--leader_filter',
+        default='charger_2020',
+        help='actor filter of the leader (default: "charger_2020")')
+    argparser.add_argument(
+        '--delta',
+        default=0.05,
+        type=float,
+        help='fixed simulation time step in s (default: 0.05)')
+    argparser.add_argument(
+        '--max_ticks',
+        default=None,
+        type=int,
+        help='stop after this many simulation ticks (default: None --> run until cancelled)')
+
+    return argparser.parse_args()
+
+
+def run(args):
+    client = carla.Client(args.host, args.port)
+    client.set_timeout(20.0)
+    world = client.get_world()
+    original_settings = world.get_settings()
+    traffic_manager = client.get_trafficmanager(args.tm_port)
+    platoon = None
+    ticks = 0
+    control_time = 0.0
+    min_gap = None
+
+    try:
+        # The platoon runs lock-step with the server, one control update per tick.
+        settings = world.get_settings()
+        settings.synchronous_mode = True
+        settings.fixed_delta_seconds = args.delta
+        world.apply_settings(settings)
+        traffic_manager.set_synchronous_mode(True)
+
+        metadata = world_metadata(world)
+        blueprints = metadata.blueprints(args.filter, args.generation)
+        follower_bps = [x for x in blueprints if metadata.attribute(x, 'number_of_wheels') == '4']
+        if not follower_bps:
+            logging.error('no four-wheeled vehicle blueprint matches --filter %s --generation %s',
+                          args.filter, args.generation)
+            sys.exit(1)
+        leader_bps = metadata.blueprints(args.leader_filter)
+        if not leader_bps:
+            logging.error('no blueprint matches --leader_filter %s', args.leader_filter)
+            sys.exit(1)
+        follower_bp = follower_bps[0]
+        leader_bp = leader_bps[0]
+
+        model = make_model(args.model, desired_speed=args.desired_speed, time_headway=args.time_headway)
+        platoon = Platoon(client, world, model)
+        spawn_point = metadata.spawn_point(args.spawn_point_idx)
+        transforms = platoon.column_transforms(spawn_point, args.num_followers, args.spacing)
+        platoon.spawn(leader_bp, follower_bp, transforms, traffic_manager_port=args.tm_port)
+        logging.info('spawned a platoon of 1 + %d vehicles', args.num_followers)
+
+        min_gap = np.full(args.num_followers, np.inf)
+        while args.max_ticks is None or ticks < args.max_ticks:
+            world.tick()
+            t = time.perf_counter()
+            if not platoon.tick(world.get_snapshot()):
+                logging.warning('a platoon vehicle disappeared, stopping')
+                break
+            control_time += time.perf_counter() - t
+            np.minimum(min_gap, platoon.gap, out=min_gap)
+            ticks += 1
+
+    finally:
+        if ticks:
+            logging.info('%d ticks, control %.3f ms per tick for %d followers',
+                         ticks, 1e3 * control_time / ticks, args.num_followers)
+            logging.info('minimum gap per follower: %s', np.array2string(min_gap, precision=1))
+        if platoon is not None:
+            platoon.destroy()
+        traffic_manager.set_synchronous_mode(False)
+        world.apply_settings(original_settings)
+
+
+def main():
+    args = argparser()
+
+    log_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(format='%(levelname)s: %(message)s', level=log_level)
+
+    logging.info('listening to server %s:%s', args.host, args.port)
+
+    try:
+        run(args)
+    except KeyboardInterrupt:
+        print('\nCancelled by user. Bye!')
+
+
+if __name__ == "__main__":
+    main()
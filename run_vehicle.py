@@ -1,6 +1,8 @@
 
 import argparse
 import logging
+import os
+import time
 
 import random
 import pygame
@@ -8,14 +10,25 @@ import carla
 import sys
 from hud import HUD
 from camera import DrivingViewCamera, DepthCamera
+from decode_pipeline import DecodePipeline
+from ego_state import EgoStateCache
+from frame_scheduler import FrameScheduler, PACING_POLICIES
+from instrumentation import Profiler
+from sensor_sync import SensorSync, STALE_POLICIES
 
 # from controller import KeyboardControl
 # from controller import SteeringWheelControl
 # from old_controller import KeyboardControl
 
 from controller.vehicle_controller import VehicleController
+from controller.input_sampler import SAMPLE_FIELDS
+from controller.longitudinal import CarFollowingController, FOLLOWING_MODELS, make_model
 
-from utils import get_actor_blueprints, get_actor_display_name
+from utils import get_actor_display_name
+from world_cache import world_metadata
+from spawn_planner import SpawnPlanner
+from telemetry import CarFollowingTelemetry, TelemetryLogger
+from session_replay import SessionRecorder, carla_recorder_name, load_session
 
 def argparser():
     argparser = argparse.ArgumentParser(
@@ -75,16 +88,149 @@ def argparser():
         default=None,
         type=int,
         help='spawn point index (default: None --> random)')
+    argparser.add_argument(
+        '--decode_workers',
+        default=2,
+        type=int,
+        help='number of sensor decode threads, 0 decodes in the sensor callback (default: 2)')
+    argparser.add_argument(
+        '--decode_queue',
+        default=2,
+        type=int,
+        help='pending frames per sensor before the oldest is dropped (default: 2)')
+    argparser.add_argument(
+        '--sync_timeout',
+        default=1.0,
+        type=float,
+        help='seconds to wait for all sensors to deliver a frame in synchronous mode (default: 1.0)')
+    argparser.add_argument(
+        '--stale_policy',
+        default='latest',
+        choices=STALE_POLICIES,
+        help='what to do when a sensor misses the sync timeout (default: latest)')
+    argparser.add_argument(
+        '--depth_tick',
+        default=DepthCamera.SENSOR_TICK,
+        type=float,
+        help='seconds between two depth camera frames, 0 for every tick (default: %s)' % DepthCamera.SENSOR_TICK)
+    argparser.add_argument(
+        '--depth_scale',
+        default=DepthCamera.RESOLUTION_SCALE,
+        type=float,
+        help='depth camera resolution relative to the display (default: %s)' % DepthCamera.RESOLUTION_SCALE)
+    argparser.add_argument(
+        '--headless',
+        action='store_true',
+        help='run without a display, camera frames are kept as NumPy arrays')
+    argparser.add_argument(
+        '--static_hud',
+        action='store_true',
+        help='compose the HUD info panel once and reuse it until its text changes, slower when it changes every frame')
+    argparser.add_argument(
+        '--pacing',
+        default=None,
+        choices=PACING_POLICIES,
+        help='frame pacing policy, sim needs --sync (default: none in sync or headless mode, sleep otherwise)')
+    argparser.add_argument(
+        '--fps',
+        default=60.0,
+        type=float,
+        help='target frame rate of the sleep pacing policy (default: 60)')
+    argparser.add_argument(
+        '--rtf',
+        default=1.0,
+        type=float,
+        help='target real-time factor of the rtf pacing policy (default: 1.0)')
+    argparser.add_argument(
+        '--input_rate',
+        default=500.0,
+        type=float,
+        help='steering wheel sampling rate in Hz, 0 reads the wheel once per frame (default: 500)')
+    argparser.add_argument(
+        '--input_log',
+        default=None,
+        help='stream the sampled wheel inputs to this .npz, .csv or .parquet file, needs --input_rate (default: None)')
+    argparser.add_argument(
+        '--leader_gap',
+        default=30.0,
+        type=float,
+        help='spawn the leading vehicle this many meters ahead on the lane of the ego vehicle, 0 for no leader (default: 30.0)')
+    argparser.add_argument(
+        '--leader_filter',
+        default='charger_2020',
+        help='actor filter of the leading vehicle (default: "charger_2020")')
+    argparser.add_argument(
+        '--follow',
+        default=None,
+        choices=FOLLOWING_MODELS,
+        help='drive throttle and brake of the ego vehicle with a car-following model, steering stays manual (default: None)')
+    argparser.add_argument(
+        '--desired_speed',
+        default=25.0,
+        type=float,
+        help='cruise speed of the car-following model in m/s (default: 25.0)')
+    argparser.add_argument(
+        '--time_headway',
+        default=1.5,
+        type=float,
+        help='desired time gap of the car-following model in s (default: 1.5)')
+    argparser.add_argument(
+        '--profile',
+        default=None,
+        metavar='PATH',
+        help='time the loop stages, show p50/p95/p99 in the HUD and write them to a .json or .csv file on exit (default: None)')
+    argparser.add_argument(
+        '--telemetry',
+        default=None,
+        metavar='PATH',
+        help='log ego vehicle, leader, gap and headway every tick to a .npz, .csv or .parquet file (default: None)')
+    argparser.add_argument(
+        '--seed',
+        default=None,
+        type=int,
+        help='seed of the spawn choices and the traffic manager (default: None --> random)')
+    argparser.add_argument(
+        '--record_session',
+        default=None,
+        metavar='PATH',
+        help='save seeds, spawn choices and the control of every frame to this .npz file, and start the CARLA recorder, '
+             'implies --sync with a fixed time step (default: None)')
+    argparser.add_argument(
+        '--replay',
+        default=None,
+        metavar='PATH',
+        help='replay a session saved with --record_session, headless in synchronous mode as fast as possible (default: None)')
+    argparser.add_argument(
+        '--max_ticks',
+        default=None,
+        type=int,
+        help='stop after this many simulation ticks (default: None --> run until cancelled)')
     
-    return argparser.parse_args()
+    args = argparser.parse_args()
+    if args.pacing == 'sim' and not (args.sync or args.record_session or args.replay):
+        # Only synchronous mode runs with a fixed time step to pace the loop on.
+        argparser.error('--pacing sim needs --sync')
+    return args
 
 
 class World(object):
-    def __init__(self, carla_world, hud, args) -> None:
+    def __init__(self, carla_world, hud, args, decode_pipeline=None, sensor_sync=None, client=None,
+                 replay=None) -> None:
         self.world = carla_world
+        self.client = client
+        self.replay = replay
+        self.decode_pipeline = decode_pipeline
+        self.sensor_sync = sensor_sync
+        self.sensor_bundle = None
+        self.snapshot = None
+        self.frame_scheduler = None
+        self.follower = None
+        self.profiler = getattr(decode_pipeline, 'profiler', None)
         self.sync = args.sync
         self.actor_role_name = args.rolename
         self.spawn_point_idx = args.spawn_point_idx
+        self.leader_gap = args.leader_gap
+        self._leader_filter = args.leader_filter
 
         try:
             self.map = self.world.get_map()
@@ -94,8 +240,13 @@ class World(object):
             print('  Make sure it exists, has the same name of your town, and is correct.')
             sys.exit(1)
 
+        self.metadata = world_metadata(self.world, self.map)
         self.hud = hud
         self.player = None
+        self.leader = None
+        # role (ego, leader) -> transform the vehicle was spawned at
+        self.spawn_transforms = {}
+        self.ego_state = EgoStateCache()
 
         # Define Sensors
         # self.collision_sensor = None
@@ -106,17 +257,20 @@ class World(object):
 
         # Define Driving View Camera
         self.driving_view_camera = None
+        self.depth_sensor_camera = None
 
         self._actor_filter = args.filter
         self._actor_generation = args.generation
         self._gamma = args.gamma
+        self._depth_tick = args.depth_tick
+        self._depth_scale = args.depth_scale
 
         self.player_max_speed = 1.589
         self.player_max_speed_fast = 3.713
 
         self.restart()
 
-        self.world.on_tick(hud.on_world_tick) # Register the tick function of the hud to the world tick event.
+        self.world.on_tick(self.on_world_tick) # Register the tick function of the world (and hud) to the world tick event.
 
 
 
@@ -129,7 +283,7 @@ class World(object):
         cam_pos_index = self.driving_view_camera.transform_index if self.driving_view_camera is not None else 0
 
         # Get a vehicle blueprint and set parameters.
-        blueprint_list = get_actor_blueprints(self.world, self._actor_filter, self._actor_generation)
+        blueprint_list = self.metadata.blueprints(self._actor_filter, self._actor_generation)
         if not blueprint_list:
             raise ValueError("Couldn't find any blueprints with the specified filters")
         
@@ -138,19 +292,20 @@ class World(object):
         blueprint.set_attribute('role_name', self.actor_role_name) # Set the role name of the vehicle.
         if blueprint.has_attribute('terramechanics'):
             blueprint.set_attribute('terramechanics', 'true')
-        if blueprint.has_attribute('color'):
-            color = random.choice(blueprint.get_attribute('color').recommended_values)
-            blueprint.set_attribute('color', color)
-        if blueprint.has_attribute('driver_id'):
-            driver_id = random.choice(blueprint.get_attribute('driver_id').recommended_values)
-            blueprint.set_attribute('driver_id', driver_id)
+        colors = self.metadata.recommended_values(blueprint, 'color')
+        if colors:
+            blueprint.set_attribute('color', random.choice(colors))
+        driver_ids = self.metadata.recommended_values(blueprint, 'driver_id')
+        if driver_ids:
+            blueprint.set_attribute('driver_id', random.choice(driver_ids))
         if blueprint.has_attribute('is_invincible'):
             blueprint.set_attribute('is_invincible', 'true')
         
         # set the max speed
-        if blueprint.has_attribute('speed'):
-            self.player_max_speed = float(blueprint.get_attribute('speed').recommended_values[1])
-            self.player_max_speed_fast = float(blueprint.get_attribute('speed').recommended_values[2])
+        speeds = self.metadata.recommended_values(blueprint, 'speed')
+        if speeds:
+            self.player_max_speed = float(speeds[1])
+            self.player_max_speed_fast = float(speeds[2])
 
         # Spawn the player.
         if self.player is not None:
@@ -160,36 +315,53 @@ class World(object):
             spawn_point.rotation.pitch = 0.0
             self.destroy()
             self.player = self.world.try_spawn_actor(blueprint, spawn_point)
+            self.spawn_transforms['ego'] = spawn_point
             self.modify_vehicle_physics(self.player)
-        while self.player is None:
-            if not self.map.get_spawn_points():
+        if self.player is None:
+            if not self.metadata.spawn_points():
                 print('There are no spawn points available in your map/town.')
                 print('Please add some Vehicle Spawn Point to your UE4 scene.')
                 sys.exit(1)
-            spawn_points = self.map.get_spawn_points()
 
-            if self.spawn_point_idx != None:
-                # Spawn the player at the specific spawn point. TODO: Make this configurable.
-                spawn_point = spawn_points[self.spawn_point_idx] if spawn_points else carla.Transform()
+            if self.replay is not None:
+                # Same blueprints, attributes and transforms as the recorded session.
+                actors = self.replay.spawn(self.client, self.world)
+                self.player = actors['ego']
+                self.leader = actors.get('leader')
+                self.spawn_transforms = {x: self.replay.transform(x) for x in actors}
             else:
-                spawn_point = random.choice(spawn_points) if spawn_points else carla.Transform() #TODO: ??
-
-            # print(spawn_points.index(spawn_point))
-
-
-            self.player = self.world.try_spawn_actor(blueprint, spawn_point)
+                # Only free spawn points are tried, spawn_point_idx None --> random.
+                planner = SpawnPlanner(self.world)
+                if self.leader is None and self.leader_gap > 0 and self.client is not None:
+                    leader_blueprints = self.metadata.blueprints(self._leader_filter)
+                    if not leader_blueprints:
+                        raise ValueError("Couldn't find any blueprints with the leader filter %r" % self._leader_filter)
+                    leader_blueprint = leader_blueprints[0]
+                    self.player, self.leader = planner.spawn_pair(
+                        self.client, blueprint, leader_blueprint, self.leader_gap, ego_index=self.spawn_point_idx)
+                    self.spawn_transforms['leader'] = planner.spawned[self.leader.id]
+                else:
+                    self.player = planner.spawn(blueprint, self.spawn_point_idx)
+                self.spawn_transforms['ego'] = planner.spawned[self.player.id]
             self.modify_vehicle_physics(self.player)
         
         # Set up Driving View Camera
-        self.driving_view_camera = DrivingViewCamera(self.player, self.hud, self._gamma)
+        self.driving_view_camera = DrivingViewCamera(self.player, self.hud, self._gamma, self.decode_pipeline)
         self.driving_view_camera.transform_index = cam_pos_index
         self.driving_view_camera.set_sensor(driving_view_index, notify=False)
 
         # TODO: Set up the sensors.
-        self.depth_sensor_camera = DepthCamera(self.player, self.hud, self._gamma)
+        # Nothing consumes the depth view yet, it is only spawned once rendered or listened to.
+        self.depth_sensor_camera = DepthCamera(self.player, self.hud, self._gamma, self.decode_pipeline,
+                                               sensor_tick=self._depth_tick,
+                                               resolution_scale=self._depth_scale)
         self.depth_sensor_camera.transform_index = 0
         self.depth_sensor_camera.set_sensor(0, notify=False)
 
+        if self.sensor_sync is not None:
+            period = self.driving_view_camera.sync_period(self.world.get_settings().fixed_delta_seconds)
+            self.sensor_sync.attach('driving_view', self.driving_view_camera, period)
+
         actor_type = get_actor_display_name(self.player)
         self.hud.notification(actor_type)
 
@@ -198,6 +370,12 @@ class World(object):
         else:
             self.world.wait_for_tick()
     
+    def on_world_tick(self, snapshot):
+        # Read the ego state once per tick, everything else uses the cache.
+        self.snapshot = snapshot
+        self.ego_state.update(snapshot, self.player)
+        self.hud.on_world_tick(snapshot)
+
     def modify_vehicle_physics(self, actor):
         #If actor is not a vehicle, we cannot use the physics control
         try:
@@ -217,8 +395,16 @@ class World(object):
     def destroy(self):
         # if self.radar_sensor is not None:
         #     self.toggle_radar()
+        cameras = [
+            self.driving_view_camera,
+            self.depth_sensor_camera,
+            ]
+        for camera in cameras:
+            if camera is not None:
+                camera.destroy()
+        if self.sensor_sync is not None:
+            self.sensor_sync.unregister('driving_view')
         sensors = [
-            self.driving_view_camera.sensor,
             # self.collision_sensor.sensor,
             # self.lane_invasion_sensor.sensor,
             # self.gnss_sensor.sensor,
@@ -231,13 +417,48 @@ class World(object):
         if self.player is not None:
             self.player.destroy()
 
+    def destroy_leader(self):
+        if self.leader is not None:
+            self.leader.destroy()
+            self.leader = None
+
 
 
 def gameloop(args):
+    session = None
+    if args.replay:
+        session = load_session(args.replay)
+        # Nobody is at the wheel: lock-step, headless and as fast as possible.
+        args.sync = True
+        args.headless = True
+        args.pacing = 'none'
+        args.autopilot = False
+        args.follow = None
+        args.seed = session.seed
+    elif args.record_session and not args.sync:
+        # Only fixed steps in lock-step with the client replay the same way.
+        logging.info('Recording a session, switching to synchronous mode')
+        args.sync = True
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 31)
+    random.seed(seed)
+
+    if args.headless:
+        # pygame still needs a video driver, but no window is ever opened.
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
     pygame.init()
     pygame.font.init()
+    ticks = 0
+    t_start = time.perf_counter()
     world = None
     original_settings = None
+    decode_pipeline = None
+    sensor_sync = None
+    scheduler = None
+    v_controller = None
+    input_log = None
+    telemetry = None
+    recorder = None
+    profiler = Profiler(enabled=bool(args.profile))
 
     leading_car = None
 
@@ -251,26 +472,55 @@ def gameloop(args):
             if not settings.synchronous_mode:
                 settings.synchronous_mode = True
                 settings.fixed_delta_seconds = 0.05
+            if session is not None and session.header['fixed_delta_seconds']:
+                settings.fixed_delta_seconds = session.header['fixed_delta_seconds']
+            if (args.record_session or args.pacing == 'sim') and not settings.fixed_delta_seconds:
+                settings.fixed_delta_seconds = 0.05
             sim_world.apply_settings(settings)
 
             traffic_manager = client.get_trafficmanager()
             traffic_manager.set_synchronous_mode(True)
+        traffic_manager_seed = session.traffic_manager_seed if session is not None else seed
+        client.get_trafficmanager().set_random_device_seed(traffic_manager_seed)
 
         if args.autopilot and not sim_world.get_settings().synchronous_mode:
             print("WARNING: You are currently in asynchronous mode and could "
                   "experience some issues with the traffic simulation")
         
-        display = pygame.display.set_mode(
-            (args.width, args.height),
-            pygame.HWSURFACE | pygame.DOUBLEBUF)
-        display.fill((0,0,0))
-        pygame.display.flip()
+        display = None
+        if not args.headless:
+            display = pygame.display.set_mode(
+                (args.width, args.height),
+                pygame.HWSURFACE | pygame.DOUBLEBUF)
+            display.fill((0,0,0))
+            pygame.display.flip()
 
-        hud = HUD(args.width, args.height)
-        world = World(sim_world, hud, args)
-        v_controller = VehicleController(world, args.autopilot, 
-                                         js_cfg_yaml='config/steering_wheel_default.yaml', 
-                                         kb_cfg_yaml='config/keyboard_default.yaml')
+        hud = HUD(args.width, args.height, headless=args.headless, static_info=args.static_hud)
+        decode_pipeline = DecodePipeline(workers=args.decode_workers, maxsize=args.decode_queue, profiler=profiler)
+        if args.sync:
+            sensor_sync = SensorSync(timeout=args.sync_timeout, stale_policy=args.stale_policy)
+        world = World(sim_world, hud, args, decode_pipeline, sensor_sync, client, replay=session)
+        if args.record_session:
+            recorder = SessionRecorder(args.record_session, seed, traffic_manager_seed)
+            recorder.record_world(sim_world)
+            for role, transform in world.spawn_transforms.items():
+                recorder.record_actor(role, world.leader if role == 'leader' else world.player, transform)
+            # The server side log of all actors, for inspection with the CARLA recorder tools.
+            recorder.header['carla_recorder'] = carla_recorder_name(args.record_session)
+            client.start_recorder(recorder.header['carla_recorder'])
+        if not args.headless:
+            if args.input_log and args.input_rate > 0:
+                input_log = TelemetryLogger(args.input_log, SAMPLE_FIELDS)
+            elif args.input_log:
+                logging.warning('--input_log needs --input_rate above 0, the wheel inputs are not logged')
+            v_controller = VehicleController(world, args.autopilot and not args.follow, 
+                                             js_cfg_yaml='config/steering_wheel_default.yaml', 
+                                             kb_cfg_yaml='config/keyboard_default.yaml',
+                                             curves_yaml='config/response_curves_default.yaml',
+                                             input_rate=args.input_rate,
+                                             input_log=input_log)
+        else:
+            world.player.set_autopilot(args.autopilot)
 
 
         if args.sync:
@@ -279,38 +529,138 @@ def gameloop(args):
             sim_world.wait_for_tick()
 
         clock = pygame.time.Clock()
+        pacing = args.pacing or ('none' if args.sync or args.headless else 'sleep')
+        scheduler = FrameScheduler(pacing, fps=args.fps, real_time_factor=args.rtf,
+                                   fixed_delta_seconds=sim_world.get_settings().fixed_delta_seconds)
+        world.frame_scheduler = scheduler
+
+
+        # The leading vehicle is spawned together with the player, on autopilot.
+        leading_car = world.leader
+
+        follower = None
+        if args.follow:
+            follower = CarFollowingController(make_model(args.follow, desired_speed=args.desired_speed,
+                                                         time_headway=args.time_headway))
+            follower.attach(world.player, leading_car)
+            world.follower = follower
+            world.player.set_autopilot(False)
+            if v_controller is not None:
+                v_controller.longitudinal = follower
+
+        if args.telemetry:
+            telemetry = CarFollowingTelemetry(TelemetryLogger(args.telemetry))
+            telemetry.attach(world.player, leading_car)
+
+
+        t_start = time.perf_counter()
+        while args.max_ticks is None or ticks < args.max_ticks:
+            if session is not None:
+                if ticks >= len(session):
+                    break
+                with profiler.span('replay'):
+                    session.apply(client, {'ego': world.player, 'leader': world.leader}, ticks)
+            with profiler.span('world.tick'):
+                if args.sync:
+                    # Lock-step with the server: wait until every sensor delivered
+                    # the frame that was just simulated.
+                    frame = sim_world.tick()
+                    with profiler.span('sensor.sync'):
+                        world.sensor_bundle = sensor_sync.get(frame)
+                elif args.headless:
+                    sim_world.wait_for_tick()
+            with profiler.span('pacing'):
+                scheduler.wait(hud.simulation_time)
+            clock.tick()
+            ticks += 1
+
+            if recorder is not None:
+                recorder.record(sim_world.get_snapshot())
+
+            snapshot = world.snapshot
+            if args.sync:
+                # world.snapshot is set by the on_tick callback and may still hold an older frame.
+                snapshot = sim_world.get_snapshot()
 
+            # The loop can run faster than the server ticks, follow once per new frame.
+            if follower is not None and snapshot is not None and snapshot.frame != follower.frame:
+                with profiler.span('follow'):
+                    follower.update(snapshot)
+                    if v_controller is None:
+                        world.player.apply_control(follower.apply(carla.VehicleControl()))
 
-
-        # Instanciating the vehicle to which we attached the sensors
-        bp = sim_world.get_blueprint_library().filter('charger_2020')[0]
-        leading_car = sim_world.try_spawn_actor(bp, sim_world.get_map().get_spawn_points()[1])
-        leading_car.set_autopilot(True)
-
-
-
-        while True:
-            if args.sync:
-                sim_world.tick()
-            clock.tick_busy_loop(60)
+            if telemetry is not None and snapshot is not None:
+                with profiler.span('telemetry'):
+                    telemetry.record(snapshot, follower)
 
             #TODO: Check Input Signal from Controller
-            if v_controller.parse_events(clock, args.sync):
-                return
-
-            world.tick(clock)
-            world.render(display)
-            pygame.display.flip()
+            if v_controller is not None:
+                with profiler.span('controller'):
+                    if v_controller.parse_events(clock, args.sync):
+                        return
+
+            if args.headless:
+                continue
+
+            with profiler.span('hud.tick'):
+                world.tick(clock)
+            if world.sensor_bundle is not None or not args.sync:
+                with profiler.span('render'):
+                    world.render(display)
+                with profiler.span('display.flip'):
+                    pygame.display.flip()
  
 
     finally:
+        elapsed = time.perf_counter() - t_start
+        if ticks:
+            logging.info('%d ticks in %.1f s (%.1f ticks/s)', ticks, elapsed, ticks / elapsed)
+        if scheduler is not None:
+            stats = scheduler.stats()
+            logging.info('pacing %s: %.1f FPS, jitter %.2f ms, client CPU %.0f %%',
+                         scheduler.policy, stats['fps'], 1e3 * stats['jitter'], 100 * stats['cpu'])
+
         if original_settings:
             sim_world.apply_settings(original_settings)
 
+        if args.profile:
+            for stage in profiler.summary():
+                logging.info('%s: %d spans, p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, max %.2f ms',
+                             stage['name'], stage['count'], 1e3 * stage['p50'], 1e3 * stage['p95'],
+                             1e3 * stage['p99'], 1e3 * stage['max'])
+            profiler.dump(args.profile)
+            logging.info('profile written to %s', args.profile)
+
+        if decode_pipeline is not None:
+            for stats in decode_pipeline.stats():
+                logging.info('%s: decoded %d, dropped %d, latency avg %.1f ms, max %.1f ms',
+                             stats['name'], stats['decoded'], stats['dropped'],
+                             1e3 * stats['latency_avg'], 1e3 * stats['latency_max'])
+
+        if sensor_sync is not None:
+            stats = sensor_sync.stats()
+            logging.info('sensor sync: %d bundles, %d timeouts, wait avg %.1f ms',
+                         stats['bundles'], stats['timeouts'], 1e3 * stats['wait_avg'])
+
+        if v_controller is not None:
+            v_controller.destroy()
+
+        if input_log is not None:
+            input_log.close()
+
+        if telemetry is not None:
+            telemetry.close()
+
+        if recorder is not None:
+            client.stop_recorder()
+            recorder.save()
+
         if world is not None:
             world.destroy()
+            world.destroy_leader()
 
-            # carla.command.DestroyActor(leading_car)
+        if decode_pipeline is not None:
+            decode_pipeline.shutdown()
 
 
         pygame.quit()
@@ -0,0 +1,332 @@
+import functools
+import logging
+import weakref
+
+import carla
+import numpy as np
+import yaml
+
+from decode_pipeline import DecodePipeline
+from frame_converter import FrameConverter, bgra_array
+from lidar_bev import BEVRasterizer, LIDAR_POINT_SIZE, SEMANTIC_LIDAR_POINT_SIZE
+from sensor_sync import sync_period
+from world_cache import world_metadata
+
+CONSUMERS = ('display', 'sync', 'record')
+ATTACHMENTS = {
+    'rigid': carla.AttachmentType.Rigid,
+    'spring_arm': carla.AttachmentType.SpringArm,
+    'spring_arm_ghost': carla.AttachmentType.SpringArmGhost,
+}
+COLOR_CONVERTERS = {
+    'raw': carla.ColorConverter.Raw,
+    'depth': carla.ColorConverter.Depth,
+    'logarithmic_depth': carla.ColorConverter.LogarithmicDepth,
+    'cityscapes': carla.ColorConverter.CityScapesPalette,
+}
+TRANSFORM_KEYS = ('x', 'y', 'z', 'pitch', 'yaw', 'roll')
+
+
+def sensor_category(blueprint_id):
+    """'camera', 'lidar', 'semantic_lidar', 'radar' or 'other', one decode pipeline per category."""
+    if blueprint_id.startswith('sensor.camera.'):
+        return 'camera'
+    if blueprint_id == 'sensor.lidar.ray_cast_semantic':
+        return 'semantic_lidar'
+    if blueprint_id.startswith('sensor.lidar.'):
+        return 'lidar'
+    if blueprint_id == 'sensor.other.radar':
+        return 'radar'
+    return 'other'
+
+
+class RigSensorSpec(object):
+    """
+    One sensor of a rig, as declared in the YAML file.
+
+        - name: front
+          type: sensor.camera.rgb
+          transform: {x: 0.0, z: 2.4, yaw: 0.0}
+          attachment: rigid          # rigid | spring_arm | spring_arm_ghost
+          sensor_tick: 0.0           # seconds between measurements, 0 for every frame
+          decimation: 1              # decode one measurement out of decimation
+          scale: 1.0                 # image and bird's-eye view size relative to the display cell
+          attributes: {fov: '90'}
+          color_converter: raw       # cameras: raw | depth | logarithmic_depth | cityscapes
+          consumers: [display]       # display | sync | record, no consumer --> not spawned
+          display_pos: [0, 1]        # grid row and column of the display consumer
+
+    Cameras without image_size_x/y and LiDAR bird's-eye views take the size
+    of their display cell times scale.
+    """
+    def __init__(self, cfg):
+        unknown = set(cfg) - {'name', 'type', 'transform', 'attachment', 'sensor_tick', 'decimation', 'scale',
+                              'attributes', 'color_converter', 'consumers', 'display_pos'}
+        if unknown:
+            raise ValueError('Unknown sensor rig keys: %s' % ', '.join(sorted(unknown)))
+        self.blueprint_id = cfg['type']
+        self.name = cfg.get('name', self.blueprint_id)
+        self.category = sensor_category(self.blueprint_id)
+        transform = cfg.get('transform') or {}
+        unknown = set(transform) - set(TRANSFORM_KEYS)
+        if unknown:
+            raise ValueError('Unknown transform keys of sensor %r: %s' % (self.name, ', '.join(sorted(unknown))))
+        self.transform = tuple(float(transform.get(x, 0.0)) for x in TRANSFORM_KEYS)
+        attachment = cfg.get('attachment', 'rigid')
+        if attachment not in ATTACHMENTS:
+            raise ValueError('Unknown attachment %r of sensor %r' % (attachment, self.name))
+        self.attachment = attachment
+        self.sensor_tick = float(cfg.get('sensor_tick', 0.0))
+        self.decimation = int(cfg.get('decimation', 1))
+        if self.decimation < 1:
+            raise ValueError('Decimation of sensor %r must be at least 1' % self.name)
+        self.scale = float(cfg.get('scale', 1.0))
+        if self.scale <= 0.0:
+            raise ValueError('Scale of sensor %r must be positive' % self.name)
+        # Blueprint attributes are strings, YAML numbers are converted.
+        self.attributes = tuple(sorted((str(k), str(v)) for k, v in (cfg.get('attributes') or {}).items()))
+        color_converter = cfg.get('color_converter', 'raw')
+        if color_converter not in COLOR_CONVERTERS:
+            raise ValueError('Unknown color converter %r of sensor %r' % (color_converter, self.name))
+        self.color_converter = color_converter
+        self.consumers = tuple(cfg.get('consumers', ('display',)))
+        unknown = set(self.consumers) - set(CONSUMERS)
+        if unknown:
+            raise ValueError('Unknown consumers of sensor %r: %s' % (self.name, ', '.join(sorted(unknown))))
+        display_pos = cfg.get('display_pos')
+        self.display_pos = tuple(display_pos) if display_pos is not None else None
+        if 'display' in self.consumers and self.display_pos is None:
+            raise ValueError('Sensor %r is displayed but has no display_pos' % self.name)
+
+    def size(self, cell_size):
+        """Image or bird's-eye view size of the sensor in a display cell of cell_size."""
+        return (max(1, int(cell_size[0] * self.scale)), max(1, int(cell_size[1] * self.scale)))
+
+    def carla_transform(self):
+        x, y, z, pitch, yaw, roll = self.transform
+        return carla.Transform(carla.Location(x=x, y=y, z=z), carla.Rotation(pitch=pitch, yaw=yaw, roll=roll))
+
+
+def load_rig(path):
+    """Return (grid size, [RigSensorSpec]) of a rig YAML file."""
+    with open(path, 'r') as f:
+        cfg = yaml.load(f, Loader=yaml.FullLoader) or {}
+    specs = [RigSensorSpec(x) for x in cfg.get('sensors') or []]
+    names = [x.name for x in specs]
+    duplicates = sorted(set(x for x in names if names.count(x) > 1))
+    if duplicates:
+        raise ValueError('Duplicate sensor names in %s: %s' % (path, ', '.join(duplicates)))
+    return tuple(cfg.get('grid', (1, 1))), specs
+
+
+class RigSensor(object):
+    """A spawned sensor of a rig with its decode channel. The decoded output is channel.latest()[1]."""
+    def __init__(self, spec, blueprint, size, headless, surface_buffers=3):
+        self.spec = spec
+        self.blueprint = blueprint
+        self.size = size
+        self.headless = headless
+        self.actor = None
+        self.channel = None
+        self.recorder = None
+        self._converter = None
+        self._bev = None
+        self._color_converter = COLOR_CONVERTERS[spec.color_converter]
+        if spec.category in ('lidar', 'semantic_lidar'):
+            semantic = spec.category == 'semantic_lidar'
+            self._bev = BEVRasterizer(size, float(blueprint.get_attribute('range').as_float()),
+                                      SEMANTIC_LIDAR_POINT_SIZE if semantic else LIDAR_POINT_SIZE,
+                                      color_mode='semantic' if semantic else 'intensity',
+                                      num_buffers=surface_buffers)
+        elif spec.category == 'camera' and not headless:
+            self._converter = FrameConverter(surface_buffers)
+
+    @property
+    def name(self):
+        return self.spec.name
+
+    def listen(self, actor, channel):
+        self.actor = actor
+        self.channel = channel
+        actor.listen(lambda data: channel.submit(data.frame, data))
+
+    def decode(self, data):
+        category = self.spec.category
+        if category == 'camera':
+            data.convert(self._color_converter)
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.record(data)
+            if self._converter is None:
+                return bgra_array(data)
+            return self._converter.convert(data)
+        if self._bev is not None:
+            if self.headless:
+                return self._bev.rasterize(data.raw_data)
+            return self._bev.render(data.raw_data)
+        if category == 'radar':
+            # (N, 4) velocity, azimuth, altitude, depth
+            return np.frombuffer(data.raw_data, dtype=np.float32).reshape(len(data), 4)
+        return data
+
+
+class SensorRig(object):
+    """
+    Spawn a declarative sensor rig in one round trip.
+
+    The blueprints are configured from the specs (size, sensor_tick and
+    attributes) through the map metadata cache. sensor_tick lowers the rate
+    on the server, decimation drops measurements before they are decoded,
+    and the SensorSync is told how many frames apart either makes the
+    outputs so it does not wait for frames that never come. Every rigidly attached
+    sensor is spawned in a single apply_batch_sync(), the batch command
+    has no attachment type, so spring arm sensors are spawned one by one.
+    Each sensor category (camera, lidar, semantic_lidar, radar) gets its own
+    DecodePipeline, so a slow LiDAR rasterization never delays the cameras.
+    Sensors without consumers are not spawned at all.
+
+    Parameters:
+    client (carla.Client): Client used for the batch.
+    world (carla.World): The simulation world.
+    specs (list): RigSensorSpec of every sensor.
+    cell_size (tuple): (width, height) of a display cell, the default image size (default: (800, 600)).
+    headless (bool): Decode into NumPy arrays instead of Surfaces (default: False).
+    decode_workers (int): Threads per decode pipeline, 0 decodes in the callback (default: 1).
+    decode_queue (int): Pending measurements per sensor before the oldest is dropped (default: 2).
+    profiler (Profiler): Times every decode as span 'decode.<sensor name>' (default: None).
+    """
+    def __init__(self, client, world, specs, cell_size=(800, 600), headless=False, decode_workers=1,
+                 decode_queue=2, profiler=None):
+        self.client = client
+        self.world = world
+        self.specs = list(specs)
+        self.cell_size = (int(cell_size[0]), int(cell_size[1]))
+        self.headless = headless
+        self.decode_workers = decode_workers
+        self.decode_queue = decode_queue
+        self.profiler = profiler
+        self.grid = (1, 1)
+        self.pipelines = {}
+        self.sensors = {}
+
+    @classmethod
+    def from_yaml(cls, path, client, world, window_size=None, **kwargs):
+        """Rig of a YAML file, the display cells divide window_size by the grid of the file."""
+        grid, specs = load_rig(path)
+        if window_size is not None:
+            kwargs['cell_size'] = (window_size[0] // grid[1], window_size[1] // grid[0])
+        rig = cls(client, world, specs, **kwargs)
+        rig.grid = grid
+        return rig
+
+    def blueprint(self, spec):
+        metadata = world_metadata(self.world)
+        blueprint = metadata.find(spec.blueprint_id)
+        attributes = dict(spec.attributes)
+        if spec.category == 'camera':
+            size = spec.size(self.cell_size)
+            attributes.setdefault('image_size_x', str(size[0]))
+            attributes.setdefault('image_size_y', str(size[1]))
+        if blueprint.has_attribute('sensor_tick'):
+            attributes.setdefault('sensor_tick', str(spec.sensor_tick))
+        if spec.category == 'lidar':
+            # Same LiDAR noise model as the CARLA examples.
+            for name in ('dropoff_general_rate', 'dropoff_intensity_limit', 'dropoff_zero_intensity'):
+                values = metadata.recommended_values(blueprint, name)
+                if values:
+                    attributes.setdefault(name, values[0])
+        return metadata.configured(spec.blueprint_id, tuple(sorted(attributes.items())))
+
+    def pipeline(self, category):
+        pipeline = self.pipelines.get(category)
+        if pipeline is None:
+            pipeline = self.pipelines[category] = DecodePipeline(
+                workers=self.decode_workers, maxsize=self.decode_queue, profiler=self.profiler)
+        return pipeline
+
+    def spawn(self, parent, sensor_sync=None, recorder=None):
+        """
+        Spawn the rig attached to parent and start listening.
+
+        Parameters:
+        parent (carla.Actor): Actor the sensors are attached to.
+        sensor_sync (SensorSync): Receives the sensors with the sync consumer (default: None).
+        recorder (FrameRecorder): Records the cameras with the record consumer (default: None).
+        """
+        pending = []
+        for spec in self.specs:
+            if not spec.consumers:
+                logging.info('Sensor rig: %s has no consumer, not spawned', spec.name)
+                continue
+            blueprint = self.blueprint(spec)
+            size = spec.size(self.cell_size)
+            if spec.category == 'camera':
+                size = (blueprint.get_attribute('image_size_x').as_int(), blueprint.get_attribute('image_size_y').as_int())
+            pending.append(RigSensor(spec, blueprint, size, self.headless,
+                                     self.pipeline(spec.category).surface_buffers))
+
+        batch = [x for x in pending if x.spec.attachment == 'rigid']
+        responses = self.client.apply_batch_sync(
+            [carla.command.SpawnActor(x.blueprint, x.spec.carla_transform(), parent) for x in batch], False)
+        errors = ['%s: %s' % (x.spec.name, r.error) for x, r in zip(batch, responses) if r.error]
+        if errors:
+            self.client.apply_batch([carla.command.DestroyActor(r.actor_id) for r in responses if not r.error])
+            raise RuntimeError('Could not spawn the sensor rig: %s' % '; '.join(errors))
+        actors = self.world.get_actors([r.actor_id for r in responses])
+        spawned = [(x, actors.find(r.actor_id)) for x, r in zip(batch, responses)]
+        for sensor in pending:
+            if sensor.spec.attachment != 'rigid':
+                spawned.append((sensor, self.world.spawn_actor(
+                    sensor.blueprint, sensor.spec.carla_transform(), attach_to=parent,
+                    attachment_type=ATTACHMENTS[sensor.spec.attachment])))
+
+        fixed_delta_seconds = None
+        if sensor_sync is not None:
+            fixed_delta_seconds = self.world.get_settings().fixed_delta_seconds
+        for sensor, actor in spawned:
+            spec = sensor.spec
+            channel = self.pipeline(spec.category).channel(
+                sensor.name, functools.partial(SensorRig._decode, weakref.ref(sensor)), spec.decimation)
+            if sensor_sync is not None and 'sync' in spec.consumers:
+                sensor_sync.attach(sensor.name, channel,
+                                   sync_period(spec.sensor_tick, fixed_delta_seconds, spec.decimation))
+            if recorder is not None and 'record' in spec.consumers and spec.category == 'camera':
+                sensor.recorder = recorder
+            sensor.listen(actor, channel)
+            self.sensors[sensor.name] = sensor
+        logging.info('Sensor rig: %d sensors spawned, %d in one batch', len(spawned), len(batch))
+        return self.sensors
+
+    def __getitem__(self, name):
+        return self.sensors[name]
+
+    def __iter__(self):
+        return iter(self.sensors.values())
+
+    def __len__(self):
+        return len(self.sensors)
+
+    def displayed(self):
+        """The spawned sensors with the display consumer."""
+        return [x for x in self.sensors.values() if 'display' in x.spec.consumers]
+
+    def stats(self):
+        return [stats for pipeline in self.pipelines.values() for stats in pipeline.stats()]
+
+    def destroy(self):
+        for sensor in self.sensors.values():
+            if sensor.actor is not None:
+                sensor.actor.stop()
+        for pipeline in self.pipelines.values():
+            pipeline.shutdown()
+        self.client.apply_batch([carla.command.DestroyActor(x.actor.id) for x in self.sensors.values()
+                                 if x.actor is not None])
+        self.sensors = {}
+        self.pipelines = {}
+
+    @staticmethod
+    def _decode(weak_sensor, data):
+        sensor = weak_sensor()
+        if sensor is None:
+            return None
+        return sensor.decode(data)
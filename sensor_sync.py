@@ -0,0 +1,171 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+STALE_POLICIES = ('latest', 'skip', 'raise')
+
+
+def sync_period(sensor_tick, fixed_delta_seconds, decimation=1):
+    """
+    Number of simulation frames between two outputs of a sensor.
+
+    Parameters:
+    sensor_tick (float): sensor_tick attribute of the sensor, 0 for every frame.
+    fixed_delta_seconds (float): Simulation step, None in variable time step.
+    decimation (int): Client-side decimation of the decoded outputs (default: 1).
+    """
+    period = 1
+    if sensor_tick and fixed_delta_seconds:
+        period = max(1, int(math.ceil(sensor_tick / fixed_delta_seconds - 1e-6)))
+    return period * max(1, decimation)
+
+
+class SensorBundle(object):
+    """
+    Outputs of all synchronized sensors for one simulation frame.
+
+    data maps the sensor name to its output and frames to the frame that
+    output belongs to, which is older than frame for the sensors that do not
+    deliver every frame. stale lists the sensors whose output is older than
+    expected (only possible with the 'latest' policy).
+    """
+    __slots__ = ('frame', 'data', 'frames', 'stale')
+
+    def __init__(self, frame, data, frames, stale):
+        self.frame = frame
+        self.data = data
+        self.frames = frames
+        self.stale = stale
+
+    @property
+    def complete(self):
+        return not self.stale
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+
+class SensorSync(object):
+    """
+    Collect the outputs of every attached sensor keyed by simulation frame.
+
+    In synchronous mode, call get(frame) with the frame returned by
+    world.tick() to block until every sensor has delivered that frame.
+    Sensors registered with a period of N frames (a sensor_tick longer than
+    the simulation step, or decimated decoding) are sampled and held: the
+    bundle waits only when their newest output is more than N - 1 frames
+    old and otherwise reuses it.
+
+    Parameters:
+    timeout (float): Seconds to wait for a complete bundle.
+    stale_policy (str): What to do when the timeout expires:
+        'latest' returns the newest output of the missing sensors and marks them stale,
+        'skip' returns None, 'raise' raises TimeoutError.
+    history (int): Number of frames kept per sensor.
+    """
+    def __init__(self, timeout=1.0, stale_policy='latest', history=8):
+        if stale_policy not in STALE_POLICIES:
+            raise ValueError('Unknown stale frame policy: %r' % stale_policy)
+        self.timeout = timeout
+        self.stale_policy = stale_policy
+        self.history = history
+
+        self._cond = threading.Condition()
+        self._frames = {}
+        self._periods = {}
+
+        self.bundles = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+
+    def register(self, name, period=1):
+        """Add a sensor delivering every period frames and return the listener that feeds its outputs."""
+        with self._cond:
+            self._frames[name] = OrderedDict()
+            self._periods[name] = max(1, int(period))
+        return lambda frame, data: self.push(name, frame, data)
+
+    def unregister(self, name):
+        with self._cond:
+            self._frames.pop(name, None)
+            self._periods.pop(name, None)
+            self._cond.notify_all()
+
+    def attach(self, name, camera, period=1):
+        """Register a CameraManager (or DecodeChannel) under the given name."""
+        listener = self.register(name, period)
+        camera.add_listener(listener)
+        return listener
+
+    def push(self, name, frame, data):
+        with self._cond:
+            frames = self._frames.get(name)
+            if frames is None:
+                return
+            frames[frame] = data
+            while len(frames) > self.history:
+                frames.popitem(last=False)
+            self._cond.notify_all()
+
+    @staticmethod
+    def _newest(frames, frame):
+        # Newest output at or before frame, outputs are pushed in frame order.
+        for f in reversed(frames):
+            if f <= frame:
+                return f
+        return None
+
+    def _ready(self, frame):
+        for name, frames in self._frames.items():
+            if frame in frames:
+                continue
+            period = self._periods[name]
+            if period == 1:
+                return False
+            newest = self._newest(frames, frame)
+            if newest is None or newest <= frame - period:
+                return False
+        return True
+
+    def get(self, frame, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        t_start = time.perf_counter()
+        with self._cond:
+            complete = self._cond.wait_for(lambda: self._ready(frame), timeout)
+            self.wait_time += time.perf_counter() - t_start
+
+            if not complete:
+                self.timeouts += 1
+                missing = [n for n, f in self._frames.items() if self._newest(f, frame) is None or
+                           self._newest(f, frame) <= frame - self._periods[n]]
+                logging.debug('Frame %d incomplete, missing: %s', frame, ', '.join(missing))
+                if self.stale_policy == 'skip':
+                    return None
+                if self.stale_policy == 'raise':
+                    raise TimeoutError('Sensors %s did not deliver frame %d' % (missing, frame))
+
+            data = {}
+            data_frames = {}
+            stale = []
+            for name, frames in self._frames.items():
+                newest = frame if frame in frames else self._newest(frames, frame)
+                data[name] = frames[newest] if newest is not None else None
+                data_frames[name] = newest
+                if newest is None or newest <= frame - self._periods[name]:
+                    stale.append(name)
+                # Outputs older than the bundle will never be requested again,
+                # the one it holds is kept for the next frames.
+                keep = frame if newest is None else newest
+                for f in [f for f in frames if f < keep]:
+                    del frames[f]
+            self.bundles += 1
+            return SensorBundle(frame, data, data_frames, stale)
+
+    def stats(self):
+        return {
+            'bundles': self.bundles,
+            'timeouts': self.timeouts,
+            'wait_avg': self.wait_time / self.bundles if self.bundles else 0.0,
+        }
@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+
+import carla
+import numpy as np
+
+from ego_state import CONTROL_FIELDS
+from world_cache import world_metadata
+
+SESSION_VERSION = 1
+ROLES = ('ego', 'leader')
+# Blueprint attributes chosen at spawn time that change how the vehicle looks or behaves.
+SPAWN_ATTRIBUTES = ('role_name', 'color', 'driver_id', 'terramechanics', 'is_invincible')
+
+
+def transform_to_list(transform):
+    l = transform.location
+    r = transform.rotation
+    return [l.x, l.y, l.z, r.pitch, r.yaw, r.roll]
+
+
+def list_to_transform(values):
+    x, y, z, pitch, yaw, roll = values
+    return carla.Transform(carla.Location(x, y, z), carla.Rotation(pitch, yaw, roll))
+
+
+class SessionRecorder(object):
+    """
+    Record what is needed to reproduce a driving session.
+
+    The header holds the random seed, the traffic manager seed, the map, the
+    simulation settings and, per vehicle role (ego, leader), the blueprint,
+    its spawn attributes and the spawn transform. record() stores the
+    control every vehicle was driven with during the frame of the snapshot,
+    whoever produced it (a human at the wheel, the car-following model or
+    the traffic manager). Controls are read from the client side episode
+    state, so recording costs no RPC. The world must run in synchronous
+    mode with a fixed time step, record_world() refuses anything else.
+
+    Parameters:
+    path (str): Output .npz file.
+    seed (int): Seed of the Python random module.
+    traffic_manager_seed (int): Seed of the traffic manager.
+    capacity (int): Initial number of frames, grown as needed (default: 72000).
+    """
+    def __init__(self, path, seed, traffic_manager_seed, capacity=72000):
+        self.path = path
+        self.header = {
+            'version': SESSION_VERSION,
+            'seed': seed,
+            'traffic_manager_seed': traffic_manager_seed,
+            'map': None,
+            'synchronous_mode': None,
+            'fixed_delta_seconds': None,
+            'first_frame': None,
+            'carla_recorder': None,
+            'actors': {},
+        }
+        self.capacity = capacity
+        self._actors = {}
+        self._controls = {}
+        self._last = -1
+
+    def __len__(self):
+        return self._last + 1
+
+    def record_world(self, world):
+        settings = world.get_settings()
+        if not settings.synchronous_mode or not settings.fixed_delta_seconds:
+            # Variable steps and frames skipped by the client cannot be replayed identically.
+            raise ValueError('Sessions can only be recorded in synchronous mode with fixed_delta_seconds set')
+        self.header['map'] = world_metadata(world).map_name
+        self.header['synchronous_mode'] = settings.synchronous_mode
+        self.header['fixed_delta_seconds'] = settings.fixed_delta_seconds
+
+    def record_actor(self, role, actor, transform):
+        if role not in ROLES:
+            raise ValueError('Unknown role %r, use one of %s' % (role, ', '.join(ROLES)))
+        self.header['actors'][role] = {
+            'id': actor.id,
+            'blueprint': actor.type_id,
+            'attributes': {x: actor.attributes[x] for x in SPAWN_ATTRIBUTES if x in actor.attributes},
+            'transform': transform_to_list(transform),
+        }
+        self._actors[role] = actor
+        self._controls[role] = np.full((self.capacity, len(CONTROL_FIELDS)), np.nan)
+
+    def record(self, snapshot):
+        """Store the controls applied during the frame of snapshot, once per frame."""
+        if self.header['first_frame'] is None:
+            self.header['first_frame'] = snapshot.frame
+        i = snapshot.frame - self.header['first_frame']
+        if i <= self._last:
+            return
+        if i >= self.capacity:
+            self._grow(max(2 * self.capacity, i + 1))
+        for role, actor in self._actors.items():
+            c = actor.get_control()
+            self._controls[role][i] = (c.throttle, c.steer, c.brake, c.hand_brake,
+                                       c.reverse, c.manual_gear_shift, c.gear)
+        self._last = i
+
+    def _grow(self, capacity):
+        for role, controls in self._controls.items():
+            grown = np.full((capacity, len(CONTROL_FIELDS)), np.nan)
+            grown[:len(controls)] = controls
+            self._controls[role] = grown
+        self.capacity = capacity
+
+    def save(self):
+        n = len(self)
+        arrays = {}
+        for role, controls in self._controls.items():
+            controls = controls[:n].copy()
+            # Forward fill the frames that were never seen by record().
+            missing = np.isnan(controls[:, 0])
+            if missing.any():
+                index = np.where(~missing, np.arange(n), 0)
+                np.maximum.accumulate(index, out=index)
+                controls = controls[index]
+                controls[np.isnan(controls)] = 0.0
+            arrays[role] = controls
+        np.savez(self.path, header=np.array(json.dumps(self.header)), **arrays)
+        logging.info('Session of %d frames written to %s', n, self.path)
+
+
+class Session(object):
+    """
+    A recorded session, replayed frame by frame.
+
+        session = load_session('session.npz')
+        actors = session.spawn(client, world)
+        for i in range(len(session)):
+            session.apply(client, actors, i)
+            world.tick()
+    """
+    def __init__(self, header, controls):
+        if header.get('version') != SESSION_VERSION:
+            raise ValueError('Unsupported session version %r' % header.get('version'))
+        self.header = header
+        self.controls = controls
+
+    def __len__(self):
+        return min([len(x) for x in self.controls.values()] or [0])
+
+    @property
+    def seed(self):
+        return self.header['seed']
+
+    @property
+    def traffic_manager_seed(self):
+        return self.header['traffic_manager_seed']
+
+    def transform(self, role):
+        return list_to_transform(self.header['actors'][role]['transform'])
+
+    def control(self, role, index):
+        throttle, steer, brake, hand_brake, reverse, manual_gear_shift, gear = self.controls[role][index].tolist()
+        return carla.VehicleControl(throttle=throttle, steer=steer, brake=brake, hand_brake=bool(hand_brake),
+                                    reverse=bool(reverse), manual_gear_shift=bool(manual_gear_shift),
+                                    gear=int(gear))
+
+    def spawn(self, client, world):
+        """
+        Spawn the recorded vehicles at their recorded transforms in one
+        apply_batch_sync(), without autopilot. Returns {role: actor}.
+        """
+        metadata = world_metadata(world)
+        roles = [x for x in ROLES if x in self.header['actors']]
+        commands = []
+        for role in roles:
+            spec = self.header['actors'][role]
+            # A copy of its own, the blueprints of the cache are shared.
+            blueprint = metadata.library().find(spec['blueprint'])
+            for name, value in spec['attributes'].items():
+                if blueprint.has_attribute(name):
+                    blueprint.set_attribute(name, value)
+            commands.append(carla.command.SpawnActor(blueprint, self.transform(role)))
+        responses = client.apply_batch_sync(commands, False)
+        errors = [x.error for x in responses if x.error]
+        if errors:
+            client.apply_batch([carla.command.DestroyActor(x.actor_id) for x in responses if not x.error])
+            raise RuntimeError('Could not spawn the recorded vehicles: %s' % '; '.join(errors))
+        actors = world.get_actors([x.actor_id for x in responses])
+        return {role: actors.find(x.actor_id) for role, x in zip(roles, responses)}
+
+    def apply(self, client, actors, index):
+        """Send the controls of frame index to all vehicles in one batch."""
+        client.apply_batch([carla.command.ApplyVehicleControl(actor.id, self.control(role, index))
+                            for role, actor in actors.items() if actor is not None and role in self.controls])
+
+
+def load_session(path):
+    with np.load(path) as f:
+        header = json.loads(f['header'].item())
+        controls = {x: f[x] for x in ROLES if x in f.files}
+    return Session(header, controls)
+
+
+def carla_recorder_name(path):
+    """Name of the CARLA recorder log of the session at path, saved by the server next to its other logs."""
+    return os.path.splitext(os.path.basename(path))[0] + '.log'
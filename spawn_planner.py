@@ -0,0 +1,173 @@
+import math
+import random
+
+import carla
+import numpy as np
+
+from world_cache import world_metadata
+
+
+class GridIndex(object):
+    """
+    Uniform grid over 2D points for radius queries.
+
+    Parameters:
+    points (array): (N, 2) or (N, 3) positions, only x and y are indexed.
+    cell_size (float): Edge length of a grid cell in m (default: 10.0).
+    """
+    def __init__(self, points, cell_size=10.0):
+        self.cell_size = cell_size
+        points = np.asarray(points, dtype=np.float64)
+        if points.size == 0:
+            points = np.empty((0, 2))
+        self.points = points[:, :2]
+        self._cells = {}
+        for i, cell in enumerate(np.floor(self.points / cell_size).astype(np.int64).tolist()):
+            self._cells.setdefault(tuple(cell), []).append(i)
+
+    def __len__(self):
+        return len(self.points)
+
+    def query(self, x, y, radius):
+        """Return the indices of the points closer than radius to (x, y)."""
+        size = self.cell_size
+        reach = int(math.ceil(radius / size))
+        cx = int(math.floor(x / size))
+        cy = int(math.floor(y / size))
+        candidates = []
+        for i in range(cx - reach, cx + reach + 1):
+            for j in range(cy - reach, cy + reach + 1):
+                candidates.extend(self._cells.get((i, j), ()))
+        if not candidates:
+            return []
+        candidates = np.array(candidates)
+        d = self.points[candidates] - (x, y)
+        return candidates[np.einsum('ij,ij->i', d, d) < radius * radius].tolist()
+
+
+class SpawnPlanner(object):
+    """
+    Choose free spawn transforms for an ego vehicle and its leader.
+
+    Instead of retrying try_spawn_actor() on random spawn points, the planner
+    indexes the spawn points and the locations of all vehicles and walkers
+    (read with one get_actors() call) in grids, keeps only ego spawn points with no
+    actor within clearance, follows the lane gap meters ahead for the leader,
+    checks that location too, and spawns both vehicles in one batch.
+
+    Parameters:
+    world (carla.World): The simulation world.
+    clearance (float): Minimum distance to any actor in m (default: 5.0).
+    cell_size (float): Grid cell size in m (default: 10.0).
+    """
+    def __init__(self, world, clearance=5.0, cell_size=10.0):
+        self.world = world
+        self.metadata = world_metadata(world)
+        self.clearance = clearance
+        self.cell_size = cell_size
+        spawn_points = self.metadata.spawn_points()
+        self.spawn_index = GridIndex([(t.location.x, t.location.y) for t in spawn_points], cell_size)
+        self.occupancy = GridIndex(np.empty((0, 2)), cell_size)
+        # actor id -> transform it was spawned at
+        self.spawned = {}
+
+    def refresh(self):
+        """Index the current locations of all vehicles and walkers, with a single get_actors() call."""
+        positions = []
+        for actor in self.world.get_actors():
+            if actor.type_id.startswith(('vehicle.', 'walker.')):
+                location = actor.get_location()
+                positions.append((location.x, location.y))
+        self.occupancy = GridIndex(np.array(positions).reshape(-1, 2), self.cell_size)
+
+    def is_free(self, location):
+        return not self.occupancy.query(location.x, location.y, self.clearance)
+
+    def free_spawn_points(self):
+        """Indices of the spawn points with no actor within clearance."""
+        blocked = set()
+        for x, y in self.occupancy.points.tolist():
+            blocked.update(self.spawn_index.query(x, y, self.clearance))
+        return [i for i in range(len(self.spawn_index)) if i not in blocked]
+
+    def leader_transform(self, transform, gap):
+        """Transform gap meters ahead of transform on the same lane, or None if the lane ends or is occupied."""
+        waypoint = self.metadata.map.get_waypoint(transform.location)
+        if waypoint is None:
+            return None
+        ahead = waypoint.next(gap)
+        if not ahead:
+            return None
+        # Prefer the continuation on the same road and lane at junctions.
+        same_lane = [x for x in ahead if x.road_id == waypoint.road_id and x.lane_id == waypoint.lane_id]
+        leader = (same_lane or ahead)[0].transform
+        # Spawn points are slightly above the road, keep the same offset.
+        leader.location.z += transform.location.z - waypoint.transform.location.z
+        if not self.is_free(leader.location):
+            return None
+        return leader
+
+    def plan_pair(self, gap, ego_index=None, shuffle=True):
+        """
+        Yield (ego spawn point index, ego transform, leader transform) candidates,
+        only ego_index if given, otherwise every free spawn point in random order.
+        """
+        if ego_index is not None:
+            candidates = [ego_index]
+        else:
+            candidates = self.free_spawn_points()
+            if shuffle:
+                random.shuffle(candidates)
+        for index in candidates:
+            ego = self.metadata.spawn_point(index)
+            if ego_index is None or self.is_free(ego.location):
+                leader = self.leader_transform(ego, gap)
+                if leader is not None:
+                    yield index, ego, leader
+
+    def spawn(self, blueprint, index=None, max_attempts=10):
+        """Spawn one vehicle at spawn point index, or at a random free spawn point."""
+        self.refresh()
+        if index is not None:
+            candidates = [index]
+        else:
+            candidates = self.free_spawn_points()
+            random.shuffle(candidates)
+        for index in candidates[:max_attempts]:
+            transform = self.metadata.spawn_point(index)
+            actor = self.world.try_spawn_actor(blueprint, transform)
+            if actor is not None:
+                self.spawned[actor.id] = transform
+                return actor
+        raise RuntimeError('No free spawn point%s' % (' %d' % index if len(candidates) == 1 else ''))
+
+    def spawn_pair(self, client, ego_blueprint, leader_blueprint, gap, ego_index=None, leader_autopilot=True,
+                   traffic_manager_port=8000, max_attempts=10):
+        """
+        Spawn the ego vehicle and a leader gap meters ahead on the same lane,
+        both in one apply_batch_sync(). Returns (ego actor, leader actor).
+        """
+        SpawnActor = carla.command.SpawnActor
+        SetAutopilot = carla.command.SetAutopilot
+        FutureActor = carla.command.FutureActor
+        self.refresh()
+        errors = []
+        for attempt, (index, ego, leader) in enumerate(self.plan_pair(gap, ego_index)):
+            if attempt >= max_attempts:
+                break
+            leader_command = SpawnActor(leader_blueprint, leader)
+            if leader_autopilot:
+                leader_command = leader_command.then(SetAutopilot(FutureActor, True, traffic_manager_port))
+            responses = client.apply_batch_sync([SpawnActor(ego_blueprint, ego), leader_command], False)
+            ids = [x.actor_id for x in responses if not x.error]
+            if len(ids) == 2:
+                self.spawned[ids[0]] = ego
+                self.spawned[ids[1]] = leader
+                actors = self.world.get_actors(ids)
+                return actors.find(ids[0]), actors.find(ids[1])
+            errors.extend(x.error for x in responses if x.error)
+            if ids:
+                client.apply_batch([carla.command.DestroyActor(x) for x in ids])
+        raise RuntimeError('No free ego/leader spawn pair with a %.1f m gap%s%s' % (
+            gap, ' at spawn point %d' % ego_index if ego_index is not None else '',
+            ': ' + '; '.join(errors) if errors else ''))
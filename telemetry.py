@@ -0,0 +1,344 @@
+import csv
+import io
+import logging
+import math
+import os
+import queue
+import threading
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:
+    pyarrow = None
+    parquet = None
+
+TELEMETRY_FORMATS = ('.npz', '.csv', '.parquet')
+
+EGO_FIELDS = (
+    'ego_x', 'ego_y', 'ego_z', 'ego_pitch', 'ego_yaw', 'ego_roll',
+    'ego_vx', 'ego_vy', 'ego_vz', 'ego_ax', 'ego_ay', 'ego_az', 'ego_speed',
+    'throttle', 'steer', 'brake', 'hand_brake', 'reverse', 'manual_gear_shift', 'gear')
+LEADER_FIELDS = ('leader_id', 'leader_x', 'leader_y', 'leader_z', 'leader_yaw', 'leader_speed')
+FOLLOWING_FIELDS = ('gap', 'relative_speed', 'time_headway', 'time_to_collision', 'desired_accel')
+TELEMETRY_FIELDS = ('frame', 'elapsed_seconds') + EGO_FIELDS + LEADER_FIELDS + FOLLOWING_FIELDS
+
+
+class _NPZSink(object):
+    # Rows are appended to a raw file and packed into the .npz on close, so
+    # memory stays bounded however long the run is.
+    def __init__(self, path, fields):
+        self.path = path
+        self.fields = fields
+        self._part = path + '.part'
+        self._file = open(self._part, 'wb')
+        self._rows = 0
+
+    def write(self, block):
+        block.tofile(self._file)
+        self._rows += len(block)
+
+    def close(self):
+        self._file.close()
+        if self._rows:
+            data = np.memmap(self._part, dtype=np.float64, mode='r', shape=(self._rows, len(self.fields)))
+        else:
+            data = np.empty((0, len(self.fields)))
+        np.savez(self.path, data=data, fields=np.array(self.fields))
+        del data
+        os.remove(self._part)
+
+
+class _CSVSink(object):
+    def __init__(self, path, fields):
+        self._file = open(path, 'w', newline='')
+        csv.writer(self._file).writerow(fields)
+
+    def write(self, block):
+        np.savetxt(self._file, block, fmt='%.17g', delimiter=',')
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetSink(object):
+    def __init__(self, path, fields):
+        if parquet is None:
+            raise RuntimeError('cannot write %s, make sure the pyarrow package is installed' % path)
+        self.fields = fields
+        self._schema = pyarrow.schema([(name, pyarrow.float64()) for name in fields])
+        self._writer = parquet.ParquetWriter(path, self._schema)
+
+    def write(self, block):
+        # One row group per chunk.
+        columns = [pyarrow.array(block[:, i]) for i in range(len(self.fields))]
+        self._writer.write_table(pyarrow.Table.from_arrays(columns, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+_SINKS = {'.npz': _NPZSink, '.csv': _CSVSink, '.parquet': _ParquetSink}
+
+
+def _telemetry_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in _SINKS:
+        raise ValueError('Unknown telemetry format %r, use one of %s' % (extension, ', '.join(TELEMETRY_FORMATS)))
+    return extension
+
+
+class TelemetryLogger(object):
+    """
+    Append one fixed-schema record per simulation tick and write them in the background.
+
+    Records go into preallocated column-major chunks of chunk_rows rows. A
+    full chunk is handed to a writer thread, which appends it to path (.npz,
+    .csv or, with pyarrow installed, .parquet) and returns it to the pool.
+    At most max_chunks chunks exist, so memory is bounded: if the writer
+    falls that far behind, append() waits for it instead of dropping records.
+
+    All fields are float64, integers (frame, ids, gear) are exact and missing
+    values are NaN.
+
+    Parameters:
+    path (str): Output file, the format is chosen by the extension.
+    fields (tuple): Column names (default: TELEMETRY_FIELDS).
+    chunk_rows (int): Records per chunk (default: 1024).
+    max_chunks (int): Number of preallocated chunks (default: 4).
+    """
+    def __init__(self, path, fields=TELEMETRY_FIELDS, chunk_rows=1024, max_chunks=4):
+        self.path = path
+        self.fields = tuple(fields)
+        self.index = {name: i for i, name in enumerate(self.fields)}
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.written = 0
+        self.stalls = 0
+
+        self._sink = _SINKS[_telemetry_format(path)](path, self.fields)
+        self._free = queue.Queue()
+        for _ in range(max(2, max_chunks) - 1):
+            self._free.put(self._allocate())
+        self._chunk = self._allocate()
+        self._fill = 0
+        self._pending = queue.Queue()
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+
+    def _allocate(self):
+        return np.full((self.chunk_rows, len(self.fields)), np.nan, order='F')
+
+    def __len__(self):
+        return self.rows
+
+    def append(self, values):
+        """Append one record, a sequence of len(fields) numbers in field order."""
+        self._chunk[self._fill] = values
+        self._fill += 1
+        self.rows += 1
+        if self._fill == self.chunk_rows:
+            self._hand_off()
+
+    def flush(self):
+        """Hand the partially filled chunk to the writer."""
+        if self._fill:
+            self._hand_off()
+
+    def _hand_off(self):
+        if self._error is not None:
+            raise self._error
+        self._pending.put((self._chunk, self._fill))
+        try:
+            chunk = self._free.get_nowait()
+        except queue.Empty:
+            self.stalls += 1
+            chunk = self._free.get()
+        self._chunk = chunk
+        self._fill = 0
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._pending.put(None)
+        self._thread.join()
+        self._sink.close()
+        logging.info('Telemetry: %d records written to %s (%d stalls)', self.written, self.path, self.stalls)
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            chunk, rows = item
+            try:
+                if self._error is None:
+                    self._sink.write(chunk[:rows])
+                    self.written += rows
+            except Exception as e:
+                logging.error('Telemetry: writing %s failed: %s', self.path, e)
+                self._error = e
+            chunk.fill(np.nan)
+            self._free.put(chunk)
+
+
+class TelemetryTable(object):
+    """
+    Recorded telemetry, one NumPy column per field.
+
+        table = load_telemetry('run.npz')
+        close = table.where(table['gap'] < 10.0)
+        close.describe(['gap', 'time_headway'])
+    """
+    def __init__(self, fields, columns):
+        self.fields = tuple(fields)
+        self.columns = dict(zip(self.fields, columns))
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]]) if self.fields else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def select(self, *names):
+        """(rows, len(names)) array of the given fields."""
+        return np.column_stack([self.columns[x] for x in names])
+
+    def where(self, mask):
+        """Rows where mask (a boolean array or an index array) is set."""
+        return TelemetryTable(self.fields, [self.columns[x][mask] for x in self.fields])
+
+    def between(self, start, end, field='elapsed_seconds'):
+        """Rows with start <= field < end."""
+        column = self.columns[field]
+        return self.where((column >= start) & (column < end))
+
+    def describe(self, names=None):
+        """Return [{name, count, mean, min, p50, p95, max}] over the non-NaN values of each field."""
+        rows = []
+        for name in names or self.fields:
+            values = self.columns[name]
+            values = values[~np.isnan(values)]
+            row = {'name': name, 'count': len(values)}
+            if len(values):
+                p50, p95 = np.percentile(values, (50, 95))
+                row.update(mean=float(values.mean()), min=float(values.min()), p50=float(p50), p95=float(p95),
+                           max=float(values.max()))
+            else:
+                row.update(mean=math.nan, min=math.nan, p50=math.nan, p95=math.nan, max=math.nan)
+            rows.append(row)
+        return rows
+
+
+def load_telemetry(path):
+    """Read a file written by TelemetryLogger into a TelemetryTable."""
+    extension = _telemetry_format(path)
+    if extension == '.npz':
+        with np.load(path) as f:
+            data = f['data']
+            fields = f['fields'].tolist()
+        return TelemetryTable(fields, data.T)
+    if extension == '.csv':
+        with open(path, newline='') as f:
+            fields = next(csv.reader(f))
+            rows = f.read()
+        # loadtxt warns on a log that only has the header.
+        data = np.loadtxt(io.StringIO(rows), delimiter=',', ndmin=2) if rows.strip() else np.empty((0, len(fields)))
+        data = data.reshape(-1, len(fields))
+        return TelemetryTable(fields, data.T)
+    if parquet is None:
+        raise RuntimeError('cannot read %s, make sure the pyarrow package is installed' % path)
+    table = parquet.read_table(path)
+    return TelemetryTable(table.column_names, [x.to_numpy() for x in table.columns])
+
+
+class CarFollowingTelemetry(object):
+    """
+    Log the ego vehicle, its leader and the following metrics once per tick.
+
+    Both vehicles are read from the carla.WorldSnapshot being logged and the
+    control from the client side episode state, so recording costs no RPC
+    and every field of a record belongs to the frame of its snapshot. The
+    gap is bumper to bumper along
+    the heading of the ego vehicle, relative_speed is leader minus ego speed,
+    time_headway is gap over ego speed and time_to_collision is only set
+    while closing in.
+
+    Parameters:
+    logger (TelemetryLogger): Destination, with the fields of TELEMETRY_FIELDS.
+    """
+    def __init__(self, logger):
+        if logger.fields != TELEMETRY_FIELDS:
+            raise ValueError('CarFollowingTelemetry needs a logger with TELEMETRY_FIELDS')
+        self.logger = logger
+        self.ego = None
+        self.leader_id = None
+        self._length = 0.0
+        self._frame = None
+        self._nan_leader = (math.nan,) * (len(LEADER_FIELDS) + len(FOLLOWING_FIELDS))
+
+    def attach(self, ego, leader=None):
+        self.ego = ego
+        self.leader_id = leader.id if leader is not None else None
+        self._length = ego.bounding_box.extent.x
+        if leader is not None:
+            self._length += leader.bounding_box.extent.x
+
+    def record(self, snapshot, follower=None):
+        """
+        Append the record of one tick, once per frame. Returns False when
+        nothing was recorded: a frame already logged or older, or an ego
+        vehicle missing from the snapshot.
+
+        Parameters:
+        snapshot (carla.WorldSnapshot): Snapshot of the tick.
+        follower (CarFollowingController): Provides the desired acceleration when set (default: None).
+        """
+        if self.ego is None or (self._frame is not None and snapshot.frame <= self._frame):
+            return False
+        ego = snapshot.find(self.ego.id)
+        if ego is None:
+            return False
+        self._frame = snapshot.frame
+        t = ego.get_transform()
+        v = ego.get_velocity()
+        a = ego.get_acceleration()
+        c = self.ego.get_control()
+        p = (t.location.x, t.location.y, t.location.z)
+        r = (t.rotation.pitch, t.rotation.yaw, t.rotation.roll)
+        speed = math.sqrt(v.x * v.x + v.y * v.y + v.z * v.z)
+        record = (snapshot.frame, snapshot.timestamp.elapsed_seconds,
+                  p[0], p[1], p[2], r[0], r[1], r[2], v.x, v.y, v.z, a.x, a.y, a.z, speed,
+                  c.throttle, c.steer, c.brake, c.hand_brake, c.reverse, c.manual_gear_shift, c.gear)
+
+        leader = snapshot.find(self.leader_id) if self.leader_id is not None else None
+        if leader is None:
+            record += self._nan_leader
+        else:
+            t = leader.get_transform()
+            lv = leader.get_velocity()
+            leader_speed = math.sqrt(lv.x * lv.x + lv.y * lv.y + lv.z * lv.z)
+            yaw = math.radians(r[1])
+            gap = (t.location.x - p[0]) * math.cos(yaw) + (t.location.y - p[1]) * math.sin(yaw) - self._length
+            closing = speed - leader_speed
+            record += (self.leader_id, t.location.x, t.location.y, t.location.z, t.rotation.yaw, leader_speed,
+                       gap, -closing,
+                       gap / speed if speed > 0.1 else math.nan,
+                       gap / closing if closing > 0.0 else math.nan,
+                       follower.acceleration if follower is not None else math.nan)
+        self.logger.append(record)
+        return True
+
+    def close(self):
+        self.logger.close()
@@ -0,0 +1,32 @@
+"""Run the tests on the mock carla module of benchmark/fake_carla.py, no server or display needed."""
+
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TEST_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmark'))
+
+import fake_carla
+
+fake_carla.install()
+
+import pytest
+
+
+@pytest.fixture
+def carla():
+    return fake_carla
+
+
+@pytest.fixture
+def world():
+    return fake_carla.Client().get_world()
+
+
+def spawn_vehicle(world, x=0.0, y=0.0, yaw=0.0, blueprint='vehicle.tesla.model3'):
+    transform = fake_carla.Transform(fake_carla.Location(x, y, 0.5), fake_carla.Rotation(yaw=yaw))
+    return world.spawn_actor(world.get_blueprint_library().find(blueprint), transform)
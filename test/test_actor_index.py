@@ -0,0 +1,75 @@
+from conftest import spawn_vehicle
+from actor_index import NearbyVehicleIndex
+
+
+def indexed(world, index):
+    # Actors are classified on the client thread after the tick that first saw them.
+    world.tick()
+    index.update(world.get_snapshot())
+    index.refresh_actors(world)
+    world.tick()
+    index.update(world.get_snapshot())
+
+
+def test_query_returns_nearest_vehicles_first(world):
+    ego = spawn_vehicle(world, 0.0)
+    spawn_vehicle(world, 50.0, blueprint='vehicle.dodge.charger_2020')
+    spawn_vehicle(world, 20.0)
+    spawn_vehicle(world, 0.0, 30.0)
+    index = NearbyVehicleIndex()
+    indexed(world, index)
+    assert len(index) == 4
+    result = index.query(ego.id, (0.0, 0.0, 0.5))
+    assert [round(d) for d, _ in result] == [20, 30, 50]
+    assert result[0][1] == 'Tesla Model3'
+    assert result[2][1] == 'Dodge Charger 2020'
+
+
+def test_radius_and_max_results(world):
+    ego = spawn_vehicle(world)
+    for i in range(1, 6):
+        spawn_vehicle(world, 10.0 * i)
+    index = NearbyVehicleIndex(radius=35.0, max_results=4)
+    indexed(world, index)
+    assert [round(d) for d, _ in index.query(ego.id, (0.0, 0.0, 0.5))] == [10, 20, 30]
+    index.radius = 1000.0
+    assert [round(d) for d, _ in index.query(ego.id, (0.0, 0.0, 0.5))] == [10, 20, 30, 40]
+
+
+def test_other_actors_are_not_indexed(world, carla):
+    ego = spawn_vehicle(world)
+    camera = world.spawn_actor(world.get_blueprint_library().find('sensor.camera.rgb'), carla.Transform(),
+                               attach_to=ego)
+    index = NearbyVehicleIndex()
+    indexed(world, index)
+    assert len(index) == 1
+    assert index._names[camera.id] is None
+    assert index.query(ego.id, (0.0, 0.0, 0.5)) == []
+
+
+def test_new_vehicles_show_up_after_refresh(world):
+    ego = spawn_vehicle(world)
+    index = NearbyVehicleIndex()
+    indexed(world, index)
+    spawn_vehicle(world, 10.0)
+    world.tick()
+    index.update(world.get_snapshot())
+    assert index.query(ego.id, (0.0, 0.0, 0.5)) == []
+    index.refresh_actors(world)
+    world.tick()
+    index.update(world.get_snapshot())
+    assert len(index.query(ego.id, (0.0, 0.0, 0.5))) == 1
+
+
+def test_same_frame_is_not_reindexed(world):
+    spawn_vehicle(world)
+    index = NearbyVehicleIndex()
+    indexed(world, index)
+    snapshot = world.get_snapshot()
+    index._ids = index._ids[:0]
+    index.update(snapshot)
+    assert len(index) == 0
+
+
+def test_empty_index():
+    assert NearbyVehicleIndex().query(1, (0.0, 0.0, 0.0)) == []
@@ -0,0 +1,72 @@
+import os
+
+import pygame.locals as pgl
+import pytest
+
+from conftest import ROOT_DIR
+from controller.bindings import JoystickBindings, KeyboardBindings, key_code
+from controller.input_sampler import FakeJoystick
+
+KEYBOARD = {'throttle_key': 'K_w', 'brake_key': 'K_s', 'steer_left_key': 'K_a', 'steer_right_key': 'K_d',
+            'reverse_key': 'K_q', 'handbrake_key': 'K_SPACE'}
+JOYSTICK = {'steer_axis': 0, 'throttle_axis': 5, 'brake_axis': 4, 'reverse_button': 1, 'handbrake_button': 0}
+
+
+def test_key_code():
+    assert key_code('K_w') == pgl.K_w
+    for name in ('w', 'K_nope', 'KMOD_SHIFT', 'QUIT', 3, None):
+        with pytest.raises(ValueError):
+            key_code(name)
+
+
+def test_keyboard_bindings():
+    bindings = KeyboardBindings(KEYBOARD)
+    assert bindings.throttle == pgl.K_w and bindings.handbrake == pgl.K_SPACE
+    assert bindings.keydown == {pgl.K_q: 'reverse'}
+
+
+@pytest.mark.parametrize('option, value', [('brake_key', None), ('reverse_key', '__import__("os")'),
+                                           ('steer_left_key', 'K_nope')])
+def test_invalid_keyboard_bindings(option, value):
+    cfg = dict(KEYBOARD)
+    if value is None:
+        del cfg[option]
+    else:
+        cfg[option] = value
+    with pytest.raises(ValueError, match=option):
+        KeyboardBindings(cfg)
+
+
+def test_joystick_bindings():
+    bindings = JoystickBindings(JOYSTICK)
+    assert (bindings.steer_axis, bindings.throttle_axis, bindings.brake_axis) == (0, 5, 4)
+    assert bindings.handbrake_button == 0
+    assert bindings.buttondown == {1: 'reverse'}
+
+
+@pytest.mark.parametrize('option, value', [('steer_axis', None), ('brake_axis', -1), ('reverse_button', True),
+                                           ('throttle_axis', '5'), ('handbrake_button', 1.0)])
+def test_invalid_joystick_bindings(option, value):
+    cfg = dict(JOYSTICK)
+    if value is None:
+        del cfg[option]
+    else:
+        cfg[option] = value
+    with pytest.raises(ValueError, match=option):
+        JoystickBindings(cfg)
+
+
+def test_validate_against_the_device():
+    bindings = JoystickBindings(JOYSTICK)
+    bindings.validate(FakeJoystick(num_axes=6, num_buttons=2))
+    with pytest.raises(ValueError, match='throttle axis 5'):
+        bindings.validate(FakeJoystick(num_axes=5, num_buttons=2))
+    with pytest.raises(ValueError, match='reverse button 1'):
+        bindings.validate(FakeJoystick(num_axes=6, num_buttons=1))
+
+
+def test_default_configs():
+    keyboard = KeyboardBindings.from_yaml(os.path.join(ROOT_DIR, 'config', 'keyboard_default.yaml'))
+    joystick = JoystickBindings.from_yaml(os.path.join(ROOT_DIR, 'config', 'steering_wheel_default.yaml'))
+    assert keyboard.codes == KeyboardBindings(KEYBOARD).codes
+    assert joystick.axes == JoystickBindings(JOYSTICK).axes
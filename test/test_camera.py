@@ -0,0 +1,53 @@
+import numpy as np
+import pygame
+import pytest
+
+from conftest import spawn_vehicle
+from camera import DepthCamera
+from hud import HUD
+
+
+@pytest.fixture
+def display():
+    pygame.init()
+    yield pygame.display.set_mode((64, 48))
+    pygame.quit()
+
+
+def depth_image(carla, camera):
+    width = int(camera.hud.dim[0] * camera.resolution_scale)
+    height = int(camera.hud.dim[1] * camera.resolution_scale)
+    raw_data = np.arange(width * height * 4, dtype=np.uint8).tobytes()
+    return carla.Image(1, 0.05, carla.Transform(), width, height, 90.0, memoryview(raw_data))
+
+
+@pytest.mark.parametrize('headless', [False, True])
+def test_depth_frames_follow_the_display_mode(carla, world, display, headless):
+    camera = DepthCamera(spawn_vehicle(world), HUD(64, 48, headless=headless), 2.2)
+    camera.index = 0
+    output = camera._decode(depth_image(carla, camera))
+    if headless:
+        assert isinstance(output, np.ndarray) and output.shape == (24, 32, 4)
+    else:
+        assert isinstance(output, pygame.Surface) and output.get_size() == (32, 24)
+
+
+def test_rate_and_resolution_policies(world, display):
+    camera = DepthCamera(spawn_vehicle(world), HUD(64, 48, headless=True), 2.2, decimation=2)
+    blueprint = camera.sensors[0].blueprint
+    assert blueprint.get_attribute('sensor_tick').as_str() == str(DepthCamera.SENSOR_TICK)
+    assert blueprint.get_attribute('image_size_x').as_str() == '32'
+    assert blueprint.get_attribute('image_size_y').as_str() == '24'
+    assert camera.sync_period(0.05) == 4
+    assert camera.sync_period(None) == 2
+
+
+def test_decimated_frames_are_skipped(carla, world, display):
+    camera = DepthCamera(spawn_vehicle(world), HUD(64, 48, headless=True), 2.2, decimation=3)
+    camera.transform_index = 0
+    camera.set_sensor(0, notify=False)
+    frames = []
+    camera.add_listener(lambda frame, output: frames.append(frame))
+    for frame in range(7):
+        camera._channel.submit(frame, depth_image(carla, camera))
+    assert frames == [0, 3, 6]
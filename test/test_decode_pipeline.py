@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from decode_pipeline import DecodePipeline, DropOldestQueue
+
+
+def test_drop_oldest_queue():
+    q = DropOldestQueue(2)
+    for i in range(5):
+        q.put(i)
+    assert len(q) == 2 and q.dropped == 3
+    assert q.get() == 3 and q.get() == 4 and q.get() is None
+    q.put(5)
+    q.clear()
+    assert len(q) == 0 and q.dropped == 3
+
+
+def test_drop_oldest_queue_holds_at_least_one():
+    q = DropOldestQueue(0)
+    q.put('a')
+    q.put('b')
+    assert q.get() == 'b' and q.dropped == 1
+
+
+def test_inline_decode():
+    pipeline = DecodePipeline(workers=0)
+    published = []
+    channel = pipeline.channel('cam', lambda x: x * 2)
+    channel.add_listener(lambda frame, result: published.append((frame, result)))
+    channel.submit(1, 10)
+    channel.submit(2, 20)
+    assert channel.latest() == (2, 40)
+    assert published == [(1, 20), (2, 40)]
+    pipeline.shutdown()
+    channel.submit(3, 30)
+    assert channel.latest() == (None, None)
+
+
+@pytest.mark.parametrize('decimation, decoded', [(1, [0, 1, 2, 3, 4, 5]), (3, [0, 3]), (0, [])])
+def test_decimation(decimation, decoded):
+    pipeline = DecodePipeline(workers=0)
+    frames = []
+    channel = pipeline.channel('cam', lambda x: x, decimation)
+    channel.add_listener(lambda frame, result: frames.append(frame))
+    for frame in range(6):
+        channel.submit(frame, frame)
+    assert frames == decoded
+    assert channel.stats()['skipped'] == 6 - len(decoded)
+
+
+def test_worker_decodes_in_order_and_drops_when_behind():
+    pipeline = DecodePipeline(workers=2, maxsize=2)
+    started = threading.Event()
+    release = threading.Event()
+    done = threading.Semaphore(0)
+
+    def decode(x):
+        started.set()
+        release.wait(5.0)
+        return x
+    frames = []
+    channel = pipeline.channel('cam', decode)
+    channel.add_listener(lambda frame, result: (frames.append(frame), done.release()))
+    channel.submit(0, 0)
+    assert started.wait(5.0)
+    # Frame 0 is being decoded, 1..5 queue up behind it and only the last two are kept.
+    for frame in range(1, 6):
+        channel.submit(frame, frame)
+    release.set()
+    for _ in range(3):
+        assert done.acquire(timeout=5.0)
+    stats = channel.stats()
+    pipeline.shutdown()
+    assert frames == [0, 4, 5]
+    assert stats['decoded'] == 3 and stats['dropped'] == 3
+    assert channel.latest() == (None, None)
+
+
+def test_decode_error_is_logged_not_raised(caplog):
+    pipeline = DecodePipeline(workers=0)
+    channel = pipeline.channel('cam', lambda x: 1 / x)
+    channel.submit(1, 0)
+    channel.submit(2, 1)
+    assert channel.latest() == (2, 1.0)
+    assert 'Failed to decode frame 1 of cam' in caplog.text
+
+
+def test_surface_buffers_cover_the_pipeline():
+    assert DecodePipeline(workers=0, maxsize=0).surface_buffers == 3
+    assert DecodePipeline(workers=2, maxsize=4).surface_buffers == 8
@@ -0,0 +1,66 @@
+import pytest
+
+from conftest import spawn_vehicle
+from ego_state import EgoStateCache
+
+
+def test_update_from_the_snapshot(world, carla):
+    ego = spawn_vehicle(world, 10.0, 5.0, yaw=90.0)
+    ego.apply_control(carla.VehicleControl(throttle=0.5, steer=-0.25, brake=0.0, hand_brake=True, gear=2))
+    world.tick()
+    snapshot = world.get_snapshot()
+    cache = EgoStateCache()
+    assert cache.update(snapshot, ego)
+    state = cache.state
+    assert state.frame == snapshot.frame and state.actor_id == ego.id
+    assert state.elapsed_seconds == snapshot.timestamp.elapsed_seconds
+    location = snapshot.find(ego.id).get_transform().location
+    assert tuple(state.position) == (location.x, location.y, location.z)
+    assert state.rotation[1] == 90.0
+    assert state.speed == pytest.approx(5.0)
+    assert (state.throttle, state.steer, state.brake) == (0.5, -0.25, 0.0)
+    assert state.hand_brake and not state.reverse and state.gear == 2
+    assert not state.walker
+
+
+def test_published_state_is_never_rewritten(world):
+    ego = spawn_vehicle(world)
+    ego.set_autopilot(True)
+    cache = EgoStateCache()
+    world.tick()
+    cache.update(world.get_snapshot(), ego)
+    first = cache.state
+    position = first.position.copy()
+    world.tick()
+    cache.update(world.get_snapshot(), ego)
+    assert cache.state is not first
+    assert cache.state.frame == first.frame + 1
+    assert (first.position == position).all()
+    assert cache.state.position[0] > position[0]
+
+
+def test_missing_actor_keeps_the_state(world):
+    ego = spawn_vehicle(world)
+    cache = EgoStateCache()
+    state = cache.state
+    assert not cache.update(world.get_snapshot(), None)
+    ego.destroy()
+    world.tick()
+    assert not cache.update(world.get_snapshot(), ego)
+    assert cache.state is state and state.frame is None
+
+
+def test_walker_control(world, carla):
+    vehicle = spawn_vehicle(world)
+
+    class Walker(object):
+        id = vehicle.id
+
+        def get_control(self):
+            return carla.WalkerControl(speed=1.5, jump=True)
+    world.tick()
+    cache = EgoStateCache()
+    cache.update(world.get_snapshot(), Walker())
+    state = cache.state
+    assert state.walker and state.walker_speed == 1.5 and state.jump
+    assert not state.control.any()
@@ -0,0 +1,68 @@
+import pygame
+import pytest
+
+from hud import HUD, TextCache
+
+
+@pytest.fixture
+def display():
+    pygame.init()
+    pygame.font.init()
+    yield pygame.display.set_mode((320, 240))
+    pygame.quit()
+
+
+class CountingFont(object):
+    def __init__(self):
+        self.calls = 0
+
+    def render(self, text, antialias, color):
+        self.calls += 1
+        return (text, color)
+
+
+def test_text_cache_is_keyed_by_text_and_color():
+    font = CountingFont()
+    cache = TextCache(font)
+    assert cache.render('a') == ('a', (255, 255, 255))
+    cache.render('a')
+    assert cache.render('a', (255, 0, 0)) == ('a', (255, 0, 0))
+    assert font.calls == 2
+
+
+def test_text_cache_drops_least_recently_used():
+    font = CountingFont()
+    cache = TextCache(font, maxsize=2)
+    cache.render('a')
+    cache.render('b')
+    cache.render('a')
+    cache.render('c')
+    assert len(cache) == 2
+    cache.render('a')
+    assert font.calls == 3
+    cache.render('b')
+    assert font.calls == 4
+
+
+def test_static_info_redraws_only_on_change(display, monkeypatch):
+    hud = HUD(320, 240, static_info=True)
+    redraws = []
+    render_info = hud._render_info
+    monkeypatch.setattr(hud, '_render_info', lambda surface: (redraws.append(surface), render_info(surface)))
+    hud._info_text = ['Speed: 1', ('Throttle:', 0.5, 0.0, 1.0)]
+    hud.render(display)
+    hud.render(display)
+    assert len(redraws) == 1 and redraws[0] is not display
+    hud._info_text = ['Speed: 2', ('Throttle:', 0.5, 0.0, 1.0)]
+    hud.render(display)
+    assert len(redraws) == 2
+
+
+def test_info_drawn_on_display_by_default(display, monkeypatch):
+    hud = HUD(320, 240)
+    redraws = []
+    monkeypatch.setattr(hud, '_render_info', redraws.append)
+    hud._info_text = ['Speed: 1']
+    hud.render(display)
+    hud.render(display)
+    assert redraws == [display, display]
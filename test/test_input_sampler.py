@@ -0,0 +1,61 @@
+import numpy as np
+
+from controller.bindings import JoystickBindings
+from controller.input_sampler import FakeJoystick, InputSampler, SAMPLE_FIELDS
+from telemetry import TelemetryLogger, load_telemetry
+
+BINDINGS = JoystickBindings({'steer_axis': 0, 'throttle_axis': 2, 'brake_axis': 3,
+                             'handbrake_button': 4, 'reverse_button': 5})
+
+
+class ListLog(object):
+    def __init__(self):
+        self.rows = []
+        self.closed = False
+
+    def append(self, row):
+        self.rows.append(row)
+
+    def close(self):
+        self.closed = True
+
+
+def sample(sampler, joystick, steps):
+    for i in range(steps):
+        joystick.set_axis(0, i / 10.0)
+        sampler.sample()
+
+
+def test_ring_buffer_keeps_the_last_samples():
+    joystick = FakeJoystick()
+    sampler = InputSampler(joystick, BINDINGS, capacity=4)
+    assert sampler.latest() is None
+    sample(sampler, joystick, 6)
+    assert len(sampler) == 4
+    assert sampler.latest()[1] == 0.5
+    history = sampler.history()
+    assert history[:, 1].tolist() == [0.2, 0.3, 0.4, 0.5]
+    assert np.all(np.diff(history[:, 0]) >= 0.0)
+
+
+def test_every_sample_goes_to_the_log():
+    joystick = FakeJoystick()
+    log = ListLog()
+    sampler = InputSampler(joystick, BINDINGS, capacity=2, log=log)
+    sample(sampler, joystick, 5)
+    sampler.stop()
+    assert [row[1] for row in log.rows] == [0.0, 0.1, 0.2, 0.3, 0.4]
+    # The caller owns the log.
+    assert not log.closed
+
+
+def test_log_to_telemetry_logger(tmp_path):
+    joystick = FakeJoystick()
+    log = TelemetryLogger(str(tmp_path / 'inputs.npz'), SAMPLE_FIELDS, chunk_rows=2)
+    sampler = InputSampler(joystick, BINDINGS, capacity=2, log=log)
+    sample(sampler, joystick, 5)
+    sampler.stop()
+    log.close()
+    table = load_telemetry(str(tmp_path / 'inputs.npz'))
+    assert table.fields == SAMPLE_FIELDS
+    assert table['steer'].tolist() == [0.0, 0.1, 0.2, 0.3, 0.4]
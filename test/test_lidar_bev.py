@@ -0,0 +1,93 @@
+import numpy as np
+import pygame
+import pytest
+
+from lidar_bev import BEVRasterizer, SEMANTIC_COLORS, SEMANTIC_LIDAR_POINT_SIZE, intensity_lut
+
+WHITE = 0xffffff
+
+
+def rgb(color):
+    color = [int(x) for x in color]
+    return (color[0] << 16) | (color[1] << 8) | color[2]
+
+
+def sweep(*points):
+    return np.array(points, dtype=np.float32).tobytes()
+
+
+def semantic_sweep(*points):
+    data = np.zeros((len(points), SEMANTIC_LIDAR_POINT_SIZE), dtype=np.float32)
+    for row, (x, y, tag) in zip(data, points):
+        row[:2] = (x, y)
+        row[4:].view(np.uint32)[1] = tag
+    return data.tobytes()
+
+
+def lit(pixels):
+    return {(int(x), int(y)): int(pixels[x, y]) for x, y in zip(*np.nonzero(pixels))}
+
+
+def test_points_land_on_their_cells():
+    # 1 pixel per meter, the sensor at the center of a 100x80 image.
+    bev = BEVRasterizer((100, 80), 40.0)
+    pixels = bev.rasterize(sweep((0.0, 0.0, 0.0, 1.0), (10.2, -5.5, 0.0, 1.0), (-49.9, 39.9, 0.0, 1.0)))
+    assert pixels.shape == (100, 80)
+    assert lit(pixels) == {(50, 40): WHITE, (60, 34): WHITE, (0, 79): WHITE}
+
+
+def test_out_of_range_points_are_clamped_off_the_image():
+    bev = BEVRasterizer((100, 80), 40.0)
+    pixels = bev.rasterize(sweep((50.0, 0.0, 0.0, 1.0), (-50.1, 0.0, 0.0, 1.0), (0.0, 40.0, 0.0, 1.0),
+                                 (0.0, -1e9, 0.0, 1.0), (1e9, 1e9, 0.0, 1.0)))
+    assert not pixels.any()
+
+
+def test_each_sweep_clears_the_previous_one():
+    bev = BEVRasterizer((100, 80), 40.0)
+    bev.rasterize(sweep((1.0, 1.0, 0.0, 1.0)))
+    pixels = bev.rasterize(sweep((-1.0, -1.0, 0.0, 1.0)))
+    assert lit(pixels) == {(49, 39): WHITE}
+
+
+def test_buffers_grow_with_the_sweep():
+    bev = BEVRasterizer((100, 80), 40.0)
+    points = np.zeros((5000, 4), dtype=np.float32)
+    points[:, 0] = np.linspace(-39.0, 39.0, 5000)
+    pixels = bev.rasterize(points.tobytes())
+    assert bev._capacity >= 5000
+    assert np.count_nonzero(pixels[:, 40]) == 79
+    assert lit(bev.rasterize(sweep((0.0, 0.0, 0.0, 1.0)))) == {(50, 40): WHITE}
+
+
+def test_intensity_is_clamped_to_the_color_map():
+    lut = intensity_lut()
+    bev = BEVRasterizer((100, 80), 40.0, color_mode='intensity')
+    pixels = bev.rasterize(sweep((0.0, 0.0, 0.0, 0.0), (1.0, 0.0, 0.0, 1.0), (2.0, 0.0, 0.0, 7.5)))
+    assert pixels[50, 40] == rgb(lut[0])
+    assert pixels[51, 40] == pixels[52, 40] == rgb(lut[-1])
+
+
+def test_semantic_tags():
+    bev = BEVRasterizer((100, 80), 40.0, SEMANTIC_LIDAR_POINT_SIZE, 'semantic')
+    pixels = bev.rasterize(semantic_sweep((0.0, 0.0, 14), (1.0, 0.0, 1), (2.0, 0.0, 1000)))
+    assert pixels[50, 40] == rgb(SEMANTIC_COLORS[14])
+    assert pixels[51, 40] == rgb(SEMANTIC_COLORS[1])
+    # Unknown tags are drawn white.
+    assert pixels[52, 40] == WHITE
+
+
+def test_invalid_color_modes():
+    with pytest.raises(ValueError):
+        BEVRasterizer((100, 80), 40.0, color_mode='semantic')
+    with pytest.raises(ValueError):
+        BEVRasterizer((100, 80), 40.0, color_mode='height')
+
+
+def test_render_cycles_through_the_surfaces():
+    bev = BEVRasterizer((100, 80), 40.0, num_buffers=2)
+    data = sweep((0.0, 0.0, 0.0, 1.0))
+    first, second, third = bev.render(data), bev.render(data), bev.render(data)
+    assert first is third and first is not second
+    assert isinstance(first, pygame.Surface) and first.get_size() == (100, 80)
+    assert first.get_at((50, 40)) == pygame.Color(255, 255, 255)
@@ -0,0 +1,135 @@
+import math
+
+import numpy as np
+import pytest
+
+from conftest import spawn_vehicle
+from controller.longitudinal import (CarFollowingController, ConstantTimeHeadway, FOLLOWING_MODELS, IDM, PIDACC,
+                                     accel_to_pedals, following_gap, make_model)
+
+
+def test_idm_free_road():
+    idm = IDM(desired_speed=20.0, max_accel=1.5)
+    assert idm.acceleration(math.inf, 0.0, 0.0, 0.05) == pytest.approx(1.5)
+    assert idm.acceleration(math.inf, 20.0, 20.0, 0.05) == pytest.approx(0.0)
+    assert idm.acceleration(math.inf, 10.0, 10.0, 0.05) == pytest.approx(1.5 * (1.0 - 0.5 ** 4))
+
+
+def test_idm_following():
+    idm = IDM(desired_speed=20.0, time_headway=1.5, min_gap=2.0, max_accel=1.5, comfort_decel=2.0)
+    # At the desired gap only the free road term is left.
+    assert idm.acceleration(2.0 + 15.0, 10.0, 10.0, 0.05) == pytest.approx(-1.5 * 0.5 ** 4)
+    # Closing in on a slower leader: s* = 2 + 15 + 10 * 5 / (2 sqrt(3)).
+    desired_gap = 17.0 + 50.0 / (2.0 * math.sqrt(3.0))
+    assert idm.acceleration(30.0, 10.0, 5.0, 0.05) == pytest.approx(
+        1.5 * (1.0 - 0.5 ** 4 - (desired_gap / 30.0) ** 2))
+    assert idm.acceleration(30.0, 10.0, 5.0, 0.05) < 0.0 < idm.acceleration(30.0, 10.0, 10.0, 0.05)
+    # A zero or negative gap brakes hard instead of dividing by zero.
+    assert idm.acceleration(0.0, 10.0, 10.0, 0.05) < -1000.0
+
+
+def test_cth():
+    cth = ConstantTimeHeadway(desired_speed=25.0, time_headway=1.5, min_gap=2.0, k_gap=0.23, k_speed=0.07,
+                              k_cruise=0.4)
+    assert cth.acceleration(17.0, 10.0, 10.0, 0.05) == pytest.approx(0.0)
+    assert cth.acceleration(27.0, 10.0, 12.0, 0.05) == pytest.approx(0.23 * 10.0 + 0.07 * 2.0)
+    # The cruise controller caps the acceleration of a far or missing leader.
+    assert cth.acceleration(math.inf, 20.0, 20.0, 0.05) == pytest.approx(0.4 * 5.0)
+
+
+def test_acc_integral_and_reset():
+    acc = PIDACC(desired_speed=25.0, time_headway=1.5, min_gap=2.0, kp=0.2, ki=0.01, kd=0.6, k_cruise=0.4,
+                 integral_limit=0.5)
+    # 3 m too close to a leader at the same speed.
+    assert acc.acceleration(14.0, 10.0, 10.0, 0.1) == pytest.approx(0.2 * -3.0 + 0.01 * -0.3)
+    assert acc.acceleration(14.0, 10.0, 10.0, 0.1) == pytest.approx(0.2 * -3.0 + 0.01 * -0.5)
+    acc.reset()
+    assert acc.acceleration(14.0, 10.0, 10.0, 0.1) == pytest.approx(0.2 * -3.0 + 0.01 * -0.3)
+    # Without a leader it cruises and the integral does not wind up.
+    acc.reset()
+    assert acc.acceleration(math.inf, 20.0, 20.0, 0.1) == pytest.approx(0.4 * 5.0)
+    assert acc._integral == 0.0
+
+
+@pytest.mark.parametrize('name', FOLLOWING_MODELS)
+def test_models_work_on_arrays(name):
+    model = make_model(name, desired_speed=20.0)
+    gaps = np.array([math.inf, 40.0, 10.0])
+    speeds = np.array([10.0, 10.0, 10.0])
+    accel = model.acceleration(gaps, speeds, np.array([10.0, 10.0, 5.0]), 0.05)
+    assert accel.shape == (3,)
+    assert accel[0] > 0.0 and accel[2] < 0.0
+    for i in range(3):
+        model.reset()
+        assert accel[i] == pytest.approx(model.acceleration(gaps[i], speeds[i], [10.0, 10.0, 5.0][i], 0.05))
+
+
+def test_make_model():
+    assert isinstance(make_model('idm', time_headway=1.0), IDM)
+    with pytest.raises(ValueError):
+        make_model('gipps')
+
+
+def test_accel_to_pedals():
+    throttle, brake = accel_to_pedals(np.array([-16.0, -4.0, 0.0, 1.5, 6.0]), 3.0, 8.0)
+    np.testing.assert_allclose(throttle, [0.0, 0.0, 0.0, 0.5, 1.0])
+    np.testing.assert_allclose(brake, [1.0, 0.5, 0.0, 0.0, 0.0])
+
+
+def test_following_gap():
+    assert following_gap((0.0, 0.0, 0.0), 0.0, (30.0, 0.0, 0.0), 4.8) == pytest.approx(25.2)
+    assert following_gap((0.0, 0.0, 0.0), 90.0, (0.0, 30.0, 0.0), 4.8) == pytest.approx(25.2)
+    # Only the distance along the heading counts.
+    assert following_gap((0.0, 0.0, 0.0), 0.0, (30.0, 3.5, 0.0), 4.8) == pytest.approx(25.2)
+    gaps = following_gap(np.zeros((2, 3)), np.array([0.0, 180.0]), np.array([[10.0, 0.0, 0.0]] * 2), 4.8)
+    np.testing.assert_allclose(gaps, [5.2, -14.8])
+
+
+def test_controller_follows_the_leader(world, carla):
+    ego = spawn_vehicle(world, 0.0)
+    leader = spawn_vehicle(world, 30.0)
+    for actor, speed in ((ego, 10.0), (leader, 5.0)):
+        actor.set_autopilot(True)
+        actor._autopilot_speed = speed
+    controller = CarFollowingController(IDM(desired_speed=20.0))
+    controller.attach(ego, leader)
+    world.tick()
+    snapshot = world.get_snapshot()
+    accel = controller.update(snapshot)
+    dx = snapshot.find(leader.id).get_transform().location.x - snapshot.find(ego.id).get_transform().location.x
+    assert controller.gap == pytest.approx(dx - 4.8)
+    assert (controller.speed, controller.leader_speed) == pytest.approx((10.0, 5.0))
+    assert accel == pytest.approx(IDM(desired_speed=20.0).acceleration(controller.gap, 10.0, 5.0, 0.05))
+
+    control = controller.apply(carla.VehicleControl())
+    assert control.throttle == 0.0 and control.brake == pytest.approx(-accel / 8.0)
+    ackermann = controller.apply(carla.VehicleAckermannControl())
+    assert ackermann.speed == pytest.approx(10.0 + accel * controller.dt)
+    assert ackermann.acceleration == pytest.approx(-accel)
+
+
+def test_controller_updates_once_per_frame(world):
+    ego = spawn_vehicle(world, 0.0)
+    leader = spawn_vehicle(world, 30.0)
+    calls = []
+    model = ConstantTimeHeadway()
+    model_acceleration = model.acceleration
+    model.acceleration = lambda *args: (calls.append(args), model_acceleration(*args))[1]
+    controller = CarFollowingController(model)
+    controller.attach(ego, leader)
+    world.tick()
+    snapshot = world.get_snapshot()
+    assert controller.update(snapshot) == controller.update(snapshot)
+    assert len(calls) == 1 and controller.frame == snapshot.frame
+
+
+def test_controller_without_leader_cruises(world):
+    ego = spawn_vehicle(world)
+    controller = CarFollowingController(ConstantTimeHeadway(desired_speed=20.0, k_cruise=0.4))
+    controller.attach(ego)
+    world.tick()
+    assert controller.update(world.get_snapshot()) == pytest.approx(8.0)
+    assert controller.gap == math.inf
+    ego.destroy()
+    world.tick()
+    assert controller.update(world.get_snapshot()) is None
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from controller.longitudinal import ConstantTimeHeadway
+from platoon import Platoon, SPEED, X
+
+
+@pytest.fixture
+def client(carla):
+    return carla.Client()
+
+
+def platoon_of(client, carla, num_followers=2, spacing=15.0, model=None):
+    world = client.get_world()
+    platoon = Platoon(client, world, model or ConstantTimeHeadway(desired_speed=20.0))
+    library = world.get_blueprint_library()
+    transforms = platoon.column_transforms(world.get_map().get_spawn_points()[0], num_followers, spacing)
+    platoon.spawn(library.find('vehicle.dodge.charger_2020'), library.find('vehicle.tesla.model3'), transforms)
+    return platoon
+
+
+def test_column_behind_the_leader(client, carla):
+    world = client.get_world()
+    platoon = Platoon(client, world, ConstantTimeHeadway())
+    leader = world.get_map().get_spawn_points()[0]
+    transforms = platoon.column_transforms(leader, 3, 12.0)
+    assert transforms[0] is leader
+    assert [leader.location.x - t.location.x for t in transforms] == pytest.approx([0.0, 12.0, 24.0, 36.0])
+    assert all(t.location.z == leader.location.z for t in transforms)
+
+
+def test_spawn_in_one_batch(client, carla):
+    platoon = platoon_of(client, carla)
+    world = client.get_world()
+    assert len(platoon) == 3 and platoon.follower_ids == platoon.ids[1:]
+    leader = world.get_actor(platoon.leader_id)
+    assert leader.type_id == 'vehicle.dodge.charger_2020' and leader.autopilot
+    assert all(not world.get_actor(x).autopilot for x in platoon.follower_ids)
+    platoon.destroy()
+    assert len(platoon) == 0 and not world.get_actors()
+
+
+def test_failed_spawn_destroys_the_others(client, carla):
+    world = client.get_world()
+    platoon = Platoon(client, world, ConstantTimeHeadway())
+    library = world.get_blueprint_library()
+    leader = world.get_map().get_spawn_points()[0]
+    # The second follower overlaps the first.
+    transforms = platoon.column_transforms(leader, 1, 15.0) * 2
+    with pytest.raises(RuntimeError, match='collision'):
+        platoon.spawn(library.find('vehicle.dodge.charger_2020'), library.find('vehicle.tesla.model3'), transforms)
+    assert not world.get_actors()
+
+
+def test_gaps_pair_each_follower_with_its_predecessor(client, carla, monkeypatch):
+    world = client.get_world()
+    get_actors = world.get_actors
+
+    def shuffled_actors(ids=None):
+        # get_actors() does not keep the order of the ids, and the leader is shorter.
+        actors = get_actors(ids)
+        for actor in actors:
+            actor.bounding_box = carla.BoundingBox(carla.Vector3D(2.0 if actor.type_id.endswith('2020') else 2.4,
+                                                                  1.0, 0.75))
+        return carla.ActorList(reversed(actors))
+    monkeypatch.setattr(world, 'get_actors', shuffled_actors)
+    platoon = platoon_of(client, carla, num_followers=2, spacing=15.0)
+    np.testing.assert_allclose(platoon.half_lengths, [2.0, 2.4, 2.4])
+
+    world.tick()
+    assert platoon.update(world.get_snapshot())
+    platoon.step(0.05)
+    dx = -np.diff(platoon.state[:, X])
+    np.testing.assert_allclose(platoon.gap, [dx[0] - 4.4, dx[1] - 4.8])
+
+
+def test_tick_drives_the_followers(client, carla):
+    platoon = platoon_of(client, carla, model=ConstantTimeHeadway(desired_speed=20.0, k_cruise=0.4))
+    world = client.get_world()
+    world.tick()
+    assert platoon.tick(world.get_snapshot())
+    assert len(platoon.commands) == 2
+    assert platoon.state[0, SPEED] == pytest.approx(10.0)
+    assert np.all(np.diff(platoon.state[:, X]) < 0.0)
+    # Followers start at rest behind a leader at 10 m/s: full throttle, straight ahead.
+    for actor_id, accel in zip(platoon.follower_ids, platoon.acceleration):
+        control = world.get_actor(actor_id).get_control()
+        assert control.throttle == pytest.approx(min(accel / 3.0, 1.0)) and control.brake == 0.0
+        assert control.steer == pytest.approx(0.0)
+
+
+def test_update_with_a_missing_vehicle(client, carla):
+    platoon = platoon_of(client, carla)
+    world = client.get_world()
+    world.get_actor(platoon.follower_ids[-1]).destroy()
+    world.tick()
+    assert not platoon.tick(world.get_snapshot())
+    assert platoon.commands is None
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from recorder import FrameRecorder, RecordingReader
+
+
+def image(carla, frame, width=8, height=4):
+    data = np.full((height, width, 4), frame % 256, dtype=np.uint8)
+    return carla.Image(frame, 0.05 * frame, carla.Transform(), width, height, 90.0, memoryview(data.tobytes()))
+
+
+@pytest.mark.parametrize('compress, compress_workers', [(False, 0), (True, 0), (True, 2)])
+def test_round_trip(carla, tmp_path, compress, compress_workers):
+    recorder = FrameRecorder(str(tmp_path), segment_frames=3, compress=compress, compress_workers=compress_workers)
+    for frame in range(1, 8):
+        recorder.record(image(carla, frame))
+    recorder.close()
+    assert recorder.written == 7 and recorder.dropped == 0
+    assert len([x for x in tmp_path.iterdir() if x.name.startswith('segment_')]) == 3
+
+    reader = RecordingReader(str(tmp_path))
+    assert reader.frames == list(range(1, 8))
+    assert reader.timestamp(4) == pytest.approx(0.2)
+    frames = list(reader.slice(2, 7, 2))
+    assert [x[0] for x in frames] == [2, 4, 6]
+    for frame, array in frames:
+        assert array.shape == (4, 8, 4) and np.all(array == frame)
+    reader.close()
@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import ROOT_DIR
+from controller.response_curve import ResponseCurve, apply_curves, load_curves
+
+AXIS = np.linspace(-1.0, 1.0, 101)
+
+
+def test_linear_bipolar_is_identity():
+    curve = ResponseCurve()
+    assert curve(-1.0) == pytest.approx(-1.0)
+    assert curve(0.0) == pytest.approx(0.0)
+    assert curve(0.3) == pytest.approx(0.3)
+    np.testing.assert_allclose(curve.evaluate(AXIS), AXIS, atol=1e-12)
+
+
+def test_unipolar_maps_the_pedal_travel():
+    curve = ResponseCurve(bipolar=False)
+    assert curve(-1.0) == 0.0 and curve(1.0) == pytest.approx(1.0)
+    assert curve(0.0) == pytest.approx(0.5)
+    assert ResponseCurve(bipolar=False, invert=True)(-1.0) == pytest.approx(1.0)
+
+
+def test_inputs_outside_the_axis_are_clamped():
+    curve = ResponseCurve()
+    assert curve(-3.0) == pytest.approx(-1.0) and curve(7.0) == pytest.approx(1.0)
+    np.testing.assert_allclose(curve.evaluate([-3.0, 7.0]), [-1.0, 1.0])
+
+
+def test_interpolates_between_entries():
+    # Entries at -1, -0.5, 0, 0.5, 1 of a gamma 2 curve: -1, -0.25, 0, 0.25, 1, linear in between.
+    curve = ResponseCurve(gamma=2.0, resolution=5)
+    assert curve(0.5) == pytest.approx(0.25)
+    assert curve(0.75) == pytest.approx(0.625)
+    assert curve(-0.25) == pytest.approx(-0.125)
+    np.testing.assert_allclose(curve.evaluate([0.5, 0.75, -0.25]), [0.25, 0.625, -0.125])
+
+
+def test_scalar_and_array_lookups_agree():
+    curve = ResponseCurve(deadzone=0.05, saturation=0.9, gamma=1.7, shape='tan', gain=0.7)
+    np.testing.assert_allclose(curve.evaluate(AXIS), [curve(x) for x in AXIS], atol=1e-12)
+
+
+def test_deadzone_and_saturation():
+    curve = ResponseCurve(deadzone=0.1, saturation=0.6)
+    assert curve(0.05) == 0.0 and curve(-0.09) == 0.0
+    assert curve(0.35) == pytest.approx(0.5, abs=1e-3)
+    assert curve(-0.35) == pytest.approx(-0.5, abs=1e-3)
+    assert curve(0.8) == pytest.approx(1.0)
+
+
+def test_points_and_tan_shape():
+    curve = ResponseCurve(bipolar=False, points=[[0.0, 0.0], [0.5, 0.2], [1.0, 1.0]])
+    assert curve(0.0) == pytest.approx(0.2)
+    steer = ResponseCurve(shape='tan', gain=0.5)
+    assert steer(0.5) == pytest.approx(np.tan(0.25), abs=1e-6)
+    # tan grows past 1 for large gains, the output stays in range.
+    assert ResponseCurve(shape='tan', gain=1.1)(1.0) == 1.0
+
+
+@pytest.mark.parametrize('kwargs', [{'shape': 'cubic'}, {'deadzone': 0.5, 'saturation': 0.5},
+                                    {'saturation': 1.5}, {'deadzone': -0.1}, {'gamma': 0.0},
+                                    {'resolution': 1}])
+def test_invalid_curves(kwargs):
+    with pytest.raises(ValueError):
+        ResponseCurve(**kwargs)
+
+
+def test_load_curves(tmp_path):
+    curves = load_curves()
+    assert set(curves) == {'steer', 'throttle', 'brake'}
+    assert curves['steer'].shape == 'tan' and not curves['brake'].bipolar
+    default = load_curves(os.path.join(ROOT_DIR, 'config', 'response_curves_default.yaml'))
+    np.testing.assert_array_equal(default['steer'].table, curves['steer'].table)
+
+    path = tmp_path / 'curves.yaml'
+    path.write_text('brake:\n  bipolar: false\n  gamma: 2.0\n')
+    assert load_curves(str(path))['brake'].gamma == 2.0
+    path.write_text('clutch:\n  bipolar: false\n')
+    with pytest.raises(ValueError, match='clutch'):
+        load_curves(str(path))
+
+
+def test_apply_curves():
+    curves = load_curves()
+    samples = np.array([[0.0, 0.5, -1.0, 1.0, 0.0], [0.002, -0.5, 1.0, -1.0, 1.0]])
+    controls = apply_curves(curves, samples)
+    np.testing.assert_array_equal(controls[:, [0, 4]], samples[:, [0, 4]])
+    assert controls[0, 1] == pytest.approx(curves['steer'](0.5))
+    np.testing.assert_allclose(controls[:, 2], [0.0, 1.0])
+    np.testing.assert_allclose(controls[:, 3], [1.0, 0.0])
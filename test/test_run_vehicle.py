@@ -0,0 +1,41 @@
+import sys
+
+import pytest
+
+import run_vehicle
+
+
+def parse(monkeypatch, *argv):
+    monkeypatch.setattr(sys, 'argv', ['run_vehicle.py'] + list(argv))
+    return run_vehicle.argparser()
+
+
+def test_sim_pacing_needs_sync(monkeypatch, capsys):
+    with pytest.raises(SystemExit):
+        parse(monkeypatch, '--pacing', 'sim')
+    assert '--pacing sim needs --sync' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('argv', [('--sync',), ('--record_session', 'run.npz')])
+def test_sim_pacing_with_a_fixed_step(monkeypatch, argv):
+    assert parse(monkeypatch, '--pacing', 'sim', *argv).pacing == 'sim'
+
+
+def test_world_spawns_ego_and_leader(monkeypatch, carla):
+    client = carla.Client()
+    args = parse(monkeypatch, '--headless', '--leader_gap', '20')
+    world = run_vehicle.World(client.get_world(), run_vehicle.HUD(1280, 720, headless=True),
+                              args, client=client)
+    assert world.player.attributes['role_name'] == 'hero'
+    assert world.leader is not None
+    assert set(world.spawn_transforms) == {'ego', 'leader'}
+    world.destroy()
+    world.destroy_leader()
+
+
+def test_world_without_leader_blueprint(monkeypatch, carla):
+    client = carla.Client()
+    args = parse(monkeypatch, '--headless', '--leader_filter', 'no_such_vehicle')
+    with pytest.raises(ValueError, match='leader filter'):
+        run_vehicle.World(client.get_world(), run_vehicle.HUD(1280, 720, headless=True),
+                          args, client=client)
@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+import pytest
+
+import world_cache
+from conftest import ROOT_DIR, spawn_vehicle
+from sensor_rig import RigSensorSpec, SensorRig, load_rig
+from sensor_sync import SensorSync
+
+RIG_SURROUND = os.path.join(ROOT_DIR, 'config', 'rig_surround.yaml')
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    world_cache.invalidate()
+    yield
+    world_cache.invalidate()
+
+
+def test_spec_defaults():
+    spec = RigSensorSpec({'type': 'sensor.lidar.ray_cast_semantic', 'display_pos': [0, 1],
+                          'transform': {'z': 2, 'yaw': 90}, 'attributes': {'range': 50, 'channels': 32}})
+    assert spec.name == 'sensor.lidar.ray_cast_semantic' and spec.category == 'semantic_lidar'
+    assert spec.transform == (0.0, 0.0, 2.0, 0.0, 90.0, 0.0)
+    assert spec.attachment == 'rigid' and spec.color_converter == 'raw'
+    assert (spec.sensor_tick, spec.decimation, spec.scale) == (0.0, 1, 1.0)
+    # YAML numbers become the strings blueprint attributes take.
+    assert spec.attributes == (('channels', '32'), ('range', '50'))
+    assert spec.consumers == ('display',) and spec.display_pos == (0, 1)
+    assert spec.size((800, 600)) == (800, 600)
+
+
+def test_spec_rate_and_size():
+    spec = RigSensorSpec({'name': 'depth', 'type': 'sensor.camera.depth', 'sensor_tick': 0.1, 'decimation': 2,
+                          'scale': 0.5, 'consumers': ['sync', 'record']})
+    assert (spec.sensor_tick, spec.decimation) == (0.1, 2)
+    assert spec.size((800, 600)) == (400, 300)
+    assert spec.display_pos is None
+
+
+@pytest.mark.parametrize('cfg, message', [
+    ({'fov': 90}, 'Unknown sensor rig keys: fov'),
+    ({'transform': {'heading': 90}}, 'Unknown transform keys'),
+    ({'attachment': 'glued'}, 'Unknown attachment'),
+    ({'decimation': 0}, 'Decimation'),
+    ({'scale': 0}, 'Scale'),
+    ({'color_converter': 'sepia'}, 'Unknown color converter'),
+    ({'consumers': ['display', 'stream']}, 'Unknown consumers'),
+    ({'display_pos': None}, 'no display_pos'),
+])
+def test_invalid_specs(cfg, message):
+    base = {'name': 'front', 'type': 'sensor.camera.rgb', 'display_pos': [0, 0]}
+    base.update(cfg)
+    if cfg.get('display_pos', True) is None:
+        del base['display_pos']
+    with pytest.raises(ValueError, match=message):
+        RigSensorSpec(base)
+
+
+def test_load_rig():
+    grid, specs = load_rig(RIG_SURROUND)
+    assert grid == (3, 4) and len(specs) == 12
+    by_name = {x.name: x for x in specs}
+    assert by_name['cam_090'].transform[4] == 90.0
+    assert by_name['depth'].color_converter == 'logarithmic_depth' and by_name['depth'].scale == 0.5
+    assert by_name['semantic_lidar'].decimation == 2
+    assert by_name['radar'].consumers == ()
+    grid, specs = load_rig(os.path.join(ROOT_DIR, 'config', 'rig_multi_sensor.yaml'))
+    assert specs
+
+
+def test_load_rig_defaults_and_duplicates(tmp_path):
+    path = tmp_path / 'rig.yaml'
+    path.write_text('')
+    assert load_rig(str(path)) == ((1, 1), [])
+    path.write_text('sensors:\n'
+                    '  - {name: a, type: sensor.camera.rgb, display_pos: [0, 0]}\n'
+                    '  - {name: a, type: sensor.camera.depth, display_pos: [0, 1]}\n')
+    with pytest.raises(ValueError, match='Duplicate sensor names .*: a'):
+        load_rig(str(path))
+
+
+def test_spawn_rig(carla):
+    client = carla.Client()
+    world = client.get_world()
+    world.apply_settings(carla.WorldSettings(synchronous_mode=True, fixed_delta_seconds=0.05))
+    sync = SensorSync(timeout=0.01)
+    rig = SensorRig.from_yaml(RIG_SURROUND, client, world, window_size=(400, 300), headless=True, decode_workers=0)
+    assert rig.grid == (3, 4) and rig.cell_size == (100, 100)
+    for spec in rig.specs:
+        spec.consumers += ('sync',) if spec.consumers else ()
+    parent = spawn_vehicle(world)
+    rig.spawn(parent, sensor_sync=sync)
+    # The radar has no consumer.
+    assert len(rig) == 11 and 'radar' not in rig.sensors
+    assert all(x.actor.parent is parent for x in rig)
+    depth = rig['depth'].blueprint
+    assert depth.get_attribute('image_size_x').as_str() == '50'
+    assert depth.get_attribute('sensor_tick').as_str() == '0.1'
+    assert rig['lidar'].blueprint.get_attribute('channels').as_str() == '64'
+    assert sync._periods['depth'] == 2 and sync._periods['semantic_lidar'] == 2 and sync._periods['cam_000'] == 1
+
+    for _ in range(2):
+        world.tick()
+    bundle = sync.get(world.get_snapshot().frame)
+    assert bundle.complete
+    assert bundle['cam_000'].shape == (100, 100, 4)
+    assert bundle['depth'].shape == (50, 50, 4)
+    assert bundle['lidar'].shape == (100, 100) and bundle['lidar'].dtype == np.uint32
+    rig.destroy()
+    assert world.get_actors().find(parent.id) is parent and len(world.get_actors()) == 1
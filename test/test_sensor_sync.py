@@ -0,0 +1,134 @@
+import threading
+
+import pytest
+
+from sensor_sync import SensorSync, sync_period
+
+
+def test_complete_bundle():
+    sync = SensorSync(timeout=0.1)
+    rgb = sync.register('rgb')
+    depth = sync.register('depth')
+    rgb(10, 'rgb10')
+    depth(10, 'depth10')
+    bundle = sync.get(10)
+    assert bundle.complete and bundle.frame == 10
+    assert bundle['rgb'] == 'rgb10' and bundle.frames == {'rgb': 10, 'depth': 10}
+
+
+def test_waits_for_a_late_sensor():
+    sync = SensorSync(timeout=5.0)
+    rgb = sync.register('rgb')
+    timer = threading.Timer(0.05, rgb, (3, 'late'))
+    timer.start()
+    bundle = sync.get(3)
+    timer.join()
+    assert bundle.complete and bundle['rgb'] == 'late'
+    assert sync.stats()['timeouts'] == 0
+
+
+def test_latest_policy_marks_stale():
+    sync = SensorSync(timeout=0.01, stale_policy='latest')
+    rgb = sync.register('rgb')
+    depth = sync.register('depth')
+    rgb(5, 'rgb5')
+    depth(4, 'depth4')
+    bundle = sync.get(5)
+    assert not bundle.complete and bundle.stale == ['depth']
+    assert bundle['depth'] == 'depth4' and bundle.frames['depth'] == 4
+    assert sync.stats()['timeouts'] == 1
+
+
+def test_latest_policy_without_any_output():
+    sync = SensorSync(timeout=0.01)
+    sync.register('rgb')
+    bundle = sync.get(1)
+    assert bundle['rgb'] is None and bundle.stale == ['rgb']
+
+
+def test_skip_policy():
+    sync = SensorSync(timeout=0.01, stale_policy='skip')
+    sync.register('rgb')
+    assert sync.get(1) is None
+    assert sync.stats() == {'bundles': 0, 'timeouts': 1, 'wait_avg': 0.0}
+
+
+def test_raise_policy():
+    sync = SensorSync(timeout=0.01, stale_policy='raise')
+    sync.register('rgb')
+    with pytest.raises(TimeoutError):
+        sync.get(1)
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        SensorSync(stale_policy='wait')
+
+
+def test_history_and_pruning():
+    sync = SensorSync(timeout=0.01, history=3)
+    rgb = sync.register('rgb')
+    for frame in range(10):
+        rgb(frame, frame)
+    # Only the last 3 outputs are kept.
+    assert sync.get(6).stale == ['rgb']
+    bundle = sync.get(8)
+    assert bundle.complete and bundle['rgb'] == 8
+    assert list(sync._frames['rgb']) == [8, 9]
+
+
+def test_unregister_releases_the_wait():
+    sync = SensorSync(timeout=5.0)
+    sync.register('rgb')
+    timer = threading.Timer(0.05, sync.unregister, ('rgb',))
+    timer.start()
+    bundle = sync.get(1)
+    timer.join()
+    assert bundle.complete and bundle.data == {}
+
+
+@pytest.mark.parametrize('sensor_tick, fixed_delta_seconds, decimation, period', [
+    (0.0, 0.05, 1, 1),
+    (0.1, 0.05, 1, 2),
+    (0.1, None, 1, 1),
+    (0.15, 0.05, 1, 3),
+    (0.12, 0.05, 1, 3),
+    (0.02, 0.05, 1, 1),
+    (0.0, 0.05, 2, 2),
+    (0.1, 0.05, 3, 6),
+    (0.1, 0.05, 0, 2),
+])
+def test_sync_period(sensor_tick, fixed_delta_seconds, decimation, period):
+    assert sync_period(sensor_tick, fixed_delta_seconds, decimation) == period
+
+
+def test_periodic_sensor_is_held():
+    sync = SensorSync(timeout=0.01)
+    rgb = sync.register('rgb')
+    depth = sync.register('depth', period=2)
+    rgb(10, 'rgb10')
+    depth(10, 'depth10')
+    assert sync.get(10).complete
+    # The depth output of frame 10 still covers frame 11.
+    rgb(11, 'rgb11')
+    bundle = sync.get(11)
+    assert bundle.complete and bundle['depth'] == 'depth10' and bundle.frames['depth'] == 10
+    # But not frame 12.
+    rgb(12, 'rgb12')
+    bundle = sync.get(12)
+    assert bundle.stale == ['depth'] and sync.stats()['timeouts'] == 1
+
+
+def test_attach_uses_the_period():
+    class Channel(object):
+        def __init__(self):
+            self.listeners = []
+
+        def add_listener(self, listener):
+            self.listeners.append(listener)
+    sync = SensorSync(timeout=0.01)
+    channel = Channel()
+    sync.attach('lidar', channel, period=3)
+    channel.listeners[0](0, 'sweep0')
+    assert sync.get(2).complete
+    assert not sync.get(3).complete
@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+
+import world_cache
+from session_replay import SESSION_VERSION, Session, SessionRecorder, carla_recorder_name, load_session
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    world_cache.invalidate()
+    yield
+    world_cache.invalidate()
+
+
+def synchronous_client(carla):
+    client = carla.Client()
+    world = client.get_world()
+    world.apply_settings(carla.WorldSettings(synchronous_mode=True, fixed_delta_seconds=0.05))
+    return client, world
+
+
+def spawn(carla, world, x, role_name, color):
+    blueprint = world.get_blueprint_library().find('vehicle.tesla.model3')
+    blueprint.set_attribute('role_name', role_name)
+    blueprint.set_attribute('color', color)
+    transform = carla.Transform(carla.Location(x, 0.0, 0.5), carla.Rotation(yaw=0.0))
+    return world.spawn_actor(blueprint, transform), transform
+
+
+def drive(carla, world, actors, recorder, frames, skip=()):
+    for i in range(frames):
+        for k, actor in enumerate(actors):
+            actor.apply_control(carla.VehicleControl(throttle=0.1 * (i % 5) + 0.1 * k, steer=0.01 * i, gear=1))
+        world.tick()
+        if i not in skip:
+            recorder.record(world.get_snapshot())
+
+
+def test_needs_synchronous_mode_with_a_fixed_step(carla, tmp_path):
+    world = carla.Client().get_world()
+    recorder = SessionRecorder(str(tmp_path / 'session.npz'), 1, 2)
+    with pytest.raises(ValueError):
+        recorder.record_world(world)
+    world.apply_settings(carla.WorldSettings(synchronous_mode=True, fixed_delta_seconds=None))
+    with pytest.raises(ValueError):
+        recorder.record_world(world)
+
+
+def test_unknown_role(carla, tmp_path):
+    client, world = synchronous_client(carla)
+    actor, transform = spawn(carla, world, 0.0, 'hero', '255,0,0')
+    with pytest.raises(ValueError):
+        SessionRecorder(str(tmp_path / 'session.npz'), 1, 2).record_actor('follower', actor, transform)
+
+
+def test_round_trip(carla, tmp_path):
+    client, world = synchronous_client(carla)
+    ego, ego_transform = spawn(carla, world, 0.0, 'hero', '255,0,0')
+    leader, leader_transform = spawn(carla, world, 30.0, 'leader', '0,0,255')
+    path = str(tmp_path / 'session.npz')
+    # A small capacity makes the recorder grow its buffers.
+    recorder = SessionRecorder(path, 7, 8, capacity=4)
+    recorder.record_world(world)
+    recorder.record_actor('ego', ego, ego_transform)
+    recorder.record_actor('leader', leader, leader_transform)
+    drive(carla, world, [ego, leader], recorder, 12, skip=(5,))
+    # The same snapshot again is ignored.
+    recorder.record(world.get_snapshot())
+    recorder.save()
+    assert len(recorder) == 12
+
+    session = load_session(path)
+    assert len(session) == 12
+    assert (session.seed, session.traffic_manager_seed) == (7, 8)
+    assert session.header['version'] == SESSION_VERSION
+    assert session.header['fixed_delta_seconds'] == 0.05
+    assert session.header['map'] == world_cache.world_metadata(world).map_name
+    assert session.header['actors']['ego']['attributes'] == {'role_name': 'hero', 'color': '255,0,0'}
+    ego_throttle = [0.1 * (i % 5) for i in range(12)]
+    # Frame 5 was not recorded and holds the control of frame 4.
+    ego_throttle[5] = ego_throttle[4]
+    np.testing.assert_allclose(session.controls['ego'][:, 0], ego_throttle)
+    np.testing.assert_allclose(session.controls['leader'][:, 0], np.array(ego_throttle) + 0.1)
+    control = session.control('ego', 3)
+    assert control.throttle == pytest.approx(0.3) and control.steer == pytest.approx(0.03)
+    assert control.gear == 1 and control.hand_brake is False
+    t = session.transform('leader')
+    assert (t.location.x, t.location.y, t.location.z) == (30.0, 0.0, 0.5)
+
+
+def test_replay_reproduces_the_session(carla, tmp_path):
+    client, world = synchronous_client(carla)
+    ego, ego_transform = spawn(carla, world, 0.0, 'hero', '255,0,0')
+    path = str(tmp_path / 'session.npz')
+    recorder = SessionRecorder(path, 1, 2)
+    recorder.record_world(world)
+    recorder.record_actor('ego', ego, ego_transform)
+    positions = []
+    for i in range(10):
+        ego.apply_control(carla.VehicleControl(throttle=0.1 * i))
+        world.tick()
+        recorder.record(world.get_snapshot())
+        positions.append(ego.get_location().x)
+    recorder.save()
+
+    session = load_session(path)
+    client, world = synchronous_client(carla)
+    actors = session.spawn(client, world)
+    assert set(actors) == {'ego'}
+    replayed = actors['ego']
+    assert replayed.attributes['role_name'] == 'hero' and replayed.attributes['color'] == '255,0,0'
+    assert not replayed.autopilot
+    replay_positions = []
+    for i in range(len(session)):
+        session.apply(client, actors, i)
+        world.tick()
+        replay_positions.append(replayed.get_location().x)
+    np.testing.assert_allclose(replay_positions, positions)
+
+
+def test_spawn_failure_cleans_up(carla, tmp_path):
+    client, world = synchronous_client(carla)
+    ego, ego_transform = spawn(carla, world, 0.0, 'hero', '255,0,0')
+    leader, leader_transform = spawn(carla, world, 30.0, 'leader', '0,0,255')
+    path = str(tmp_path / 'session.npz')
+    recorder = SessionRecorder(path, 1, 2)
+    recorder.record_world(world)
+    recorder.record_actor('ego', ego, ego_transform)
+    recorder.record_actor('leader', leader, leader_transform)
+    world.tick()
+    recorder.record(world.get_snapshot())
+    recorder.save()
+    ego.destroy()
+    # The leader is still in the way of its own recorded spawn point.
+    with pytest.raises(RuntimeError):
+        load_session(path).spawn(client, world)
+    assert [x.id for x in world.get_actors()] == [leader.id]
+
+
+def test_unsupported_version():
+    with pytest.raises(ValueError):
+        Session({'version': SESSION_VERSION + 1}, {})
+
+
+def test_carla_recorder_name():
+    assert carla_recorder_name('/tmp/runs/session_3.npz') == 'session_3.log'
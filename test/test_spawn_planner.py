@@ -0,0 +1,93 @@
+import random
+
+import numpy as np
+import pytest
+
+import world_cache
+from conftest import spawn_vehicle
+from spawn_planner import GridIndex, SpawnPlanner
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    world_cache.invalidate()
+    yield
+    world_cache.invalidate()
+
+
+def brute_force(points, x, y, radius):
+    d = np.hypot(points[:, 0] - x, points[:, 1] - y)
+    return sorted(np.nonzero(d < radius)[0].tolist())
+
+
+@pytest.mark.parametrize('cell_size', [1.0, 10.0, 50.0])
+def test_grid_matches_brute_force(cell_size):
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-100.0, 100.0, (500, 3))
+    grid = GridIndex(points, cell_size)
+    assert len(grid) == 500
+    for x, y, radius in rng.uniform((-120.0, -120.0, 0.5), (120.0, 120.0, 40.0), (50, 3)).tolist():
+        assert sorted(grid.query(x, y, radius)) == brute_force(points, x, y, radius)
+
+
+def test_grid_edges():
+    grid = GridIndex([(0.0, 0.0), (-0.1, -0.1), (10.0, 0.0), (-25.0, 3.0)], cell_size=10.0)
+    # Points exactly at the radius are outside.
+    assert sorted(grid.query(0.0, 0.0, 10.0)) == [0, 1]
+    # Radii larger than a cell reach the neighbouring cells.
+    assert sorted(grid.query(0.0, 0.0, 25.5)) == [0, 1, 2, 3]
+    assert grid.query(500.0, 500.0, 5.0) == []
+
+
+def test_empty_grid():
+    grid = GridIndex([])
+    assert len(grid) == 0 and grid.query(0.0, 0.0, 100.0) == []
+
+
+def test_free_spawn_points(world):
+    spawn_vehicle(world, 0.0, 0.0)
+    spawn_vehicle(world, 51.0, 50.0)
+    planner = SpawnPlanner(world)
+    planner.refresh()
+    free = planner.free_spawn_points()
+    assert len(free) == 98 and 0 not in free and 15 not in free
+
+
+def test_leader_transform(world):
+    planner = SpawnPlanner(world)
+    ego = planner.metadata.spawn_point(0)
+    leader = planner.leader_transform(ego, 25.0)
+    assert (leader.location.x, leader.location.y, leader.location.z) == pytest.approx((25.0, 0.0, 0.5))
+    spawn_vehicle(world, 27.0, 0.0)
+    planner.refresh()
+    assert planner.leader_transform(ego, 25.0) is None
+
+
+def test_spawn_pair(carla):
+    client = carla.Client()
+    world = client.get_world()
+    library = world.get_blueprint_library()
+    planner = SpawnPlanner(world)
+    ego, leader = planner.spawn_pair(client, library.find('vehicle.tesla.model3'),
+                                     library.find('vehicle.dodge.charger_2020'), 25.0, ego_index=2)
+    assert ego.type_id == 'vehicle.tesla.model3' and leader.type_id == 'vehicle.dodge.charger_2020'
+    assert leader.get_location().x - ego.get_location().x == pytest.approx(25.0)
+    assert leader.autopilot
+    assert planner.spawned[ego.id].location.x == 20.0
+
+    # The ego spawn point is now taken.
+    with pytest.raises(RuntimeError, match='spawn point 2'):
+        planner.spawn_pair(client, library.find('vehicle.tesla.model3'),
+                           library.find('vehicle.dodge.charger_2020'), 25.0, ego_index=2)
+    assert len(world.get_actors()) == 2
+
+
+def test_spawn_picks_a_free_point(world):
+    random.seed(1)
+    blueprint = world.get_blueprint_library().find('vehicle.tesla.model3')
+    planner = SpawnPlanner(world)
+    actors = [planner.spawn(blueprint) for _ in range(20)]
+    assert len({planner.spawned[x.id].location.x + 1000 * planner.spawned[x.id].location.y for x in actors}) == 20
+    assert planner.spawned[planner.spawn(blueprint, 99).id].location.x == 90.0
+    with pytest.raises(RuntimeError, match='spawn point 99'):
+        planner.spawn(blueprint, 99)
@@ -0,0 +1,195 @@
+import math
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import spawn_vehicle
+from telemetry import CarFollowingTelemetry, TELEMETRY_FIELDS, TelemetryLogger, TelemetryTable, load_telemetry
+
+
+def following(world, tmp_path, ego_speed=10.0, leader_speed=5.0, distance=30.0):
+    ego = spawn_vehicle(world)
+    leader = spawn_vehicle(world, x=distance)
+    for actor, speed in ((ego, ego_speed), (leader, leader_speed)):
+        actor.set_autopilot(True)
+        actor._autopilot_speed = speed
+    telemetry = CarFollowingTelemetry(TelemetryLogger(str(tmp_path / 'run.npz')))
+    telemetry.attach(ego, leader)
+    return ego, leader, telemetry
+
+
+def test_record_uses_the_frame_of_the_snapshot(world, tmp_path):
+    ego, leader, telemetry = following(world, tmp_path)
+    world.tick()
+    old = world.get_snapshot()
+    world.tick()
+    new = world.get_snapshot()
+    # The world has moved on, the record must still describe the old frame only.
+    assert telemetry.record(old)
+    assert not telemetry.record(old)
+    assert telemetry.record(new)
+    assert not telemetry.record(old)
+    telemetry.close()
+
+    table = load_telemetry(str(tmp_path / 'run.npz'))
+    assert table['frame'].tolist() == [old.frame, new.frame]
+    for row, snapshot in enumerate((old, new)):
+        ego_location = snapshot.find(ego.id).get_transform().location
+        leader_location = snapshot.find(leader.id).get_transform().location
+        assert table['ego_x'][row] == pytest.approx(ego_location.x)
+        assert table['leader_x'][row] == pytest.approx(leader_location.x)
+        assert table['gap'][row] == pytest.approx(leader_location.x - ego_location.x - 4.8)
+
+
+def test_record_without_ego_in_snapshot(world, tmp_path):
+    ego, _, telemetry = following(world, tmp_path)
+    world.tick()
+    snapshot = world.get_snapshot()
+    ego.destroy()
+    world.tick()
+    assert not telemetry.record(world.get_snapshot())
+    assert telemetry.record(snapshot)
+    telemetry.close()
+    assert len(load_telemetry(str(tmp_path / 'run.npz'))) == 1
+
+
+def test_ttc_with_closing_leader(world, tmp_path):
+    _, _, telemetry = following(world, tmp_path, ego_speed=10.0, leader_speed=4.0, distance=30.0)
+    world.tick()
+    assert telemetry.record(world.get_snapshot())
+    telemetry.close()
+
+    row = load_telemetry(str(tmp_path / 'run.npz'))
+    gap = row['gap'][0]
+    assert gap == pytest.approx(30.0 - 0.05 * 6.0 - 4.8)
+    assert row['relative_speed'][0] == pytest.approx(-6.0)
+    assert row['time_headway'][0] == pytest.approx(gap / 10.0)
+    assert row['time_to_collision'][0] == pytest.approx(gap / 6.0)
+    assert math.isnan(row['desired_accel'][0])
+
+
+def test_no_ttc_while_opening(world, tmp_path):
+    _, _, telemetry = following(world, tmp_path, ego_speed=5.0, leader_speed=10.0)
+    world.tick()
+    telemetry.record(world.get_snapshot())
+    telemetry.close()
+    row = load_telemetry(str(tmp_path / 'run.npz'))
+    assert row['relative_speed'][0] == pytest.approx(5.0)
+    assert math.isnan(row['time_to_collision'][0])
+
+
+def test_no_leader_fills_nan(world, tmp_path):
+    ego = spawn_vehicle(world)
+    telemetry = CarFollowingTelemetry(TelemetryLogger(str(tmp_path / 'run.npz')))
+    telemetry.attach(ego)
+    world.tick()
+    telemetry.record(world.get_snapshot())
+    telemetry.close()
+    row = load_telemetry(str(tmp_path / 'run.npz'))
+    assert not math.isnan(row['ego_x'][0])
+    assert all(math.isnan(row[x][0]) for x in TELEMETRY_FIELDS[len(TELEMETRY_FIELDS) - 11:])
+
+
+def test_telemetry_needs_telemetry_fields(tmp_path):
+    logger = TelemetryLogger(str(tmp_path / 'run.npz'), fields=('a', 'b'))
+    with pytest.raises(ValueError):
+        CarFollowingTelemetry(logger)
+    logger.close()
+
+
+def write(path, rows, fields=('a', 'b', 'c'), **kwargs):
+    logger = TelemetryLogger(str(path), fields, **kwargs)
+    data = np.arange(rows * len(fields), dtype=np.float64).reshape(rows, len(fields))
+    for row in data:
+        logger.append(row)
+    logger.close()
+    return logger, data
+
+
+@pytest.mark.parametrize('extension', ['.npz', '.csv'])
+@pytest.mark.parametrize('rows', [0, 1, 8, 9, 40])
+def test_round_trip(tmp_path, extension, rows):
+    # 8 is exactly one chunk, 9 spills one row into a second one.
+    logger, data = write(tmp_path / ('run' + extension), rows, chunk_rows=8)
+    assert logger.rows == logger.written == rows
+    table = load_telemetry(str(tmp_path / ('run' + extension)))
+    assert table.fields == ('a', 'b', 'c')
+    assert len(table) == rows
+    np.testing.assert_array_equal(table.select('a', 'b', 'c').reshape(rows, 3), data)
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip('pyarrow')
+    _, data = write(tmp_path / 'run.parquet', 20, chunk_rows=8)
+    table = load_telemetry(str(tmp_path / 'run.parquet'))
+    np.testing.assert_array_equal(table.select('a', 'b', 'c'), data)
+
+
+def test_npz_part_file_removed(tmp_path):
+    write(tmp_path / 'run.npz', 20, chunk_rows=8)
+    assert sorted(x.name for x in tmp_path.iterdir()) == ['run.npz']
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        TelemetryLogger(str(tmp_path / 'run.txt'))
+
+
+def test_missing_values_are_nan(tmp_path):
+    logger = TelemetryLogger(str(tmp_path / 'run.npz'), ('a', 'b'), chunk_rows=4)
+    logger.append((1.0, math.nan))
+    logger.append((2.0, 3.0))
+    logger.close()
+    table = load_telemetry(str(tmp_path / 'run.npz'))
+    assert math.isnan(table['b'][0]) and table['b'][1] == 3.0
+
+
+def test_reused_chunks_are_cleared(tmp_path):
+    # Chunks go back to the pool after writing, a partly filled reused chunk must not leak old rows.
+    logger = TelemetryLogger(str(tmp_path / 'run.npz'), ('a',), chunk_rows=4, max_chunks=2)
+    for i in range(10):
+        logger.append((i,))
+        if i % 4 == 3:
+            logger.flush()
+    logger.close()
+    assert load_telemetry(str(tmp_path / 'run.npz'))['a'].tolist() == list(range(10))
+
+
+def test_stall_waits_for_the_writer(tmp_path):
+    logger = TelemetryLogger(str(tmp_path / 'run.npz'), ('a',), chunk_rows=2, max_chunks=2)
+    release = threading.Event()
+    write_chunk = logger._sink.write
+
+    def slow_write(block):
+        release.wait(5.0)
+        write_chunk(block)
+    logger._sink.write = slow_write
+    threading.Timer(0.2, release.set).start()
+    for i in range(6):
+        logger.append((i,))
+    logger.close()
+    assert logger.stalls >= 1
+    assert load_telemetry(str(tmp_path / 'run.npz'))['a'].tolist() == list(range(6))
+
+
+def test_writer_error_is_raised(tmp_path):
+    logger = TelemetryLogger(str(tmp_path / 'run.npz'), ('a',), chunk_rows=1)
+
+    def fail(block):
+        raise IOError('disk full')
+    logger._sink.write = fail
+    logger.append((1.0,))
+    with pytest.raises(IOError):
+        logger.close()
+
+
+def test_table_queries():
+    table = TelemetryTable(('t', 'gap'), [np.arange(5.0), np.array([5.0, np.nan, 3.0, 2.0, 1.0])])
+    assert len(table.where(table['gap'] < 3.0)) == 2
+    assert table.between(1.0, 3.0, field='t')['t'].tolist() == [1.0, 2.0]
+    assert table.select('t', 'gap').shape == (5, 2)
+    gap = table.describe(['gap'])[0]
+    assert gap['count'] == 4 and gap['min'] == 1.0 and gap['max'] == 5.0
+    empty = table.where(np.zeros(5, dtype=bool)).describe(['gap'])[0]
+    assert empty['count'] == 0 and math.isnan(empty['mean'])
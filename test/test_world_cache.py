@@ -0,0 +1,57 @@
+import pytest
+
+import world_cache
+from world_cache import world_metadata
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    world_cache.invalidate()
+    yield
+    world_cache.invalidate()
+
+
+def test_blueprints_are_copies(world):
+    metadata = world_metadata(world)
+    blueprint = metadata.blueprints('vehicle.*')[0]
+    blueprint.set_attribute('role_name', 'hero')
+    again = metadata.blueprints('vehicle.*')[0]
+    assert again.id == blueprint.id
+    assert again is not blueprint
+    assert again.get_attribute('role_name').as_str() != 'hero'
+
+
+def test_blueprints_filter_once(world, monkeypatch):
+    metadata = world_metadata(world)
+    ids = [x.id for x in metadata.blueprints('vehicle.*')]
+    calls = []
+    monkeypatch.setattr(world_cache, 'get_actor_blueprints', lambda *args: calls.append(args))
+    assert [x.id for x in metadata.blueprints('vehicle.*')] == ids
+    assert [x.id for x in metadata.blueprints('vehicle.*', 'ALL')] == ids
+    assert not calls
+
+
+def test_configured_is_shared(world):
+    metadata = world_metadata(world)
+    a = metadata.configured('sensor.camera.rgb', (('image_size_x', '64'),))
+    b = metadata.configured('sensor.camera.rgb', (('image_size_x', '64'),))
+    c = metadata.configured('sensor.camera.rgb', (('image_size_x', '32'),))
+    assert a is b and a is not c
+    assert a.get_attribute('image_size_x').as_str() == '64'
+
+
+def test_cache_follows_the_map(carla):
+    client = carla.Client()
+    world = client.get_world()
+    metadata = world_metadata(world)
+    assert world_metadata(client.get_world()) is metadata
+    assert world_metadata(world) is metadata
+    world_cache.invalidate()
+    assert world_metadata(world) is not metadata
+
+
+def test_spawn_point_is_a_copy(world):
+    metadata = world_metadata(world)
+    transform = metadata.spawn_point(0)
+    transform.location.x += 100.0
+    assert metadata.spawn_point(0).location.x == metadata.spawn_points()[0].location.x
@@ -10,8 +10,8 @@
 Script that render multiple sensors in the same pygame window
 
 By default, it renders four cameras, one LiDAR and one Semantic LiDAR.
-It can easily be configure for any different number of sensors. 
-To do that, check lines 290-308.
+It can easily be configure for any different number of sensors,
+see config/rig_multi_sensor.yaml and the --rig option.
 """
 
 import glob
@@ -32,6 +32,8 @@ import random
 import time
 import numpy as np
 
+from instrumentation import Profiler
+from sensor_rig import SensorRig
 
 try:
     import pygame
@@ -85,172 +87,29 @@ class DisplayManager:
 
         pygame.display.flip()
 
-    def destroy(self):
-        for s in self.sensor_list:
-            s.destroy()
-
     def render_enabled(self):
         return self.display != None
 
-class SensorManager:
-    def __init__(self, world, display_man, sensor_type, transform, attached, sensor_options, display_pos):
-        self.surface = None
-        self.world = world
+class SensorView:
+    """Shows the latest decoded output of a rig sensor in its grid cell, scaled up to the cell if smaller."""
+    def __init__(self, display_man, rig_sensor):
         self.display_man = display_man
-        self.display_pos = display_pos
-        self.sensor = self.init_sensor(sensor_type, transform, attached, sensor_options)
-        self.sensor_options = sensor_options
-        self.timer = CustomTimer()
-
-        self.time_processing = 0.0
-        self.tics_processing = 0
+        self.rig_sensor = rig_sensor
+        self.offset = display_man.get_display_offset(rig_sensor.spec.display_pos)
+        self.size = tuple(display_man.get_display_size())
+        self._scaled = None
 
         self.display_man.add_sensor(self)
 
-    def init_sensor(self, sensor_type, transform, attached, sensor_options):
-        if sensor_type == 'RGBCamera':
-            camera_bp = self.world.get_blueprint_library().find('sensor.camera.rgb')
-            disp_size = self.display_man.get_display_size()
-            camera_bp.set_attribute('image_size_x', str(disp_size[0]))
-            camera_bp.set_attribute('image_size_y', str(disp_size[1]))
-
-            for key in sensor_options:
-                camera_bp.set_attribute(key, sensor_options[key])
-
-            camera = self.world.spawn_actor(camera_bp, transform, attach_to=attached)
-            camera.listen(self.save_rgb_image)
-
-            return camera
-
-        elif sensor_type == 'LiDAR':
-            lidar_bp = self.world.get_blueprint_library().find('sensor.lidar.ray_cast')
-            lidar_bp.set_attribute('range', '100')
-            lidar_bp.set_attribute('dropoff_general_rate', lidar_bp.get_attribute('dropoff_general_rate').recommended_values[0])
-            lidar_bp.set_attribute('dropoff_intensity_limit', lidar_bp.get_attribute('dropoff_intensity_limit').recommended_values[0])
-            lidar_bp.set_attribute('dropoff_zero_intensity', lidar_bp.get_attribute('dropoff_zero_intensity').recommended_values[0])
-
-            for key in sensor_options:
-                lidar_bp.set_attribute(key, sensor_options[key])
-
-            lidar = self.world.spawn_actor(lidar_bp, transform, attach_to=attached)
-
-            lidar.listen(self.save_lidar_image)
-
-            return lidar
-        
-        elif sensor_type == 'SemanticLiDAR':
-            lidar_bp = self.world.get_blueprint_library().find('sensor.lidar.ray_cast_semantic')
-            lidar_bp.set_attribute('range', '100')
-
-            for key in sensor_options:
-                lidar_bp.set_attribute(key, sensor_options[key])
-
-            lidar = self.world.spawn_actor(lidar_bp, transform, attach_to=attached)
-
-            lidar.listen(self.save_semanticlidar_image)
-
-            return lidar
-        
-        elif sensor_type == "Radar":
-            radar_bp = self.world.get_blueprint_library().find('sensor.other.radar')
-            for key in sensor_options:
-                radar_bp.set_attribute(key, sensor_options[key])
-
-            radar = self.world.spawn_actor(radar_bp, transform, attach_to=attached)
-            radar.listen(self.save_radar_image)
-
-            return radar
-        
-        else:
-            return None
-
-    def get_sensor(self):
-        return self.sensor
-
-    def save_rgb_image(self, image):
-        t_start = self.timer.time()
-
-        image.convert(carla.ColorConverter.Raw)
-        array = np.frombuffer(image.raw_data, dtype=np.dtype("uint8"))
-        array = np.reshape(array, (image.height, image.width, 4))
-        array = array[:, :, :3]
-        array = array[:, :, ::-1]
-
-        if self.display_man.render_enabled():
-            self.surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
-
-        t_end = self.timer.time()
-        self.time_processing += (t_end-t_start)
-        self.tics_processing += 1
-
-    def save_lidar_image(self, image):
-        t_start = self.timer.time()
-
-        disp_size = self.display_man.get_display_size()
-        lidar_range = 2.0*float(self.sensor_options['range'])
-
-        points = np.frombuffer(image.raw_data, dtype=np.dtype('f4'))
-        points = np.reshape(points, (int(points.shape[0] / 4), 4))
-        lidar_data = np.array(points[:, :2])
-        lidar_data *= min(disp_size) / lidar_range
-        lidar_data += (0.5 * disp_size[0], 0.5 * disp_size[1])
-        lidar_data = np.fabs(lidar_data)  # pylint: disable=E1111
-        lidar_data = lidar_data.astype(np.int32)
-        lidar_data = np.reshape(lidar_data, (-1, 2))
-        lidar_img_size = (disp_size[0], disp_size[1], 3)
-        lidar_img = np.zeros((lidar_img_size), dtype=np.uint8)
-
-        lidar_img[tuple(lidar_data.T)] = (255, 255, 255)
-
-        if self.display_man.render_enabled():
-            self.surface = pygame.surfarray.make_surface(lidar_img)
-
-        t_end = self.timer.time()
-        self.time_processing += (t_end-t_start)
-        self.tics_processing += 1
-
-    def save_semanticlidar_image(self, image):
-        t_start = self.timer.time()
-
-        disp_size = self.display_man.get_display_size()
-        lidar_range = 2.0*float(self.sensor_options['range'])
-
-        points = np.frombuffer(image.raw_data, dtype=np.dtype('f4'))
-        points = np.reshape(points, (int(points.shape[0] / 6), 6))
-        lidar_data = np.array(points[:, :2])
-        lidar_data *= min(disp_size) / lidar_range
-        lidar_data += (0.5 * disp_size[0], 0.5 * disp_size[1])
-        lidar_data = np.fabs(lidar_data)  # pylint: disable=E1111
-        lidar_data = lidar_data.astype(np.int32)
-        lidar_data = np.reshape(lidar_data, (-1, 2))
-        lidar_img_size = (disp_size[0], disp_size[1], 3)
-        lidar_img = np.zeros((lidar_img_size), dtype=np.uint8)
-
-        lidar_img[tuple(lidar_data.T)] = (255, 255, 255)
-
-        if self.display_man.render_enabled():
-            self.surface = pygame.surfarray.make_surface(lidar_img)
-
-        t_end = self.timer.time()
-        self.time_processing += (t_end-t_start)
-        self.tics_processing += 1
-
-    def save_radar_image(self, radar_data):
-        t_start = self.timer.time()
-        points = np.frombuffer(radar_data.raw_data, dtype=np.dtype('f4'))
-        points = np.reshape(points, (len(radar_data), 4))
-
-        t_end = self.timer.time()
-        self.time_processing += (t_end-t_start)
-        self.tics_processing += 1
-
     def render(self):
-        if self.surface is not None:
-            offset = self.display_man.get_display_offset(self.display_pos)
-            self.display_man.display.blit(self.surface, offset)
-
-    def destroy(self):
-        self.sensor.destroy()
+        surface = self.rig_sensor.channel.latest()[1]
+        if not isinstance(surface, pygame.Surface):
+            return
+        if surface.get_size() != self.size:
+            if self._scaled is None:
+                self._scaled = pygame.Surface(self.size, 0, surface)
+            surface = pygame.transform.scale(surface, self.size, self._scaled)
+        self.display_man.display.blit(surface, self.offset)
 
 def run_simulation(args, client):
     """This function performed one test run using the args parameters
@@ -258,9 +117,11 @@ def run_simulation(args, client):
     """
 
     display_manager = None
+    rig = None
     vehicle = None
     vehicle_list = []
     timer = CustomTimer()
+    profiler = Profiler(enabled=bool(args.profile))
 
     try:
 
@@ -283,25 +144,16 @@ def run_simulation(args, client):
         vehicle_list.append(vehicle)
         vehicle.set_autopilot(True)
 
+        # The sensors, their grid positions and the grid size come from the rig file.
+        # The whole rig is spawned in one batch, with one decode pipeline per sensor type.
+        rig = SensorRig.from_yaml(args.rig, client, world, window_size=[args.width, args.height], profiler=profiler)
+
         # Display Manager organize all the sensors an its display in a window
-        # If can easily configure the grid and the total window size
-        display_manager = DisplayManager(grid_size=[2, 3], window_size=[args.width, args.height])
-
-        # Then, SensorManager can be used to spawn RGBCamera, LiDARs and SemanticLiDARs as needed
-        # and assign each of them to a grid position, 
-        SensorManager(world, display_manager, 'RGBCamera', carla.Transform(carla.Location(x=0, z=2.4), carla.Rotation(yaw=-90)), 
-                      vehicle, {}, display_pos=[0, 0])
-        SensorManager(world, display_manager, 'RGBCamera', carla.Transform(carla.Location(x=0, z=2.4), carla.Rotation(yaw=+00)), 
-                      vehicle, {}, display_pos=[0, 1])
-        SensorManager(world, display_manager, 'RGBCamera', carla.Transform(carla.Location(x=0, z=2.4), carla.Rotation(yaw=+90)), 
-                      vehicle, {}, display_pos=[0, 2])
-        SensorManager(world, display_manager, 'RGBCamera', carla.Transform(carla.Location(x=0, z=2.4), carla.Rotation(yaw=180)), 
-                      vehicle, {}, display_pos=[1, 1])
-
-        SensorManager(world, display_manager, 'LiDAR', carla.Transform(carla.Location(x=0, z=2.4)), 
-                      vehicle, {'channels' : '64', 'range' : '100',  'points_per_second': '250000', 'rotation_frequency': '20'}, display_pos=[1, 0])
-        SensorManager(world, display_manager, 'SemanticLiDAR', carla.Transform(carla.Location(x=0, z=2.4)), 
-                      vehicle, {'channels' : '64', 'range' : '100', 'points_per_second': '100000', 'rotation_frequency': '20'}, display_pos=[1, 2])
+        display_manager = DisplayManager(grid_size=rig.grid, window_size=[args.width, args.height])
+
+        rig.spawn(vehicle)
+        for rig_sensor in rig.displayed():
+            SensorView(display_manager, rig_sensor)
 
 
         #Simulation loop
@@ -309,13 +161,15 @@ def run_simulation(args, client):
         time_init_sim = timer.time()
         while True:
             # Carla Tick
-            if args.sync:
-                world.tick()
-            else:
-                world.wait_for_tick()
+            with profiler.span('world.tick'):
+                if args.sync:
+                    world.tick()
+                else:
+                    world.wait_for_tick()
 
             # Render received data
-            display_manager.render()
+            with profiler.span('render'):
+                display_manager.render()
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -329,8 +183,17 @@ def run_simulation(args, client):
                 break
 
     finally:
-        if display_manager:
-            display_manager.destroy()
+        if rig is not None:
+            for stats in rig.stats():
+                print('%s: %d frames processed, %d dropped, latency avg %.2f ms' % (
+                    stats['name'], stats['decoded'], stats['dropped'], 1e3 * stats['latency_avg']))
+            rig.destroy()
+
+        if args.profile:
+            for stage in profiler.summary():
+                print('%s: %d spans, p50 %.2f ms, p95 %.2f ms, p99 %.2f ms' % (
+                    stage['name'], stage['count'], 1e3 * stage['p50'], 1e3 * stage['p95'], 1e3 * stage['p99']))
+            profiler.dump(args.profile)
 
         client.apply_batch([carla.command.DestroyActor(x) for x in vehicle_list])
 
@@ -367,6 +230,15 @@ def main():
         metavar='WIDTHxHEIGHT',
         default='1280x720',
         help='window resolution (default: 1280x720)')
+    argparser.add_argument(
+        '--rig',
+        default='config/rig_multi_sensor.yaml',
+        help='sensor rig definition (default: config/rig_multi_sensor.yaml)')
+    argparser.add_argument(
+        '--profile',
+        default=None,
+        metavar='PATH',
+        help='time the loop and decode stages and write p50/p95/p99 to a .json or .csv file on exit (default: None)')
 
     args = argparser.parse_args()
 
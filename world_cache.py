@@ -0,0 +1,133 @@
+import carla
+
+from utils import get_actor_blueprints
+
+# map name -> WorldMetadataCache
+_caches = {}
+# episode id (carla.World.id) -> map name
+_episodes = {}
+
+
+class WorldMetadataCache(object):
+    """
+    Memoized static data of a map: the blueprint library, filtered blueprint
+    lists, blueprint attribute values and spawn points.
+
+    These never change while the map is loaded, but each lookup is a server
+    round trip or a copy of the whole list. Use world_metadata() to get the
+    cache of a world, it is shared by all episodes on the same map and
+    replaced when another map is loaded.
+
+    Parameters:
+    world (carla.World): A world with the map loaded.
+    carla_map (carla.Map): The map of world, if already known (default: None --> world.get_map()).
+    """
+    def __init__(self, world, carla_map=None):
+        self.world = world
+        self.map = carla_map if carla_map is not None else world.get_map()
+        self.map_name = self.map.name
+        self._library = None
+        self._blueprints = {}
+        self._found = {}
+        self._attributes = {}
+        self._configured = {}
+        self._spawn_points = None
+
+    def library(self):
+        if self._library is None:
+            self._library = self.world.get_blueprint_library()
+        return self._library
+
+    def blueprints(self, filter, generation='All'):
+        """
+        Same as utils.get_actor_blueprints(), the filter is evaluated once per
+        (filter, generation). Every call returns new blueprints, they can be
+        modified (e.g. role_name, color) without affecting the cache.
+        """
+        key = (filter, str(generation).lower())
+        if key not in self._blueprints:
+            self._blueprints[key] = tuple(x.id for x in get_actor_blueprints(self, filter, generation))
+        library = self.library()
+        return [library.find(x) for x in self._blueprints[key]]
+
+    def find(self, blueprint_id):
+        """Blueprint blueprint_id of the library, to read attributes. It is shared, do not modify it."""
+        if blueprint_id not in self._found:
+            self._found[blueprint_id] = self.library().find(blueprint_id)
+        return self._found[blueprint_id]
+
+    def configured(self, blueprint_id, attributes):
+        """
+        Blueprint blueprint_id with the (name, value) pairs of attributes set,
+        created once per distinct configuration. It is shared, do not modify it.
+        """
+        key = (blueprint_id, tuple(attributes))
+        if key not in self._configured:
+            blueprint = self.library().find(blueprint_id)
+            for name, value in key[1]:
+                blueprint.set_attribute(name, value)
+            self._configured[key] = blueprint
+        return self._configured[key]
+
+    def attribute(self, blueprint, name):
+        """Value of a static blueprint attribute (e.g. number_of_wheels) as a string, None if it does not exist."""
+        key = (blueprint.id, name, 'value')
+        if key not in self._attributes:
+            value = None
+            if blueprint.has_attribute(name):
+                value = blueprint.get_attribute(name).as_str()
+            self._attributes[key] = value
+        return self._attributes[key]
+
+    def recommended_values(self, blueprint, name):
+        """Recommended values of a blueprint attribute as a tuple, empty if the attribute does not exist."""
+        key = (blueprint.id, name)
+        if key not in self._attributes:
+            values = ()
+            if blueprint.has_attribute(name):
+                values = tuple(blueprint.get_attribute(name).recommended_values)
+            self._attributes[key] = values
+        return self._attributes[key]
+
+    def get_blueprint_library(self):
+        # Lets get_actor_blueprints() run on the cache as if it was the world.
+        return self.library()
+
+    def spawn_points(self):
+        """The spawn points of the map. Use spawn_point() to get a transform that can be modified."""
+        if self._spawn_points is None:
+            self._spawn_points = tuple(self.map.get_spawn_points())
+        return self._spawn_points
+
+    def spawn_point(self, index):
+        t = self.spawn_points()[index]
+        return carla.Transform(carla.Location(t.location.x, t.location.y, t.location.z),
+                               carla.Rotation(t.rotation.pitch, t.rotation.yaw, t.rotation.roll))
+
+
+def world_metadata(world, carla_map=None):
+    """
+    Return the WorldMetadataCache of the map loaded in world.
+
+    The map name is resolved once per episode. A new episode on the same map
+    (e.g. reload_world()) keeps the cache, loading another map replaces it.
+    """
+    name = _episodes.get(world.id)
+    if name is None:
+        if carla_map is None:
+            carla_map = world.get_map()
+        name = carla_map.name
+        _episodes[world.id] = name
+    cache = _caches.get(name)
+    if cache is None:
+        # Only the current map is kept, the cache of a previous map is stale.
+        _caches.clear()
+        cache = _caches[name] = WorldMetadataCache(world, carla_map)
+    cache.world = world
+    return cache
+
+
+def invalidate():
+    """Forget all cached metadata, e.g. after changing the blueprint library with a plugin."""
+    _caches.clear()
+    _episodes.clear()